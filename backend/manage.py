@@ -3,8 +3,11 @@
 import os
 import sys
 
+from sms_transports.env import load_env
+
 def main():
     """Run administrative tasks."""
+    load_env()
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sms_transports.settings')
     try:
         from django.core.management import execute_from_command_line
@@ -0,0 +1,123 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MARKER = 'PROFILE_STARTUP '
+
+# Runs in a fresh interpreter, booting the app the way sms_transports/wsgi.py does
+# and serving two requests; prints the wall-clock time at the end of each phase.
+CHILD = r'''
+import io, json, sys, time
+phases = []
+mark = lambda name: phases.append((name, time.time()))
+from sms_transports.env import load_env
+load_env()
+from django.conf import settings
+settings.INSTALLED_APPS
+mark('settings')
+import django
+django.setup(set_prefix=False)
+mark('django.setup')
+from django.core.handlers.wsgi import WSGIHandler
+handler = WSGIHandler()
+mark('middleware')
+
+def get(path):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'localhost',
+        'REMOTE_ADDR': '127.0.0.1', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+    }
+    statuses = []
+    response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        b''.join(response)
+    finally:
+        response.close()
+    return int(statuses[0].split()[0])
+
+status = get(sys.argv[1])
+mark('first request')
+get(sys.argv[1])
+mark('second request')
+print(%r + json.dumps({'phases': phases, 'status': status}))
+''' % MARKER
+
+
+def parse_importtime(stderr):
+    """(module, self µs, cumulative µs, depth) per line of `python -X importtime` output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile a worker's cold start: time to import the settings, set up the apps, load the "
+        "middleware and serve the first and second request, in fresh interpreters, with the "
+        "slowest imports from `python -X importtime`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/transport/trucks/', help='Path of the requests served.')
+        parser.add_argument('--runs', type=int, default=3, help='Cold starts to take the median of.')
+        parser.add_argument('--top', type=int, default=15, help='Imports and packages listed.')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1.')
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        runs, imports = [], None
+        for _ in range(options['runs']):
+            start = time.time()
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', CHILD, options['path']],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            lines = [line for line in result.stdout.splitlines() if line.startswith(MARKER)]
+            if result.returncode or not lines:
+                raise CommandError(f'The profiled process failed:\n{result.stderr[-3000:]}')
+            data = json.loads(lines[-1][len(MARKER):])
+            previous, phases = start, []
+            for name, at in data['phases']:
+                phases.append((name, at - previous))
+                previous = at
+            runs.append((phases, previous - start, data['status']))
+            imports = parse_importtime(result.stderr)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Median of {len(runs)} cold start(s), GET {options['path']} -> {runs[-1][2]}"
+        ))
+        # The first phase also covers starting the interpreter
+        for index, (name, _) in enumerate(runs[0][0]):
+            ms = statistics.median(run[0][index][1] for run in runs) * 1000
+            self.stdout.write(f"  {name:<16} {ms:8.1f} ms")
+        ready = statistics.median(sum(seconds for _, seconds in run[0][:3]) for run in runs) * 1000
+        self.stdout.write(f"  {'ready to serve':<16} {ready:8.1f} ms")
+        first = statistics.median(run[1] - run[0][-1][1] for run in runs) * 1000
+        self.stdout.write(f"  {'first response':<16} {first:8.1f} ms")
+
+        top = options['top']
+        self.stdout.write(self.style.MIGRATE_HEADING('Slowest top-level imports (cumulative, last run)'))
+        for name, _, cumulative, _ in sorted((m for m in imports if m[3] == 0), key=lambda m: -m[2])[:top]:
+            self.stdout.write(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+        packages = defaultdict(int)
+        for name, self_us, _, _ in imports:
+            packages[name.split('.')[0]] += self_us
+        self.stdout.write(self.style.MIGRATE_HEADING('Import time by package (own time of its modules)'))
+        for name, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f"  {self_us / 1000:8.1f} ms  {name}")
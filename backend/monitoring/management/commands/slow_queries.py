@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, DatabaseError
+
+from monitoring import querylog
+
+SORT_KEYS = {
+    'total': lambda e: e['total'],
+    'count': lambda e: e['count'],
+    'p95': lambda e: querylog.percentile(e['buckets'], 0.95),
+    'max': lambda e: e['max'],
+}
+
+
+class Command(BaseCommand):
+    help = "Print the most expensive SQL fingerprints recorded by the web workers, with their EXPLAIN plans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='total')
+        parser.add_argument('--no-explain', action='store_true', help="Skip running EXPLAIN on the slowest sample (recorded with its string parameters blanked).")
+        parser.add_argument('--reset', action='store_true',
+                            help="Delete the recorded statistics (running workers re-add theirs on their next flush).")
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            querylog.clear()
+            self.stdout.write(self.style.SUCCESS('Query statistics cleared.'))
+            return
+
+        entries = sorted(querylog.collect().items(), key=lambda item: SORT_KEYS[options['sort']](item[1]), reverse=True)
+        if not entries:
+            self.stdout.write('No queries recorded yet.')
+            return
+
+        for key, entry in entries[:options['limit']]:
+            p50, p95, p99 = (querylog.percentile(entry['buckets'], q) * 1000 for q in (0.5, 0.95, 0.99))
+            views = sorted(entry['views'].items(), key=lambda item: item[1], reverse=True)[:5]
+            self.stdout.write(self.style.MIGRATE_HEADING(f"[{key}] {entry['sql'][:300]}"))
+            self.stdout.write(
+                f"  calls {entry['count']}, total {entry['total'] * 1000:.1f} ms, "
+                f"avg {entry['total'] / entry['count'] * 1000:.2f} ms, "
+                f"p50 <= {p50:.1f} ms, p95 <= {p95:.1f} ms, p99 <= {p99:.1f} ms, max {entry['max'] * 1000:.1f} ms"
+            )
+            self.stdout.write('  views: ' + ', '.join(f'{view} ({count})' for view, count in views))
+            if not options['no_explain']:
+                self.explain(entry.get('sample'))
+            self.stdout.write('')
+
+    def explain(self, sample):
+        if not sample or sample[1] is None:
+            return
+        sql, params = sample
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                rows = cursor.fetchall()
+        except DatabaseError as e:
+            self.stdout.write(f'  explain failed: {e}')
+            return
+        self.stdout.write('  plan:')
+        for row in rows:
+            self.stdout.write('    ' + ' '.join(str(col) for col in row))
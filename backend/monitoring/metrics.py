@@ -0,0 +1,219 @@
+# monitoring/metrics.py
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: files of exited workers are kept
+    fcntl = None
+
+# Upper bounds of the histogram buckets; +Inf is implied.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Values of exited workers, merged into one file by collect()
+EXITED_FILE = 'exited.json'
+
+# name -> (type, help, label names, buckets)
+METRICS = {
+    'http_requests_total': (
+        'counter', 'Requests by view, action, method and status code.',
+        ('view', 'action', 'method', 'status'), None,
+    ),
+    'http_request_duration_seconds': (
+        'histogram', 'Time spent handling the request.', ('view', 'action', 'method'), LATENCY_BUCKETS,
+    ),
+    'http_request_db_queries': (
+        'histogram', 'Database queries run per request.', ('view', 'action', 'method'), QUERY_COUNT_BUCKETS,
+    ),
+    'http_request_db_duration_seconds': (
+        'histogram', 'Time spent in database queries per request.', ('view', 'action', 'method'), LATENCY_BUCKETS,
+    ),
+    'http_response_size_bytes': (
+        'histogram', 'Response body size.', ('view', 'action', 'method'), SIZE_BUCKETS,
+    ),
+}
+
+
+class Registry:
+    """
+    Metrics of this process.
+
+    Values live in memory and are written to METRICS_DIR/<pid>-<start>.json at
+    most every METRICS_FLUSH_INTERVAL seconds. The /metrics view merges the files
+    of every worker, so any worker can answer a scrape with fleet-wide totals;
+    collect() folds the files of exited workers into EXITED_FILE, so counters
+    never go backwards and the directory does not grow with every recycled worker.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {name: {} for name in METRICS}
+        self.path = None
+        self.flushed_at = 0.0
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            series = self.values[name]
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][3]
+        with self.lock:
+            series = self.values[name].get(labels)
+            if series is None:
+                series = self.values[name][labels] = {'buckets': [0] * (len(buckets) + 1), 'sum': 0.0}
+            series['buckets'][bisect_left(buckets, value)] += 1
+            series['sum'] += value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: [[list(labels), value] for labels, value in series.items()]
+                for name, series in self.values.items()
+            }
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.flushed_at = now
+        if self.path is None and not any(self.values.values()):
+            return
+        directory = settings.METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        if self.path is None:
+            self.path = os.path.join(directory, f'{os.getpid()}-{int(time.time() * 1000)}.json')
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump(self.snapshot(), fh)
+        os.replace(tmp, self.path)
+
+
+registry = Registry()
+atexit.register(registry.flush, force=True)
+
+
+@contextmanager
+def _locked(exclusive):
+    """Readers share the directory; folding files takes it alone, so no scrape counts a file twice."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    with open(os.path.join(settings.METRICS_DIR, '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _exited(path):
+    """Whether ``path`` is the file of a process that is gone (<pid>-<start>.json)."""
+    pid = os.path.basename(path).split('-')[0]
+    if not pid.isdigit() or int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def _merge(paths):
+    merged = {name: {} for name in METRICS}
+    for path in paths:
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        for name, series in data.items():
+            if name not in merged:
+                continue
+            for labels, value in series:
+                labels = tuple(labels)
+                current = merged[name].get(labels)
+                if isinstance(value, dict):
+                    if current is None:
+                        merged[name][labels] = {'buckets': list(value['buckets']), 'sum': value['sum']}
+                    else:
+                        current['buckets'] = [a + b for a, b in zip(current['buckets'], value['buckets'])]
+                        current['sum'] += value['sum']
+                else:
+                    merged[name][labels] = (current or 0) + value
+    return merged
+
+
+def _fold_exited(paths):
+    """Merge the files of exited workers into EXITED_FILE and remove them."""
+    exited_path = os.path.join(settings.METRICS_DIR, EXITED_FILE)
+    exited = [path for path in paths if path != exited_path and _exited(path)]
+    if fcntl is None or not exited:
+        return
+    with _locked(exclusive=True):
+        # Another worker may have folded them while this one waited
+        exited = [path for path in exited if os.path.exists(path)]
+        if not exited:
+            return
+        merged = _merge([exited_path] + exited)
+        tmp = f'{exited_path}.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump({name: [[list(labels), value] for labels, value in series.items()]
+                       for name, series in merged.items()}, fh)
+        os.replace(tmp, exited_path)
+        for path in exited:
+            os.remove(path)
+
+
+def collect():
+    """Merge the flushed values of every process."""
+    registry.flush(force=True)
+    pattern = os.path.join(settings.METRICS_DIR, '*.json')
+    _fold_exited(glob.glob(pattern))
+    with _locked(exclusive=False):
+        return _merge(glob.glob(pattern))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(merged):
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name, (kind, help_text, label_names, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(merged[name].items()):
+            if kind == 'counter':
+                lines.append(f'{name}{_labels(label_names, labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], value['buckets']):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(bound)
+                lines.append(f'{name}_bucket{_labels(label_names, labels, [("le", le)])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(label_names, labels)} {_number(value["sum"])}')
+            lines.append(f'{name}_count{_labels(label_names, labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
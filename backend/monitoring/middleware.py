@@ -0,0 +1,97 @@
+# monitoring/middleware.py
+import threading
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.utils.functional import SimpleLazyObject, empty
+
+from .metrics import registry
+from .querylog import querylog
+
+UNMATCHED = ('<unmatched>', '')
+
+
+class QueryStats:
+    """
+    Execute wrapper that counts and times every query of the request and feeds the query log.
+    Views may run queries on other threads with it (transport_app/dashboard.py).
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.count = 0
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.count += 1
+                self.duration += elapsed
+            querylog.record(sql, elapsed, None if many else params, self.context())
+
+    def context(self):
+        view, action = getattr(self.request, '_metrics_view', UNMATCHED)
+        # DRF authenticates inside the view and copies the user onto the Django request
+        user = getattr(self.request, 'user', None)
+        if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+            # The session's user isn't loaded yet; loading it runs a query, which would end up back here
+            return view or '', action, ''
+        role = getattr(user, 'role', '') if user is not None and user.is_authenticated else 'anonymous'
+        return view or '', action, role
+
+
+class MetricsMiddleware:
+    """
+    Records per-view latency, query count/time, response size and status code,
+    and adds a Server-Timing header. Views are labelled by their class (or
+    function) name and, for viewsets, the action that handled the request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryStats(request)
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        querylog.flush()
+        view, action = getattr(request, '_metrics_view', UNMATCHED)
+        if view is None:
+            return response
+        labels = (view, action, request.method)
+        registry.inc('http_requests_total', labels + (str(response.status_code),))
+        registry.observe('http_request_duration_seconds', labels, duration)
+        registry.observe('http_request_db_queries', labels, queries.count)
+        registry.observe('http_request_db_duration_seconds', labels, queries.duration)
+        if not response.streaming:
+            registry.observe('http_response_size_bytes', labels, len(response.content))
+        elif response.has_header('Content-Length'):
+            registry.observe('http_response_size_bytes', labels, int(response['Content-Length']))
+
+        response['Server-Timing'] = (
+            f'app;dur={duration * 1000:.1f}, '
+            f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries"'
+        )
+        registry.flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'skip_metrics', False):
+            request._metrics_view = (None, '')
+            return None
+        cls = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        name = cls.__name__ if cls is not None else getattr(view_func, '__name__', type(view_func).__name__)
+        actions = getattr(view_func, 'actions', None) or {}
+        request._metrics_view = (name, actions.get(request.method.lower(), ''))
+        return None
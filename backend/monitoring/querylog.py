@@ -0,0 +1,166 @@
+# monitoring/querylog.py
+import atexit
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger('monitoring.slow_queries')
+
+# Log-spaced duration buckets from 0.1 ms to ~6.5 s; percentiles are read from these
+BUCKETS = tuple(0.0001 * 2 ** i for i in range(17))
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST_RE = re.compile(r'\(\s*(?:(?:%s|\?)\s*,\s*)+(?:%s|\?)\s*\)')
+SPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """Normalized SQL (literals and IN lists collapsed) and a short hash of it."""
+    text = STRING_RE.sub('?', sql)
+    text = NUMBER_RE.sub('?', text)
+    text = text.replace('%s', '?')
+    text = PLACEHOLDER_LIST_RE.sub('(...)', text)
+    text = SPACE_RE.sub(' ', text).strip()
+    return hashlib.sha1(text.encode()).hexdigest()[:16], text
+
+
+def _redacted(value):
+    """
+    A sample parameter as written to METRICS_DIR. Strings and bytes may be emails,
+    password hashes or tokens and are blanked; numbers and dates are kept so the
+    sample can still be EXPLAINed with a similar plan.
+    """
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return ''
+
+
+def percentile(buckets, q):
+    """Upper bound of the bucket holding the q-th quantile (seconds)."""
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    rank = q * total
+    running = 0
+    for bound, count in zip(BUCKETS + (float('inf'),), buckets):
+        running += count
+        if running >= rank:
+            return bound if bound != float('inf') else BUCKETS[-1] * 2
+    return BUCKETS[-1] * 2
+
+
+class QueryLog:
+    """
+    Per-fingerprint query statistics of this process, flushed to
+    METRICS_DIR/queries/ like the request metrics so all workers can be merged.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.path = None
+        self.flushed_at = 0.0
+
+    def record(self, sql, duration, params=None, context=None):
+        key, text = fingerprint(sql)
+        view = ':'.join(part for part in (context or ())[:2] if part) or '<none>'
+        with self.lock:
+            entry = self.stats.get(key)
+            if entry is None:
+                if len(self.stats) >= settings.QUERYLOG_MAX_FINGERPRINTS:
+                    return
+                entry = self.stats[key] = {
+                    'sql': text, 'count': 0, 'total': 0.0, 'max': 0.0,
+                    'buckets': [0] * (len(BUCKETS) + 1), 'views': {}, 'sample': None,
+                }
+            entry['count'] += 1
+            entry['total'] += duration
+            entry['buckets'][bisect_left(BUCKETS, duration)] += 1
+            entry['views'][view] = entry['views'].get(view, 0) + 1
+            if duration >= entry['max']:
+                entry['max'] = duration
+                # The slowest instance is kept so its plan can be EXPLAINed later
+                entry['sample'] = [sql, [_redacted(p) for p in params] if isinstance(params, (list, tuple)) else None]
+
+        if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+            view_name, action, role = (tuple(context or ()) + ('', '', ''))[:3]
+            logger.warning(
+                'Slow query %.1f ms [%s] view=%s action=%s role=%s: %s',
+                duration * 1000, key, view_name or '-', action or '-', role or '-', sql[:2000],
+            )
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.stats))
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.flushed_at = now
+        if self.path is None and not self.stats:
+            return
+        directory = os.path.join(settings.METRICS_DIR, 'queries')
+        os.makedirs(directory, exist_ok=True)
+        if self.path is None:
+            self.path = os.path.join(directory, f'{os.getpid()}-{int(time.time() * 1000)}.json')
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump(self.snapshot(), fh)
+        os.replace(tmp, self.path)
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+
+querylog = QueryLog()
+atexit.register(querylog.flush, force=True)
+
+
+def collect():
+    """Merge the per-fingerprint statistics of every process."""
+    querylog.flush(force=True)
+    merged = {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, 'queries', '*.json')):
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        for key, entry in data.items():
+            current = merged.get(key)
+            if current is None:
+                merged[key] = entry
+                continue
+            current['count'] += entry['count']
+            current['total'] += entry['total']
+            current['buckets'] = [a + b for a, b in zip(current['buckets'], entry['buckets'])]
+            for view, count in entry['views'].items():
+                current['views'][view] = current['views'].get(view, 0) + count
+            if entry['max'] > current['max']:
+                current['max'], current['sample'] = entry['max'], entry['sample']
+    return merged
+
+
+def clear():
+    querylog.reset()
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, 'queries', '*.json')):
+        os.remove(path)
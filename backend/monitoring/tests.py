@@ -0,0 +1,72 @@
+# monitoring/tests.py
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from users.models import User
+from . import metrics
+from .querylog import QueryLog
+
+
+@override_settings(METRICS_DIR=tempfile.mkdtemp(prefix='metrics-tests-'))
+class MetricsMiddlewareTests(TestCase):
+    def test_session_authenticated_admin_page(self):
+        # The session's user is loaded by a query inside the execute wrapper (QueryStats.context)
+        admin = User.objects.create_superuser(
+            email='admin@example.com', password='secret', username='admin', first_name='Admin', last_name='Test',
+        )
+        self.client.force_login(admin)
+        response = self.client.get('/admin/', SERVER_NAME='localhost')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Server-Timing', response)
+
+
+class MetricsFilesTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = self.settings(METRICS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write(self, pid, count):
+        series = {'http_requests_total': [[['OrderViewSet', 'list', 'GET', '200'], count]]}
+        with open(os.path.join(self.directory, f'{pid}-1.json'), 'w') as fh:
+            json.dump(series, fh)
+
+    def test_files_of_exited_workers_are_folded(self):
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+        self.write(int(exited.stdout), 3)
+        self.write(os.getppid(), 4)
+        labels = ('OrderViewSet', 'list', 'GET', '200')
+        for _ in range(2):
+            self.assertEqual(metrics.collect()['http_requests_total'][labels], 7)
+        files = set(os.listdir(self.directory))
+        self.assertNotIn(f'{exited.stdout.strip()}-1.json', files)
+        self.assertLessEqual({metrics.EXITED_FILE, f'{os.getppid()}-1.json'}, files)
+
+
+class QueryLogTests(TestCase):
+    def test_sample_keeps_no_string_parameters(self):
+        log = QueryLog()
+        sql = 'SELECT id FROM users_user WHERE email = %s AND id > %s'
+        log.record(sql, 0.01, ['driver@example.com', 7], ('UserViewSet', 'list', 'admin'))
+        (entry,) = log.snapshot().values()
+        self.assertEqual(entry['sample'], [sql, ['', 7]])
+
+
+@override_settings(METRICS_DIR=tempfile.mkdtemp(prefix='metrics-tests-'), METRICS_TOKEN='scrape-token')
+class MetricsViewTests(TestCase):
+    def test_needs_the_token_by_default(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_allowed_ips_are_opt_in(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 200)
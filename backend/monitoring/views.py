@@ -0,0 +1,22 @@
+# monitoring/views.py
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .metrics import collect, render
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; open to a METRICS_TOKEN bearer token, and to METRICS_ALLOWED_IPS if set."""
+    token = settings.METRICS_TOKEN
+    auth = request.headers.get('Authorization', '')
+    allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS or (
+        token and hmac.compare_digest(auth, f'Bearer {token}')
+    )
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+metrics_view.skip_metrics = True
@@ -1,5 +1,11 @@
+# Served by any ASGI server, e.g. `uvicorn sms_transports.asgi:application`. The async
+# dashboard views (/api/transport/dashboard/async/...) then run on the event loop and
+# the DRF views in Django's thread pool, as under WSGI.
 import os
 from django.core.asgi import get_asgi_application
 
+from sms_transports.env import load_env
+
+load_env()
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sms_transports.settings')
 application = get_asgi_application()
\ No newline at end of file
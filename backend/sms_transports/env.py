@@ -0,0 +1,15 @@
+# sms_transports/env.py
+import os
+from pathlib import Path
+
+
+def load_env():
+    """
+    Load backend/.env (or DOTENV_PATH) into the environment, for manage.py and the
+    WSGI/ASGI entry points to call before the settings are imported. Variables that
+    are already set win.
+    """
+    path = Path(os.getenv('DOTENV_PATH', Path(__file__).resolve().parent.parent / '.env'))
+    if path.is_file():
+        from dotenv import load_dotenv
+        load_dotenv(path)
@@ -0,0 +1,58 @@
+# sms_transports/schema.py
+import functools
+import hashlib
+import logging
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import condition, require_GET
+from drf_yasg import openapi
+from drf_yasg.app_settings import swagger_settings
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+logger = logging.getLogger(__name__)
+
+API_INFO = openapi.Info(
+    title="SMS Transports API",
+    default_version='v1',
+    description="Transportation Management System API",
+    contact=openapi.Contact(email="admin@smstransports.com"),
+)
+
+# Serves the Swagger and ReDoc pages; both load the schema itself from SPEC_URL (schema_file_view)
+schema_view = get_schema_view(
+    API_INFO,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+
+def generate():
+    """The OpenAPI schema of the whole API as JSON bytes, as the public schema view would render it."""
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(API_INFO)
+    return OpenAPICodecJson(validators=[]).encode(generator.get_schema(request=None, public=True))
+
+
+@functools.cache
+def _schema():
+    """(body, etag) of the schema written by generate_schema, read once per process."""
+    try:
+        with open(settings.OPENAPI_SCHEMA_FILE, 'rb') as f:
+            body = f.read()
+    except FileNotFoundError:
+        logger.warning('%s not found; generating the schema in-process (run generate_schema at build time)',
+                       settings.OPENAPI_SCHEMA_FILE)
+        body = None
+    if body is None:
+        body = generate()
+    return body, hashlib.sha256(body).hexdigest()
+
+
+@require_GET
+@condition(etag_func=lambda request: _schema()[1])
+def schema_file_view(request):
+    response = HttpResponse(_schema()[0], content_type='application/json')
+    response['Cache-Control'] = f'public, max-age={settings.OPENAPI_SCHEMA_MAX_AGE}'
+    return response
@@ -1,10 +1,12 @@
 # settings.py (UPDATED VERSION)
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
-from dotenv import load_dotenv
+from decimal import Decimal
 
-load_dotenv()
+# Importing the settings has no side effects: .env is loaded by the entry points
+# (sms_transports/env.py) and no directories are created here.
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -30,9 +32,11 @@ INSTALLED_APPS = [
     'django_filters',
     'users',
     'transport_app',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.MetricsMiddleware',  # First, so it times the whole stack
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Keep this at the top
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -67,6 +71,15 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so concurrent writers
+            # queue on `timeout` instead of failing with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # On disk, so tests that write from several threads lock as above; the default
+        # in-memory test database fails them with "database table is locked"
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -98,7 +111,7 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 # Static files directories for development
-if DEBUG:
+if DEBUG and os.path.isdir(os.path.join(BASE_DIR, 'static')):
     STATICFILES_DIRS = [
         os.path.join(BASE_DIR, 'static'),
     ]
@@ -107,6 +120,26 @@ if DEBUG:
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are stored once per unique content (see transport_app/storage.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'transport_app.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Media is served through transport_app.media.ProtectedMediaView after a permission check.
+# 'accel' hands the transfer to nginx (X-Accel-Redirect), 'sendfile' to Apache/lighttpd
+# (X-Sendfile); anything else streams the file from Django.
+MEDIA_SERVE_MODE = os.getenv('MEDIA_SERVE_MODE', 'stream')
+MEDIA_ACCEL_REDIRECT_LOCATION = os.getenv('MEDIA_ACCEL_REDIRECT_LOCATION', '/protected-media/')
+MEDIA_URL_MAX_AGE = int(os.getenv('MEDIA_URL_MAX_AGE', 60 * 60))  # lifetime of signed media links
+
+# Unreferenced blobs younger than this are kept, so in-flight uploads are never collected
+CAS_GC_GRACE_SECONDS = int(os.getenv('CAS_GC_GRACE_SECONDS', 24 * 60 * 60))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
@@ -177,6 +210,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -197,8 +231,18 @@ SWAGGER_SETTINGS = {
         }
     },
     'USE_SESSION_AUTH': False,
+    # The UIs load the schema generated at build time instead of the one generated per request
+    'SPEC_URL': 'schema-json',
+}
+
+REDOC_SETTINGS = {
+    'SPEC_URL': 'schema-json',
 }
 
+# Written by `manage.py generate_schema` at build time and served from /api/schema.json
+OPENAPI_SCHEMA_FILE = os.getenv('OPENAPI_SCHEMA_FILE', os.path.join(BASE_DIR, 'openapi.json'))
+OPENAPI_SCHEMA_MAX_AGE = int(os.getenv('OPENAPI_SCHEMA_MAX_AGE', 60 * 60))
+
 # Email settings (for welcome emails)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For development
 # For production:
@@ -209,10 +253,75 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For developm
 # EMAIL_HOST_USER = 'your-email@gmail.com'
 # EMAIL_HOST_PASSWORD = 'your-password'
 
-# Create necessary directories
-os.makedirs(os.path.join(BASE_DIR, 'static'), exist_ok=True)
-os.makedirs(os.path.join(BASE_DIR, 'media'), exist_ok=True)
-os.makedirs(os.path.join(BASE_DIR, 'templates'), exist_ok=True)
+# Document expiry alerts (transport_app/expiry.py): days-before-expiry windows that
+# each trigger one alert, and how far back already-expired documents are still reported
+EXPIRY_ALERT_WINDOWS = [int(d) for d in os.getenv('EXPIRY_ALERT_WINDOWS', '30,15,7,1').split(',')]
+EXPIRY_ALERT_LOOKBACK_DAYS = int(os.getenv('EXPIRY_ALERT_LOOKBACK_DAYS', 30))
+
+# Fleet analytics results are cached until the underlying data changes, at most this long
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv('ANALYTICS_CACHE_TIMEOUT', 15 * 60))
+
+# Seconds before a worker rebuilds its in-memory truck availability index from the database
+SCHEDULER_INDEX_TTL = int(os.getenv('SCHEDULER_INDEX_TTL', 300))
+
+# Driver ledgers store a balance checkpoint every this many entries
+LEDGER_CHECKPOINT_INTERVAL = int(os.getenv('LEDGER_CHECKPOINT_INTERVAL', 200))
+
+# Order reconciliation ignores differences up to this many rupees
+RECONCILIATION_TOLERANCE = Decimal(os.getenv('RECONCILIATION_TOLERANCE', '1.00'))
+
+# archive_orders moves delivered and cancelled orders untouched for this many days to the archive tables
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 365))
+
+# prune_changes deletes change log entries (transport_app/changes.py) older than this;
+# apps that have not synced for longer download their lists again
+CHANGES_RETENTION_DAYS = int(os.getenv('CHANGES_RETENTION_DAYS', 30))
+
+# Webhooks (transport_app/webhooks.py), sent by deliver_webhooks: up to WEBHOOK_BATCH_SIZE
+# events per POST, WEBHOOK_CONCURRENCY endpoints at a time. A failed POST is retried after
+# WEBHOOK_RETRY_SECONDS, doubling up to WEBHOOK_RETRY_MAX_SECONDS; after WEBHOOK_MAX_ATTEMPTS
+# its events are marked failed and the endpoint's queue moves on.
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', 50))
+WEBHOOK_CONCURRENCY = int(os.getenv('WEBHOOK_CONCURRENCY', 4))
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', 10))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', 8))
+WEBHOOK_RETRY_SECONDS = int(os.getenv('WEBHOOK_RETRY_SECONDS', 30))
+WEBHOOK_RETRY_MAX_SECONDS = int(os.getenv('WEBHOOK_RETRY_MAX_SECONDS', 6 * 3600))
+# Endpoints must resolve to public addresses; allow private ones only for local development
+# (e.g. the webhook_receiver command)
+WEBHOOK_ALLOW_PRIVATE_ADDRESSES = os.getenv('WEBHOOK_ALLOW_PRIVATE_ADDRESSES', 'False') == 'True'
+
+# Threads (each with its own database connection) that run the queries of the async
+# dashboard views concurrently (transport_app/dashboard.py), shared by all requests
+DASHBOARD_QUERY_WORKERS = int(os.getenv('DASHBOARD_QUERY_WORKERS', 8))
+
+# Processes that render invoice and statement PDFs for render_documents (transport_app/documents.py)
+DOCUMENT_WORKERS = int(os.getenv('DOCUMENT_WORKERS', min(4, os.cpu_count() or 1)))
+# Seconds after which a document still being rendered is assumed lost with its worker and taken again
+DOCUMENT_CLAIM_TIMEOUT = int(os.getenv('DOCUMENT_CLAIM_TIMEOUT', 15 * 60))
+
+# GPS tracks (transport_app/tracking.py): pings per stored segment and per posted batch, and
+# the default simplification of a path for the map (metres off the true path, points returned)
+TRACK_SEGMENT_POINTS = int(os.getenv('TRACK_SEGMENT_POINTS', 720))
+TRACK_MAX_BATCH = int(os.getenv('TRACK_MAX_BATCH', 1000))
+TRACK_TOLERANCE_METRES = float(os.getenv('TRACK_TOLERANCE_METRES', 10))
+TRACK_MAX_POINTS = int(os.getenv('TRACK_MAX_POINTS', 2000))
+
+# Request metrics (monitoring app): each worker process writes its values to
+# METRICS_DIR and /metrics merges them (and folds the files of exited workers
+# into one). Clear the directory when deploying.
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'sms_transports_metrics'))
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+# /metrics answers requests with the METRICS_TOKEN bearer token. METRICS_ALLOWED_IPS
+# (comma-separated) also opens it to those client addresses; leave it empty behind a
+# proxy, where every request comes from the proxy's address.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip]
+
+# Queries slower than this are logged with their view, action and user role
+# (logger monitoring.slow_queries); all queries are aggregated per SQL fingerprint
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+QUERYLOG_MAX_FINGERPRINTS = int(os.getenv('QUERYLOG_MAX_FINGERPRINTS', 2000))
 
 # Logging configuration
 LOGGING = {
@@ -233,5 +342,10 @@ LOGGING = {
             'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
             'propagate': False,
         },
+        'monitoring.slow_queries': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
\ No newline at end of file
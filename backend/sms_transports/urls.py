@@ -1,31 +1,22 @@
 # sms_transports/urls.py
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="SMS Transports API",
-        default_version='v1',
-        description="Transportation Management System API",
-        contact=openapi.Contact(email="admin@smstransports.com"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from transport_app.media import ProtectedMediaView
+from monitoring.views import metrics_view
+from .schema import schema_view, schema_file_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('users.urls')),
     path('api/transport/', include('transport_app.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/schema.json', schema_file_view, name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), ProtectedMediaView.as_view(), name='protected-media'),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
@@ -1,5 +1,8 @@
 import os
 from django.core.wsgi import get_wsgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sms_transports. settings')
+from sms_transports.env import load_env
+
+load_env()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sms_transports.settings')
 application = get_wsgi_application()
\ No newline at end of file
@@ -0,0 +1,116 @@
+# transport_app/activity.py
+import base64
+import binascii
+import heapq
+from operator import itemgetter
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .archive import ARCHIVED_MODELS
+from .models import Expense, MoneyTransfer, TimelineEvent
+
+# The feed's kinds: model, the time it is ordered by, and the relations its serializer reads
+KINDS = {
+    'event': (TimelineEvent, 'created_at', ('created_by', 'order')),
+    'expense': (Expense, 'date', ('added_by', 'order')),
+    'transfer': (MoneyTransfer, 'created_at', ('created_by', 'order')),
+}
+PAGE_SIZE = 50
+
+
+def encode_cursor(key):
+    time, kind, pk = key
+    return base64.urlsafe_b64encode(f'{time.isoformat()}|{kind}|{pk}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """The (time, kind, id) key a cursor points at; ValueError if it is not one of ours."""
+    try:
+        time, kind, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError('Invalid cursor.')
+    time = parse_datetime(time)
+    if time is None or kind not in KINDS or not pk.isdigit():
+        raise ValueError('Invalid cursor.')
+    return time, kind, int(pk)
+
+
+def order_streams(order, archived=False):
+    """(kind, rows) of an order's timeline, expenses and transfers."""
+    return [
+        (kind, (ARCHIVED_MODELS[model] if archived else model).objects.filter(order=order))
+        for kind, (model, _, _) in KINDS.items()
+    ]
+
+
+def user_streams(role, user_id, **filters):
+    """
+    (kind, rows) of everything in an owner's or a driver's scope (the models'
+    ROLE_SCOPES for ``role``), one stream per scope column so each reads an
+    index in time order; ``filters`` narrow every stream.
+    """
+    return [
+        (kind, model.objects.filter(**{column: user_id}, **filters))
+        for kind, (model, _, _) in KINDS.items()
+        for column in model.ROLE_SCOPES.get(role, ())
+    ]
+
+
+def _older(rows, kind, before):
+    """``rows`` that come after the key ``before`` in the feed (newest first), in feed order."""
+    time_field = KINDS[kind][1]
+    if before is not None:
+        time, before_kind, pk = before
+        # Keys are compared as (time, kind, id); within one stream the kind is fixed
+        if kind < before_kind:
+            rows = rows.filter(**{f'{time_field}__lte': time})
+        elif kind > before_kind:
+            rows = rows.filter(**{f'{time_field}__lt': time})
+        else:
+            rows = rows.filter(Q(**{f'{time_field}__lt': time}) | Q(**{time_field: time, 'pk__lt': pk}))
+    return rows.order_by(f'-{time_field}', '-pk')
+
+
+def _stream(kind, rows, before, batch_size):
+    """(key, row) of ``rows`` after ``before``, fetched lazily: ``batch_size`` rows, then twice as many each time."""
+    time_field, related = KINDS[kind][1:]
+    rows = rows.select_related(*related)
+    while True:
+        batch = list(_older(rows, kind, before)[:batch_size])
+        for row in batch:
+            yield (getattr(row, time_field), kind, row.pk), row
+        if len(batch) < batch_size:
+            return
+        before = (getattr(batch[-1], time_field), kind, batch[-1].pk)
+        batch_size *= 2
+
+
+def page(streams, cursor=None, limit=PAGE_SIZE):
+    """
+    Up to ``limit`` rows of ``streams`` interleaved newest first, after ``cursor``.
+
+    The streams are merged as they are read, so each table is only queried for
+    about as many rows as make it onto the page: a page spread evenly over the
+    streams costs one query each.
+    """
+    before = decode_cursor(cursor) if cursor else None
+    batch_size = limit // len(KINDS) + 1
+    merged = heapq.merge(
+        *(_stream(kind, rows, before, batch_size) for kind, rows in streams),
+        key=itemgetter(0), reverse=True,
+    )
+    results, last = [], None
+    has_more = False
+    for key, row in merged:
+        if key == last:
+            continue  # the same row from a second scope column
+        if len(results) == limit:
+            has_more = True
+            break
+        results.append((key[1], row))
+        last = key
+    return {
+        'results': results,
+        'next_cursor': encode_cursor(last) if has_more else None,
+    }
@@ -1,40 +1,141 @@
 # transport_app/admin.py
 from django.contrib import admin
-from .models import Truck, TransportationOrder, Expense, MoneyTransfer, TimelineEvent
+from .models import (
+    Truck, TransportationOrder, Expense, MoneyTransfer, TimelineEvent, Place, PlaceAlias,
+    ReconciliationRun, ReconciliationResult, ArchivedOrder, PurgeJob, ChangeLogEntry,
+    WebhookSubscription, WebhookDelivery, Document, DocumentRun, TruckPosition,
+)
+from .largetables import AutocompleteFilter, LargeTableAdmin
 
 @admin.register(Truck)
-class TruckAdmin(admin.ModelAdmin):
+class TruckAdmin(LargeTableAdmin):
     list_display = ('truck_number', 'model', 'make', 'owner', 'status', 'assigned_driver')
-    list_filter = ('status', 'owner', 'fuel_type')
+    list_filter = ('status', ('owner', AutocompleteFilter), 'fuel_type')
     search_fields = ('truck_number', 'model', 'make')
     readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('owner', 'assigned_driver')
+    autocomplete_fields = ('owner', 'assigned_driver')
 
 @admin.register(TransportationOrder)
-class TransportationOrderAdmin(admin.ModelAdmin):
+class TransportationOrderAdmin(LargeTableAdmin):
     list_display = ('order_number', 'load_type', 'pickup_location', 'delivery_location', 
                     'status', 'total_amount', 'owner', 'driver')
-    list_filter = ('status', 'owner', 'driver')
+    # pickup_date as a filter rather than a date_hierarchy, which queries the distinct dates on every page
+    list_filter = ('status', ('owner', AutocompleteFilter), ('driver', AutocompleteFilter), 'pickup_date')
     search_fields = ('order_number', 'load_type', 'pickup_location', 'delivery_location')
     readonly_fields = ('created_at', 'updated_at', 'order_number')
-    date_hierarchy = 'pickup_date'
+    list_select_related = ('owner', 'driver')
+    autocomplete_fields = ('truck', 'driver', 'owner', 'created_by')
 
 @admin.register(Expense)
-class ExpenseAdmin(admin.ModelAdmin):
+class ExpenseAdmin(LargeTableAdmin):
     list_display = ('order', 'category', 'amount', 'date', 'added_by')
-    list_filter = ('category', 'date')
+    list_filter = ('category', 'date', ('order', AutocompleteFilter))
     search_fields = ('description', 'order__order_number')
     readonly_fields = ('date',)
+    list_select_related = ('order', 'added_by')
+    autocomplete_fields = ('order', 'added_by')
 
 @admin.register(MoneyTransfer)
-class MoneyTransferAdmin(admin.ModelAdmin):
+class MoneyTransferAdmin(LargeTableAdmin):
     list_display = ('order', 'transfer_type', 'amount', 'status', 'created_at')
-    list_filter = ('transfer_type', 'status')
+    list_filter = ('transfer_type', 'status', ('order', AutocompleteFilter))
     search_fields = ('transaction_id', 'description')
     readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('order',)
+    autocomplete_fields = ('order', 'created_by')
 
 @admin.register(TimelineEvent)
-class TimelineEventAdmin(admin.ModelAdmin):
+class TimelineEventAdmin(LargeTableAdmin):
     list_display = ('order', 'event_type', 'title', 'created_by', 'created_at')
-    list_filter = ('event_type',)
+    list_filter = ('event_type', ('order', AutocompleteFilter))
     search_fields = ('title', 'description')
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    readonly_fields = ('created_at',)
+    list_select_related = ('order', 'created_by')
+    autocomplete_fields = ('order', 'related_expense', 'related_transfer', 'created_by')
+
+class PlaceAliasInline(admin.TabularInline):
+    model = PlaceAlias
+    extra = 0
+
+@admin.register(Place)
+class PlaceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'key', 'created_at')
+    search_fields = ('name', 'key', 'aliases__raw_key')
+    inlines = [PlaceAliasInline]
+
+@admin.register(ReconciliationRun)
+class ReconciliationRunAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'full', 'status', 'orders_checked', 'issues_found', 'finished_at')
+    list_filter = ('status', 'full')
+
+@admin.register(ReconciliationResult)
+class ReconciliationResultAdmin(admin.ModelAdmin):
+    list_display = ('order', 'driver_float', 'overspend', 'unreturned_float', 'balance_drift', 'checked_at')
+    list_filter = ('has_issues', 'overspend', 'unreturned_float', 'balance_drift')
+    search_fields = ('order__order_number',)
+    list_select_related = ('order',)
+
+@admin.register(PurgeJob)
+class PurgeJobAdmin(admin.ModelAdmin):
+    list_display = ('object_repr', 'model_label', 'status', 'rows_deleted', 'requested_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'model_label')
+    readonly_fields = ('deleted_counts', 'rows_deleted', 'error', 'created_at', 'started_at', 'finished_at')
+
+@admin.register(ChangeLogEntry)
+class ChangeLogEntryAdmin(LargeTableAdmin):
+    list_display = ('id', 'model', 'object_id', 'action', 'owner', 'driver', 'created_at')
+    list_filter = ('model', 'action')
+    readonly_fields = ('model', 'object_id', 'action', 'owner', 'driver', 'creator', 'created_at')
+    list_select_related = ('owner', 'driver')
+
+@admin.register(WebhookSubscription)
+class WebhookSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ('url', 'user', 'is_active', 'failures', 'next_attempt_at', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('url',)
+    readonly_fields = ('secret', 'failures', 'next_attempt_at', 'locked_until', 'last_error', 'created_at', 'updated_at')
+    list_select_related = ('user',)
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(LargeTableAdmin):
+    list_display = ('id', 'event_type', 'subscription', 'status', 'attempts', 'created_at', 'delivered_at')
+    list_filter = ('status', 'event_type')
+    readonly_fields = ('payload', 'attempts', 'last_error', 'created_at', 'delivered_at')
+    list_select_related = ('subscription__user',)
+
+@admin.register(TruckPosition)
+class TruckPositionAdmin(admin.ModelAdmin):
+    list_display = ('truck', 'latitude', 'longitude', 'recorded_at', 'order', 'driver')
+    list_select_related = ('truck', 'order', 'driver')
+    readonly_fields = ('truck', 'order', 'driver', 'latitude', 'longitude', 'recorded_at')
+
+@admin.register(DocumentRun)
+class DocumentRunAdmin(admin.ModelAdmin):
+    list_display = ('period', 'invoices', 'status', 'total', 'rendered', 'reused', 'failed', 'started_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('total', 'rendered', 'reused', 'failed', 'error', 'started_at', 'finished_at')
+
+@admin.register(Document)
+class DocumentAdmin(LargeTableAdmin):
+    list_display = ('id', 'kind', 'owner', 'order', 'period', 'status', 'requested_at', 'rendered_at')
+    list_filter = ('kind', 'status', ('owner', AutocompleteFilter))
+    readonly_fields = ('archived_order', 'file', 'source_version', 'error', 'run', 'claimed_at', 'requested_at',
+                       'rendered_at')
+    list_select_related = ('owner', 'order')
+    autocomplete_fields = ('owner', 'order')
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(LargeTableAdmin):
+    list_display = ('order_number', 'load_type', 'pickup_location', 'delivery_location',
+                    'status', 'total_amount', 'owner', 'driver')
+    list_filter = ('status', ('owner', AutocompleteFilter), 'pickup_date')
+    search_fields = ('order_number',)
+    list_select_related = ('owner', 'driver')
+    
+    # Archived rows are moved back with archive_orders --restore, never edited in place
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
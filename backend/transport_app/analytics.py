@@ -0,0 +1,204 @@
+# transport_app/analytics.py
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from users.models import User
+from .models import Truck, TransportationOrder, Expense, ArchivedOrder, ArchivedExpense
+from .tracking import truck_distances
+
+# numpy is imported by the functions that use it: every worker loads this module at
+# startup (for bump_version), but only the fleet analytics endpoint needs numpy.
+VERSION_KEY = 'fleet_analytics:version'
+SECONDS_PER_DAY = 86400.0
+
+
+def bump_version():
+    """Invalidate every cached result; called from the order/expense/truck signals."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def parse_period(start, end):
+    """Return an aware [start, end) datetime range from YYYY-MM-DD strings (default: last 365 days)."""
+    today = timezone.localdate()
+    end_date = datetime.strptime(end, '%Y-%m-%d').date() if end else today
+    start_date = datetime.strptime(start, '%Y-%m-%d').date() if start else end_date - timedelta(days=365)
+    if start_date > end_date:
+        raise ValueError('start must not be after end.')
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.combine(start_date, time.min, tzinfo=tz),
+        datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
+def _column(values, dtype='float64'):
+    import numpy as np
+    return np.fromiter(values, dtype=dtype, count=len(values) if hasattr(values, '__len__') else -1)
+
+
+def load_order_columns(orders, start, end, archived_orders=None):
+    """
+    Pull the orders in the period as numpy columns, with expenses summed per order in SQL.
+
+    ``archived_orders`` (ArchivedOrder rows, same ids and columns) are appended,
+    so archiving does not change the figures for past periods.
+    """
+    import numpy as np
+    sources = [(orders, Expense)]
+    if archived_orders is not None:
+        sources.append((archived_orders, ArchivedExpense))
+    rows, expense_rows = [], []
+    for queryset, expense_model in sources:
+        queryset = queryset.filter(pickup_date__lt=end, pickup_date__gte=start).exclude(status='cancelled')
+        rows += queryset.values_list(
+            'id', 'truck_id', 'driver_id', 'total_amount',
+            'pickup_date', 'actual_delivery_date', 'estimated_delivery_date',
+        )
+        expense_rows += (
+            expense_model.objects.filter(order__in=queryset).values('order_id').annotate(total=Sum('amount'))
+            .values_list('order_id', 'total')
+        )
+    if not rows:
+        return None
+
+    ids, truck_ids, driver_ids, amounts, pickups, delivered, estimated = zip(*rows)
+    cols = {
+        'id': _column(ids, np.int64),
+        'truck_id': _column((t or -1 for t in truck_ids), np.int64),
+        'driver_id': _column((d or -1 for d in driver_ids), np.int64),
+        'revenue': _column(float(a) for a in amounts),
+        'start': _column(p.timestamp() for p in pickups),
+        'end': _column((a or e).timestamp() for a, e in zip(delivered, estimated)),
+    }
+
+    cols['expenses'] = np.zeros(len(ids))
+    if expense_rows:
+        order_ids, totals = zip(*expense_rows)
+        order_ids = _column(order_ids, np.int64)
+        # Join expenses to orders by id: sort once, then binary-search every expense row.
+        order_sort = np.argsort(cols['id'])
+        positions = order_sort[np.searchsorted(cols['id'], order_ids, sorter=order_sort)]
+        np.add.at(cols['expenses'], positions, _column(float(t) for t in totals))
+
+    # Only the part of each trip inside the period counts towards trip days.
+    period = (start.timestamp(), end.timestamp())
+    cols['trip_days'] = np.clip(
+        np.minimum(cols['end'], period[1]) - np.maximum(cols['start'], period[0]), 0, None
+    ) / SECONDS_PER_DAY
+    return cols
+
+
+def group_metrics(cols, keys, group_ids, period_days):
+    """Aggregate per group with bincount; groups with no orders get zeros (fully idle)."""
+    import numpy as np
+    n = len(group_ids)
+    if cols is None or n == 0:
+        orders = revenue = expenses = trip_days = np.zeros(n)
+    else:
+        # Map each order to its group slot; orders outside the axis (e.g. no truck) are dropped.
+        sort = np.argsort(group_ids)
+        idx = sort[np.minimum(np.searchsorted(group_ids, keys, sorter=sort), n - 1)]
+        matched = group_ids[idx] == keys
+        slots = idx[matched]
+
+        def total(values):
+            return np.bincount(slots, weights=values[matched], minlength=n)
+
+        orders = np.bincount(slots, minlength=n).astype(np.float64)
+        revenue = total(cols['revenue'])
+        expenses = total(cols['expenses'])
+        trip_days = total(cols['trip_days'])
+
+    trip_days = np.minimum(trip_days, period_days)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'orders': orders,
+            'revenue': revenue,
+            'expenses': expenses,
+            'profit': revenue - expenses,
+            'trip_days': trip_days,
+            'idle_days': period_days - trip_days,
+            'utilization': trip_days / period_days if period_days else np.zeros(n),
+            'profit_per_order': np.where(orders > 0, (revenue - expenses) / orders, 0.0),
+        }
+
+
+def fleet_metrics(user, group_by, start, end, owner_id=None):
+    """
+    Per-truck or per-driver profitability and utilisation for ``user``'s scope.
+    Per truck also the distance driven in the period, from the GPS tracks
+    (transport_app/tracking.py), and the expenses per km of it; a truck without
+    a track in the period has neither.
+
+    Results are cached until an order, expense or truck changes (see bump_version)
+    or ANALYTICS_CACHE_TIMEOUT expires; new pings only show after the timeout.
+    """
+    import numpy as np
+    version = cache.get(VERSION_KEY, 0)
+    cache_key = f'fleet_analytics:{version}:{user.pk}:{group_by}:{owner_id}:{start.isoformat()}:{end.isoformat()}'
+    result = cache.get(cache_key)
+    if result is not None:
+        return result
+
+    orders = TransportationOrder.objects.for_user(user)
+    archived = ArchivedOrder.objects.for_user(user)
+    trucks = Truck.objects.for_user(user)
+    if user.role == 'admin' and owner_id:
+        orders, archived = orders.filter(owner_id=owner_id), archived.filter(owner_id=owner_id)
+        trucks = trucks.filter(owner_id=owner_id)
+
+    cols = load_order_columns(orders, start, end, archived_orders=archived)
+    period_days = (end - start).total_seconds() / SECONDS_PER_DAY
+
+    if group_by == 'truck':
+        axis = list(trucks.order_by('id').values_list('id', 'truck_number'))
+        group_ids = _column((row[0] for row in axis), np.int64)
+        labels = [row[1] for row in axis]
+        metrics = group_metrics(cols, cols['truck_id'] if cols else None, group_ids, period_days)
+        # Expenses of the period over the distance of the period; the odometer reading
+        # (current_mileage) covers the truck's whole life, not the period
+        distances = truck_distances(group_ids.tolist(), start, end)
+        metrics['distance_km'] = _column(distances.get(truck_id, 0.0) / 1000 for truck_id in group_ids.tolist())
+        with np.errstate(divide='ignore', invalid='ignore'):
+            metrics['cost_per_km'] = np.where(
+                metrics['distance_km'] > 0, metrics['expenses'] / metrics['distance_km'], 0.0,
+            )
+    else:
+        driver_ids = set(cols['driver_id'][cols['driver_id'] > 0].tolist()) if cols else set()
+        if user.role == 'driver':
+            driver_ids = {user.pk}
+        axis = list(
+            User.objects.filter(id__in=driver_ids).order_by('id').values_list('id', 'first_name', 'last_name')
+        )
+        group_ids = _column((row[0] for row in axis), np.int64)
+        labels = [f"{row[1]} {row[2]}" for row in axis]
+        metrics = group_metrics(cols, cols['driver_id'] if cols else None, group_ids, period_days)
+
+    rows = []
+    for i, group_id in enumerate(group_ids.tolist()):
+        row = {'id': group_id, 'label': labels[i]}
+        for name, values in metrics.items():
+            row[name] = int(values[i]) if name == 'orders' else round(float(values[i]), 2)
+        rows.append(row)
+    rows.sort(key=lambda r: r['profit'], reverse=True)
+
+    totals = {name: round(float(values.sum()), 2) for name, values in metrics.items()
+              if name not in ('utilization', 'profit_per_order', 'cost_per_km')}
+    totals['orders'] = int(totals['orders'])
+    result = {
+        'group_by': group_by,
+        'start': start.date().isoformat(),
+        'end': (end - timedelta(days=1)).date().isoformat(),
+        'period_days': round(period_days, 2),
+        'totals': totals,
+        'results': rows,
+    }
+    cache.set(cache_key, result, settings.ANALYTICS_CACHE_TIMEOUT)
+    return result
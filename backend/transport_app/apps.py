@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class TransportAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'transport_app'
\ No newline at end of file
+    name = 'transport_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
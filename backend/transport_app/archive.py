@@ -0,0 +1,165 @@
+# transport_app/archive.py
+import operator
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from . import changes
+from .models import (
+    TransportationOrder, Expense, MoneyTransfer, TimelineEvent, Document,
+    ArchivedOrder, ArchivedExpense, ArchivedTransfer, ArchivedTimelineEvent, TrackSegment, ArchivedTrackSegment,
+)
+
+# Live model, archive model and the column holding the order id, in insert order
+# (parents first). Deletes run in the reverse order.
+TABLES = (
+    (TransportationOrder, ArchivedOrder, 'id'),
+    (Expense, ArchivedExpense, 'order_id'),
+    (MoneyTransfer, ArchivedTransfer, 'order_id'),
+    (TimelineEvent, ArchivedTimelineEvent, 'order_id'),
+    (TrackSegment, ArchivedTrackSegment, 'order_id'),
+)
+ARCHIVED_MODELS = dict((live, archived) for live, archived, _ in TABLES)
+FINAL_STATUSES = ('delivered', 'cancelled')
+
+
+def candidates(cutoff):
+    """Finished orders with no change to the order, its expenses or its transfers since ``cutoff``."""
+    return TransportationOrder.objects.filter(status__in=FINAL_STATUSES, updated_at__lt=cutoff).exclude(
+        Exists(Expense.objects.filter(order=OuterRef('pk'), updated_at__gte=cutoff))
+    ).exclude(
+        Exists(MoneyTransfer.objects.filter(order=OuterRef('pk'), updated_at__gte=cutoff))
+    )
+
+
+def _move(order_ids, source, target):
+    """Copy the rows of ``order_ids`` between the live and archive tables, then delete the originals."""
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(order_ids))
+    with connection.cursor() as cursor:
+        for live, archived, key in TABLES:
+            src, dst = source(live, archived), target(live, archived)
+            columns = ', '.join(quote(f.column) for f in live._meta.concrete_fields)
+            cursor.execute(
+                f'INSERT INTO {quote(dst._meta.db_table)} ({columns}) '
+                f'SELECT {columns} FROM {quote(src._meta.db_table)} WHERE {quote(key)} IN ({placeholders})',
+                order_ids,
+            )
+        # Only rows that were copied are deleted; a row added meanwhile keeps its
+        # order referenced and fails the batch instead of being lost.
+        for live, archived, key in reversed(TABLES):
+            src, dst = source(live, archived), target(live, archived)
+            cursor.execute(
+                f'DELETE FROM {quote(src._meta.db_table)} WHERE id IN '
+                f'(SELECT id FROM {quote(dst._meta.db_table)} WHERE {quote(key)} IN ({placeholders}))',
+                order_ids,
+            )
+
+
+def _unlink_events(events, order_ids):
+    """Clear event links that cross the batch boundary; they would break a foreign key on either side."""
+    for field in ('related_expense', 'related_transfer'):
+        events.filter(
+            Q(order_id__in=order_ids) ^ Q(**{f'{field}__order_id__in': order_ids})
+        ).exclude(**{field: None}).update(**{field: None})
+
+
+def _detach(order_ids):
+    """Apply on_delete for rows outside the archive that point at the orders being moved."""
+    # Invoices stay with their order: they point at its archived row from now on
+    Document.objects.filter(order_id__in=order_ids).update(archived_order_id=F('order_id'), order=None)
+    # include_hidden: related_objects leaves out relations with related_name='+'
+    # (e.g. TruckPosition.order), and those rows block the delete just the same
+    for relation in TransportationOrder._meta.get_fields(include_hidden=True):
+        if not (relation.auto_created and not relation.concrete and (relation.one_to_many or relation.one_to_one)):
+            continue
+        if relation.related_model in ARCHIVED_MODELS:
+            continue
+        rows = relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': order_ids})
+        if relation.on_delete is models.SET_NULL:
+            rows.update(**{relation.field.name: None})
+        else:
+            # Derived per-order state such as reconciliation results; recomputed after a restore
+            rows.delete()
+    _unlink_events(TimelineEvent.objects.all(), order_ids)
+
+
+def archive_orders(days=None, batch_size=500, limit=None, stdout=None):
+    """
+    Move finished orders older than ``days`` (ARCHIVE_AFTER_DAYS) and their
+    dependents to the archive tables, one transaction per batch.
+
+    Rows are moved with plain SQL, so no signals fire: lane rollups, ledger
+    balances and file references already count archived rows, and nothing
+    derived from the live tables has to be recomputed. The change log only
+    records that the rows left the live lists.
+    """
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    moved = 0
+    while limit is None or moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - moved)
+        with transaction.atomic():
+            order_ids = list(
+                candidates(cutoff).select_for_update().order_by('pk').values_list('pk', flat=True)[:size]
+            )
+            if not order_ids:
+                break
+            _detach(order_ids)
+            changes.record_rows(TransportationOrder._base_manager.filter(pk__in=order_ids), 'delete')
+            changes.record_order_rows(order_ids, 'delete')
+            _move(order_ids, source=lambda live, archived: live, target=lambda live, archived: archived)
+        moved += len(order_ids)
+        if stdout:
+            stdout.write(f'  archived {moved} orders')
+    return moved
+
+
+def restore_orders(order_ids):
+    """Move archived orders back to the live tables (the reverse of archive_orders)."""
+    order_ids = list(ArchivedOrder.objects.filter(pk__in=order_ids).values_list('pk', flat=True))
+    if order_ids:
+        with transaction.atomic():
+            _unlink_events(ArchivedTimelineEvent.objects.all(), order_ids)
+            _move(order_ids, source=lambda live, archived: archived, target=lambda live, archived: live)
+            Document.objects.filter(archived_order_id__in=order_ids).update(
+                order_id=F('archived_order_id'), archived_order=None,
+            )
+            changes.record_rows(TransportationOrder._base_manager.filter(pk__in=order_ids), 'upsert')
+            changes.record_order_rows(order_ids, 'upsert')
+    return len(order_ids)
+
+
+class ArchiveUnion:
+    """
+    Live and archived rows as one ordered, sliceable sequence, for the paginator.
+
+    Both querysets must be ordered the same way; a page is the merge of the first
+    ``stop`` rows of each, so deep pages cost more than shallow ones.
+    """
+    ordered = True
+
+    def __init__(self, live, archived):
+        self.querysets = (live, archived)
+        self.ordering = list(live.query.order_by or archived.query.order_by or live.model._meta.ordering)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        rows = [row for queryset in self.querysets for row in queryset[:stop]]
+        # Stable sorts, least significant key first, give a mixed-direction ordering
+        for field in reversed(self.ordering + ['-pk']):
+            name = field.lstrip('-')
+            value = operator.attrgetter(name.replace('__', '.'))
+            rows.sort(key=lambda row: (value(row) is not None, value(row)), reverse=field.startswith('-'))
+        return rows[start:stop]
@@ -0,0 +1,146 @@
+# transport_app/changes.py
+import functools
+import heapq
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Truck, TransportationOrder, Expense, MoneyTransfer, TimelineEvent, ChangeLogEntry
+
+# Synced models by the name the apps know them by (their API route)
+FEED_MODELS = {
+    'trucks': Truck,
+    'orders': TransportationOrder,
+    'expenses': Expense,
+    'transfers': MoneyTransfer,
+    'timeline': TimelineEvent,
+}
+FEED_NAMES = {model: name for name, model in FEED_MODELS.items()}
+ORDER_ROWS = (Expense, MoneyTransfer, TimelineEvent)
+PAGE_SIZE = 500
+
+_muted = ContextVar('changes_muted', default=False)
+
+
+@functools.cache
+def scope_columns(model):
+    """(model field, entry field) pairs: the model's ROLE_SCOPES columns, as stored on its entries."""
+    return [
+        (field, column)
+        for role, columns in ChangeLogEntry.ROLE_SCOPES.items()
+        for field, column in zip(model.ROLE_SCOPES.get(role, ()), columns)
+    ]
+
+
+def scope_of(instance):
+    return {column: getattr(instance, f'{field}_id') for field, column in scope_columns(type(instance))}
+
+
+def record(instance, action, scope=None):
+    """Log one save (``'upsert'``) or delete of ``instance``, visible to ``scope`` (default: its current one)."""
+    if _muted.get():
+        return
+    scope = scope_of(instance) if scope is None else scope
+    ChangeLogEntry.objects.create(
+        model=FEED_NAMES[type(instance)], object_id=instance.pk, action=action,
+        **{f'{column}_id': value for column, value in scope.items()},
+    )
+
+
+def record_rows(rows, action):
+    """Log ``action`` for every row of ``rows``, for changes made with a queryset update; one INSERT per batch."""
+    model = rows.model
+    if _muted.get() or model not in FEED_NAMES:
+        return
+    fields = scope_columns(model)
+    values = rows.order_by().values_list('pk', *(f'{field}_id' for field, _ in fields))
+    ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(
+            model=FEED_NAMES[model], object_id=row[0], action=action,
+            **{f'{column}_id': value for (_, column), value in zip(fields, row[1:])},
+        )
+        for row in values
+    ], batch_size=1000)
+
+
+def record_order_rows(orders, action):
+    """Log ``action`` for the expenses, transfers and timeline events of ``orders`` (ids or a queryset)."""
+    for model in ORDER_ROWS:
+        record_rows(model._base_manager.filter(order__in=orders), action)
+
+
+@contextmanager
+def muted(mute=True):
+    """Write no entries while ``mute``, e.g. for deleting rows that were logged as deleted when hidden."""
+    token = _muted.set(mute)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def head():
+    """The sequence number of the latest entry; a client starts syncing from it before downloading the lists."""
+    return ChangeLogEntry.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def feed(user, since, limit=PAGE_SIZE, related=None):
+    """
+    What changed for ``user`` after sequence number ``since``: up to ``limit``
+    entries, collapsed to the latest per row, with the row itself for upserts.
+    An upserted row ``user`` can no longer see comes back as a delete.
+
+    Returns None when entries after ``since`` have been pruned; the client has
+    to download its lists again.
+    """
+    first = ChangeLogEntry.objects.order_by('pk').values_list('pk', flat=True).first()
+    if first is not None and since < first - 1:
+        return None
+
+    entries = ChangeLogEntry.objects.filter(pk__gt=since).order_by('pk')
+    if user.role == 'admin':
+        entries = list(entries[:limit + 1])
+    else:
+        # One index range per scope column, merged; an OR would scan the log
+        branches = [
+            entries.filter(**{column: user.pk})[:limit + 1]
+            for column in ChangeLogEntry.ROLE_SCOPES.get(user.role, ())
+        ]
+        entries, seen = [], set()
+        for entry in heapq.merge(*branches, key=lambda entry: entry.pk):
+            if entry.pk not in seen:
+                seen.add(entry.pk)
+                entries.append(entry)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {}
+    for entry in entries:
+        latest.pop((entry.model, entry.object_id), None)
+        latest[entry.model, entry.object_id] = entry
+
+    rows = {}
+    for name, model in FEED_MODELS.items():
+        ids = [entry.object_id for entry in latest.values() if entry.model == name and entry.action == 'upsert']
+        if ids:
+            queryset = model.objects.for_user(user).select_related(*(related or {}).get(name, ()))
+            rows[name] = queryset.in_bulk(ids)
+
+    return {
+        'cursor': entries[-1].pk if entries else since,
+        'has_more': has_more,
+        'changes': [(entry, rows.get(entry.model, {}).get(entry.object_id)) for entry in latest.values()],
+    }
+
+
+def prune(days=None, batch_size=5000):
+    """Delete entries older than ``days`` (CHANGES_RETENTION_DAYS), keeping the newest so expired cursors are detected."""
+    days = settings.CHANGES_RETENTION_DAYS if days is None else days
+    expired = ChangeLogEntry.objects.filter(created_at__lt=timezone.now() - timedelta(days=days), pk__lt=head())
+    deleted = 0
+    while pks := list(expired.values_list('pk', flat=True)[:batch_size]):
+        deleted += ChangeLogEntry.objects.filter(pk__in=pks).delete()[0]
+    return deleted
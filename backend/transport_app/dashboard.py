@@ -0,0 +1,120 @@
+# transport_app/dashboard.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Truck, TransportationOrder, Expense
+from .serializers import TransportationOrderSerializer, ExpenseSerializer
+from users.serializers import UserSerializer
+
+ACTIVE_STATUSES = ('pending', 'assigned', 'in_transit')
+ORDER_RELATED = ('truck__owner', 'truck__assigned_driver', 'driver', 'owner', 'created_by')
+EXPENSE_RELATED = ('added_by', 'order')
+
+# Shared by all requests, so concurrent dashboards never hold more than this many connections
+_executor = ThreadPoolExecutor(max_workers=settings.DASHBOARD_QUERY_WORKERS, thread_name_prefix='dashboard')
+
+
+def stats_queries(request, now):
+    """
+    The independent queries behind /dashboard/stats/, by response key. ``request``
+    (DRF's or, in the async views, Django's, with its user set) scopes the rows and
+    signs the file links of the lists.
+    """
+    orders = TransportationOrder.objects.for_user(request.user)
+    expenses = Expense.objects.for_user(request.user)
+    context = {'request': request}
+    upcoming = orders.filter(estimated_delivery_date__gt=now, status__in=ACTIVE_STATUSES)
+    return {
+        'total_orders': orders.count,
+        'active_orders': orders.filter(status__in=ACTIVE_STATUSES).count,
+        'total_revenue': lambda: orders.aggregate(total=Sum('total_amount'))['total'] or 0,
+        'pending_amount': lambda: orders.aggregate(total=Sum('balance_amount'))['total'] or 0,
+        'total_expenses': lambda: expenses.aggregate(total=Sum('amount'))['total'] or 0,
+        'recent_orders': lambda: TransportationOrderSerializer(
+            orders.select_related(*ORDER_RELATED).order_by('-created_at')[:5], many=True, context=context
+        ).data,
+        'upcoming_deliveries': lambda: TransportationOrderSerializer(
+            upcoming.select_related(*ORDER_RELATED).order_by('estimated_delivery_date')[:5], many=True, context=context
+        ).data,
+        'recent_expenses': lambda: ExpenseSerializer(
+            expenses.select_related(*EXPENSE_RELATED).order_by('-date')[:5], many=True, context=context
+        ).data,
+    }
+
+
+def stats_data(results):
+    return {
+        'total_orders': results['total_orders'],
+        'active_orders': results['active_orders'],
+        'total_revenue': results['total_revenue'],
+        'pending_amount': results['pending_amount'],
+        'total_expenses': results['total_expenses'],
+        'total_profit': results['total_revenue'] - results['total_expenses'],
+        'recent_orders': results['recent_orders'],
+        'upcoming_deliveries': results['upcoming_deliveries'],
+        'recent_expenses': results['recent_expenses'],
+    }
+
+
+def owner_queries(owner, now):
+    """The independent queries behind /dashboard/owner_dashboard/, by response key."""
+    trucks = Truck.objects.filter(owner=owner)
+    orders = TransportationOrder.objects.filter(owner=owner)
+    revenue_by_month = orders.filter(
+        created_at__gte=now - timedelta(days=365)
+    ).annotate(
+        month=TruncMonth('created_at')
+    ).values('month').annotate(total=Sum('total_amount')).order_by('month')
+    return {
+        'owner': lambda: UserSerializer(owner).data,
+        'truck_count': trucks.count,
+        'active_trucks': trucks.filter(status='available').count,
+        'orders_summary': lambda: list(orders.values('status').annotate(count=Count('id'))),
+        'total_orders': orders.count,
+        'total_revenue': lambda: orders.aggregate(total=Sum('total_amount'))['total'] or 0,
+        'revenue_by_month': lambda: list(revenue_by_month),
+    }
+
+
+def run(queries):
+    """Run ``queries`` one after another on the request's connection."""
+    return {name: query() for name, query in queries.items()}
+
+
+def _run_in_worker(query, wrappers):
+    # Each worker thread keeps its own connection between queries (the pool bounds how
+    # many are open). No request_started/finished signals fire here, so apply what they
+    # would: a connection past CONN_MAX_AGE, or one the server dropped, is replaced
+    # before the query, and one that failed is dropped so the next query reconnects.
+    connection.close_if_unusable_or_obsolete()
+    try:
+        with ExitStack() as stack:
+            for wrapper in wrappers:
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return query()
+    except Exception:
+        connection.close()
+        raise
+
+
+async def arun(queries):
+    """
+    Run ``queries`` at the same time, each on a worker thread with its own
+    connection, and wait for all of them.
+    """
+    # The request's query accounting (monitoring.middleware) wraps the request thread's
+    # connection; carry it over so the worker's queries are counted and attributed too.
+    wrappers = await sync_to_async(lambda: list(connection.execute_wrappers))()
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(_executor, _run_in_worker, query, wrappers) for query in queries.values()
+    ))
+    return dict(zip(queries, results))
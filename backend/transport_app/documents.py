@@ -0,0 +1,399 @@
+# transport_app/documents.py
+import hashlib
+import multiprocessing
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import nullcontext
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from . import pdf
+from .models import (
+    Document, DocumentRun, Expense, MoneyTransfer, TransportationOrder, ArchivedOrder, ArchivedExpense, ArchivedTransfer,
+)
+
+# Part of every source version: bump it when the templates change so cached files are rendered again
+TEMPLATE_VERSION = 1
+TEMPLATES = {
+    'invoice': 'transport_app/documents/invoice.txt',
+    'statement': 'transport_app/documents/statement.txt',
+}
+RULE = '-' * 88
+# What _job reads of a document
+RELATED = (
+    'owner', 'order__owner', 'order__truck', 'order__driver',
+    'archived_order__owner', 'archived_order__truck', 'archived_order__driver',
+)
+# Orders, expenses and transfers, live and archived: a month keeps its statement
+# after its orders are archived (transport_app/archive.py)
+SOURCES = (
+    (TransportationOrder, Expense, MoneyTransfer),
+    (ArchivedOrder, ArchivedExpense, ArchivedTransfer),
+)
+
+
+def parse_month(value):
+    """The first day of a YYYY-MM month."""
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+def next_month(period):
+    return date(period.year + period.month // 12, period.month % 12 + 1, 1)
+
+
+def month_orders(period, model=TransportationOrder):
+    """Orders (of ``model``, live or archived) picked up in the month starting on ``period``; a statement lists these."""
+    tz = timezone.get_current_timezone()
+    return model.objects.filter(
+        pickup_date__gte=datetime.combine(period, time.min, tzinfo=tz),
+        pickup_date__lt=datetime.combine(next_month(period), time.min, tzinfo=tz),
+    )
+
+
+def _digest(*parts):
+    return hashlib.sha256(repr((TEMPLATE_VERSION, *parts)).encode()).hexdigest()
+
+
+def invoice_versions(order_ids):
+    """{order id: version of its invoice}; the invoice only shows the order's own columns."""
+    return {
+        pk: _digest('invoice', updated_at)
+        for model in (TransportationOrder, ArchivedOrder)
+        for pk, updated_at in model.objects.filter(pk__in=order_ids).values_list('pk', 'updated_at')
+    }
+
+
+def statement_versions(period, owner_ids):
+    """
+    {owner id: version of their statement for ``period``}: the latest updated_at and
+    the number of the month's orders, their expenses and their transfers, the
+    counts catching deleted rows. Three grouped queries per set of tables (SOURCES)
+    for any number of owners; archiving rows leaves the version as it was.
+    """
+    sources = defaultdict(dict)
+    for order_model, expense_model, transfer_model in SOURCES:
+        orders = month_orders(period, order_model).filter(owner__in=owner_ids)
+        for name, rows in (
+            ('orders', orders),
+            ('expenses', expense_model.objects.filter(order__in=orders)),
+            ('transfers', transfer_model.objects.filter(order__in=orders)),
+        ):
+            for owner_id, latest, count in rows.values('owner').annotate(
+                latest=Max('updated_at'), count=Count('id'),
+            ).values_list('owner', 'latest', 'count'):
+                other_latest, other_count = sources[owner_id].get(name, (latest, 0))
+                sources[owner_id][name] = (max(latest, other_latest), count + other_count)
+    return {
+        owner_id: _digest('statement', period, *(sources[owner_id].get(name) for name in ('orders', 'expenses', 'transfers')))
+        for owner_id in owner_ids
+    }
+
+
+def _versions(documents):
+    """{document id: current version of its sources}."""
+    invoices = {doc.pk: doc.order_id or doc.archived_order_id for doc in documents if doc.kind == 'invoice'}
+    versions = invoice_versions(list(invoices.values()))
+    result = {pk: versions.get(order_id, '') for pk, order_id in invoices.items()}
+    periods = defaultdict(list)
+    for doc in documents:
+        if doc.kind == 'statement':
+            periods[doc.period].append(doc)
+    for period, docs in periods.items():
+        versions = statement_versions(period, [doc.owner_id for doc in docs])
+        result.update((doc.pk, versions[doc.owner_id]) for doc in docs)
+    return result
+
+
+def _person(user):
+    return {'name': user.get_full_name().strip() or user.username, 'phone': user.phone, 'email': user.email}
+
+
+def invoice_context(order):
+    return {
+        'issued': timezone.localdate(),
+        'rule': RULE,
+        'owner': _person(order.owner),
+        'order': {
+            'number': order.order_number,
+            'status': order.get_status_display(),
+            'description': order.description,
+            'pickup_location': order.pickup_location,
+            'pickup_date': order.pickup_date,
+            'delivery_location': order.delivery_location,
+            'delivery_date': order.actual_delivery_date or order.estimated_delivery_date,
+            'load_type': order.load_type,
+            'weight': order.weight,
+            'truck': order.truck.truck_number if order.truck else '',
+            'driver': order.driver.get_full_name().strip() if order.driver else '',
+            'total': order.total_amount,
+            'advance': order.advance_amount,
+            'balance': order.balance_amount,
+        },
+    }
+
+
+def _total(rows, key):
+    return sum((row[key] for row in rows), Decimal(0))
+
+
+def statement_context(owner, period):
+    status_names = dict(TransportationOrder.STATUS_CHOICES)
+    categories = dict(Expense.CATEGORY_CHOICES)
+    transfer_types = dict(MoneyTransfer.TRANSFER_TYPE_CHOICES)
+    orders, expenses, transfers = [], [], []
+    for order_model, expense_model, transfer_model in SOURCES:
+        month = month_orders(period, order_model).filter(owner=owner)
+        orders += month.values_list(
+            'pickup_date', 'pk', 'order_number', 'pickup_location', 'delivery_location', 'status',
+            'total_amount', 'advance_amount', 'balance_amount',
+        )
+        expenses += expense_model.objects.filter(order__in=month).values_list(
+            'date', 'pk', 'order__order_number', 'category', 'description', 'amount',
+        )
+        transfers += transfer_model.objects.filter(order__in=month, status='completed').values_list(
+            'created_at', 'pk', 'order__order_number', 'transfer_type', 'description', 'amount',
+        )
+    # Sorted here (by date, then id), as the rows come from the live and the archive tables
+    context = {
+        'issued': timezone.localdate(),
+        'rule': RULE,
+        'owner': _person(owner),
+        'period': period,
+        'period_end': next_month(period) - timedelta(days=1),
+        'orders': [
+            {'number': number, 'pickup_date': pickup_date, 'route': f'{pickup} - {delivery}',
+             'status': status_names.get(status, status), 'total': total, 'advance': advance, 'balance': balance}
+            for pickup_date, _, number, pickup, delivery, status, total, advance, balance in sorted(orders)
+        ],
+        'expenses': [
+            {'date': when, 'order': number, 'category': categories.get(category, category),
+             'description': description, 'amount': amount}
+            for when, _, number, category, description, amount in sorted(expenses)
+        ],
+        'transfers': [
+            {'date': when, 'order': number, 'type': transfer_types.get(kind, kind),
+             'description': description, 'amount': amount, 'kind': kind}
+            for when, _, number, kind, description, amount in sorted(transfers)
+        ],
+    }
+    transfers = context['transfers']
+    context['totals'] = totals = {
+        'freight': _total(context['orders'], 'total'),
+        'advance': _total(context['orders'], 'advance'),
+        'balance': _total(context['orders'], 'balance'),
+        'expenses': _total(context['expenses'], 'amount'),
+        'to_driver': _total([t for t in transfers if t['kind'] == 'to_driver'], 'amount'),
+        'from_driver': _total([t for t in transfers if t['kind'] == 'from_driver'], 'amount'),
+    }
+    totals['net'] = totals['freight'] - totals['expenses']
+    return context
+
+
+def _job(doc):
+    """(template, context, title, footer) to render ``doc`` with; the context is plain data for the pool."""
+    if doc.kind == 'invoice':
+        title = f'Invoice {doc.invoiced_order.order_number}'
+        context = invoice_context(doc.invoiced_order)
+    else:
+        title = f'Trip statement {doc.period:%B %Y}'
+        context = statement_context(doc.owner, doc.period)
+    return TEMPLATES[doc.kind], context, title, f"{context['owner']['name']} - {title}"
+
+
+def _file_name(doc):
+    if doc.kind == 'invoice':
+        return f'invoice-{doc.invoiced_order.order_number}.pdf'
+    return f'statement-{doc.owner_id}-{doc.period:%Y-%m}.pdf'
+
+
+def executor(workers=None):
+    """A pool for render_documents. Its processes are spawned rather than forked, so
+    none inherits this process's database connections, and set up Django once."""
+    return ProcessPoolExecutor(
+        max_workers=workers or settings.DOCUMENT_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+    )
+
+
+def render_documents(documents, workers=None, force=False, progress=None, pool=None):
+    """
+    Render the PDFs of ``documents`` in ``pool`` (by default a new pool of
+    ``workers`` processes, DOCUMENT_WORKERS if not given).
+
+    A document whose sources have the version its file was rendered from keeps
+    that file (unless ``force``). Contexts are read here and the pool only
+    renders, a few documents ahead of the results. ``progress`` is called with
+    the counts after each document. Returns Counter(rendered=, reused=, failed=).
+    """
+    documents = list(documents)
+    versions = _versions(documents)
+    counts = Counter(rendered=0, reused=0, failed=0)
+    todo = []
+    for doc in documents:
+        if force or not doc.file or doc.source_version != versions[doc.pk]:
+            todo.append(doc)
+            continue
+        if doc.status != 'ready':
+            doc.status, doc.error = 'ready', ''
+            Document.objects.filter(pk=doc.pk).update(status=doc.status, error=doc.error)
+        counts['reused'] += 1
+        if progress:
+            progress(counts)
+    if not todo:
+        return counts
+
+    workers = max(1, min(workers or settings.DOCUMENT_WORKERS, len(todo)))
+    queue, pending = iter(todo), {}
+    with executor(workers) if pool is None else nullcontext(pool) as pool:
+        while True:
+            while len(pending) < 2 * workers and (doc := next(queue, None)) is not None:
+                try:
+                    pending[pool.submit(pdf.render_template, *_job(doc))] = doc
+                except Exception as e:
+                    _failed(doc, e)
+                    counts['failed'] += 1
+                    if progress:
+                        progress(counts)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                doc = pending.pop(future)
+                try:
+                    _save(doc, future.result(), versions[doc.pk])
+                except Exception as e:
+                    _failed(doc, e)
+                    counts['failed'] += 1
+                else:
+                    counts['rendered'] += 1
+                if progress:
+                    progress(counts)
+    return counts
+
+
+def _save(doc, data, version):
+    doc.file.save(_file_name(doc), ContentFile(data), save=False)
+    doc.status, doc.source_version, doc.error, doc.rendered_at = 'ready', version, '', timezone.now()
+    doc.save(update_fields=['file', 'status', 'source_version', 'error', 'rendered_at'])
+
+
+def _failed(doc, error):
+    doc.status, doc.error = 'failed', f'{type(error).__name__}: {error}'
+    doc.save(update_fields=['status', 'error'])
+
+
+def _stale_claims():
+    """Documents a worker took for rendering more than DOCUMENT_CLAIM_TIMEOUT ago, presumably lost with it."""
+    cutoff = timezone.now() - timedelta(seconds=settings.DOCUMENT_CLAIM_TIMEOUT)
+    return Q(status='rendering') & (Q(claimed_at__isnull=True) | Q(claimed_at__lt=cutoff))
+
+
+def refresh(doc):
+    """
+    Queue ``doc`` for the render_documents worker unless its file is current;
+    returns it with its status ('ready' only when the file can be downloaded as is).
+    """
+    version = _versions([doc])[doc.pk]
+    if doc.status == 'ready' and doc.file and doc.source_version == version:
+        return doc
+    if doc.status in ('ready', 'failed') or Document.objects.filter(_stale_claims(), pk=doc.pk).exists():
+        doc.status, doc.error, doc.requested_at = 'pending', '', timezone.now()
+        Document.objects.filter(pk=doc.pk).update(status=doc.status, error=doc.error, requested_at=doc.requested_at)
+    return doc
+
+
+def request_invoice(order):
+    """The invoice of ``order``, live or archived, queued if it needs rendering (see refresh)."""
+    field = 'archived_order' if isinstance(order, ArchivedOrder) else 'order'
+    doc, _ = Document.objects.select_related(*RELATED).get_or_create(
+        kind='invoice', **{field: order}, defaults={'owner_id': order.owner_id},
+    )
+    if doc.owner_id != order.owner_id:
+        # The order moved to another owner; so does its invoice
+        doc.owner_id = order.owner_id
+        doc.save(update_fields=['owner'])
+    return refresh(doc)
+
+
+def request_statement(owner, period):
+    doc, _ = Document.objects.select_related(*RELATED).get_or_create(kind='statement', owner=owner, period=period)
+    return refresh(doc)
+
+
+def claim_pending(limit):
+    """
+    Up to ``limit`` of the oldest pending documents, marked rendering so a second
+    worker skips them. Documents whose worker stopped while rendering them are
+    taken again after DOCUMENT_CLAIM_TIMEOUT.
+    """
+    claimable = Q(status='pending') | _stale_claims()
+    claimed = []
+    for doc in Document.objects.filter(claimable).select_related(*RELATED).order_by('requested_at', 'pk')[:limit]:
+        now = timezone.now()
+        # Matches nothing if another worker claimed it meanwhile: that claim is not stale
+        if Document.objects.filter(claimable, pk=doc.pk).update(status='rendering', claimed_at=now):
+            doc.status, doc.claimed_at = 'rendering', now
+            claimed.append(doc)
+    return claimed
+
+
+def run_month(period, invoices=False, workers=None, force=False, user=None, progress=None):
+    """
+    Render the statement of every owner with orders picked up in the month of
+    ``period`` (and, with ``invoices``, the invoices of those orders), recording
+    the progress on a DocumentRun.
+    """
+    run = DocumentRun.objects.create(period=period, invoices=invoices, started_by=user)
+    try:
+        orders, archived = month_orders(period), month_orders(period, ArchivedOrder)
+        owner_ids = sorted(
+            set(orders.order_by().values_list('owner', flat=True)) | set(archived.order_by().values_list('owner', flat=True))
+        )
+        Document.objects.bulk_create(
+            [Document(kind='statement', owner_id=owner_id, period=period) for owner_id in owner_ids],
+            ignore_conflicts=True,
+        )
+        documents = Document.objects.filter(kind='statement', period=period, owner__in=owner_ids)
+        if invoices:
+            Document.objects.bulk_create(
+                [Document(kind='invoice', order_id=pk, owner_id=owner_id)
+                 for pk, owner_id in orders.order_by().values_list('pk', 'owner')]
+                + [Document(kind='invoice', archived_order_id=pk, owner_id=owner_id)
+                   for pk, owner_id in archived.order_by().values_list('pk', 'owner')],
+                ignore_conflicts=True,
+            )
+            documents = documents | Document.objects.filter(
+                Q(order__in=orders) | Q(archived_order__in=archived), kind='invoice',
+            )
+        documents.update(run=run)
+        documents = list(Document.objects.filter(run=run).select_related(*RELATED).order_by('kind', 'pk'))
+        run.total = len(documents)
+        run.save(update_fields=['total'])
+
+        saved_at = [timezone.now()]
+
+        def record(counts):
+            # Saved at most once a second, so the run's progress can be followed from the API
+            run.rendered, run.reused, run.failed = counts['rendered'], counts['reused'], counts['failed']
+            if timezone.now() - saved_at[0] >= timedelta(seconds=1):
+                run.save(update_fields=['rendered', 'reused', 'failed'])
+                saved_at[0] = timezone.now()
+            if progress:
+                progress(run)
+
+        render_documents(documents, workers=workers, force=force, progress=record)
+    except Exception as e:
+        run.status, run.error = 'failed', str(e)
+        raise
+    else:
+        run.status = 'completed'
+    finally:
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'error', 'rendered', 'reused', 'failed', 'finished_at'])
+    return run
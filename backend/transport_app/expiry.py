@@ -0,0 +1,155 @@
+# transport_app/expiry.py
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users.models import User
+from .models import Truck, ExpiryAlert
+
+# (document_type, date field, label)
+TRUCK_DOCUMENTS = (
+    ('rc', 'rc_expiry', 'RC'),
+    ('insurance', 'insurance_expiry', 'Insurance'),
+    ('pollution', 'pollution_expiry', 'Pollution certificate'),
+)
+
+ExpiryNotice = namedtuple('ExpiryNotice', 'document_type object_id truck driver subject expiry_date window_days')
+
+
+def alert_windows():
+    return sorted(settings.EXPIRY_ALERT_WINDOWS)
+
+
+def window_for(days_left, windows):
+    """Smallest configured window the document falls into; 0 once it has expired."""
+    if days_left < 0:
+        return 0
+    for window in windows:
+        if days_left <= window:
+            return window
+    return None
+
+
+def expiring_filter(limit):
+    """Trucks with any document expiring on or before ``limit``; each branch is an index range."""
+    return Q(rc_expiry__lte=limit) | Q(insurance_expiry__lte=limit) | Q(pollution_expiry__lte=limit)
+
+
+def expiring_documents(truck, limit, today):
+    return [
+        {
+            'document_type': document_type,
+            'label': label,
+            'expiry_date': getattr(truck, field),
+            'days_left': (getattr(truck, field) - today).days,
+        }
+        for document_type, field, label in TRUCK_DOCUMENTS
+        if getattr(truck, field) <= limit
+    ]
+
+
+def find_expiring(today, windows):
+    lookback = today - timedelta(days=settings.EXPIRY_ALERT_LOOKBACK_DAYS)
+    horizon = today + timedelta(days=windows[-1])
+
+    # One range scan per indexed date column instead of a full table scan.
+    for document_type, field, label in TRUCK_DOCUMENTS:
+        trucks = (
+            Truck.objects.filter(**{f'{field}__range': (lookback, horizon)})
+            .select_related('owner')
+            .only('id', 'truck_number', field, 'owner__id', 'owner__email', 'owner__first_name', 'owner__is_active')
+        )
+        for truck in trucks:
+            expiry_date = getattr(truck, field)
+            window = window_for((expiry_date - today).days, windows)
+            if window is not None:
+                yield ExpiryNotice(document_type, truck.id, truck, None,
+                                   f"{label} for truck {truck.truck_number}", expiry_date, window)
+
+    drivers = User.objects.filter(
+        role='driver', is_active=True, license_expiry__range=(lookback, horizon)
+    ).only('id', 'email', 'first_name', 'last_name', 'license_expiry')
+    for driver in drivers:
+        window = window_for((driver.license_expiry - today).days, windows)
+        if window is not None:
+            yield ExpiryNotice('license', driver.id, None, driver,
+                               f"Driving licence of {driver.get_full_name()}", driver.license_expiry, window)
+
+
+def recipients_for(notice, admins):
+    if notice.truck is not None:
+        return [notice.truck.owner] if notice.truck.owner.is_active else []
+    return [notice.driver, *admins]
+
+
+def run_scan(today=None, dry_run=False):
+    """
+    Send one batched email per recipient for documents entering an alert window.
+
+    Alerts already recorded in ExpiryAlert are skipped, so the scan can run as
+    often as the scheduler likes without repeating itself.
+    """
+    today = today or timezone.localdate()
+    windows = alert_windows()
+    notices = list(find_expiring(today, windows))
+    if not notices:
+        return {'notices': 0, 'sent': 0, 'recipients': 0}
+
+    admins = list(User.objects.filter(role='admin', is_active=True).only('id', 'email', 'first_name'))
+    already_sent = set(
+        ExpiryAlert.objects.filter(
+            expiry_date__range=(min(n.expiry_date for n in notices), max(n.expiry_date for n in notices))
+        ).values_list('document_type', 'object_id', 'expiry_date', 'window_days', 'recipient_id')
+    )
+
+    batches = defaultdict(list)
+    recipients = {}
+    for notice in notices:
+        for recipient in recipients_for(notice, admins):
+            key = (notice.document_type, notice.object_id, notice.expiry_date, notice.window_days, recipient.id)
+            if key not in already_sent:
+                already_sent.add(key)
+                batches[recipient.id].append(notice)
+                recipients[recipient.id] = recipient
+
+    sent = 0
+    for recipient_id, items in batches.items():
+        sent += len(items)
+        if dry_run:
+            continue
+        recipient = recipients[recipient_id]
+        with transaction.atomic():
+            ExpiryAlert.objects.bulk_create(
+                [
+                    ExpiryAlert(
+                        document_type=n.document_type, object_id=n.object_id, truck=n.truck, driver=n.driver,
+                        recipient=recipient, expiry_date=n.expiry_date, window_days=n.window_days,
+                    )
+                    for n in items
+                ],
+                ignore_conflicts=True,
+            )
+            send_mail(
+                'Document expiry alert - SMS Transports',
+                format_alert_email(recipient, items, today),
+                'admin@smstransports.com',
+                [recipient.email],
+                fail_silently=False,
+            )
+
+    return {'notices': len(notices), 'sent': sent, 'recipients': len(batches)}
+
+
+def format_alert_email(recipient, notices, today):
+    lines = [f"Hello {recipient.first_name},", "", "The following documents need attention:", ""]
+    for notice in sorted(notices, key=lambda n: n.expiry_date):
+        days_left = (notice.expiry_date - today).days
+        status = f"expired {-days_left} day(s) ago" if days_left < 0 else f"expires in {days_left} day(s)"
+        lines.append(f"- {notice.subject}: {notice.expiry_date:%d %b %Y} ({status})")
+    lines += ["", "SMS Transports"]
+    return "\n".join(lines)
@@ -0,0 +1,202 @@
+# transport_app/lanes.py
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Greatest
+
+from .models import TransportationOrder, Expense, LaneStat, ArchivedOrder, ArchivedExpense
+
+# What one order adds to its lane's LaneStat row.
+Contribution = namedtuple('Contribution', 'lane order_count revenue delivered_count transit_seconds')
+
+ORDER_FIELDS = ('owner_id', 'pickup_place_id', 'delivery_place_id', 'status',
+                'total_amount', 'pickup_date', 'actual_delivery_date')
+
+
+def order_contribution(values):
+    """``values`` maps ORDER_FIELDS to their values (an order's __dict__ works)."""
+    lane = (values['owner_id'], values['pickup_place_id'], values['delivery_place_id'])
+    if None in lane:
+        return None
+    if values['status'] == 'cancelled':
+        return Contribution(lane, 0, Decimal(0), 0, 0)
+    delivered = values['actual_delivery_date'] is not None and values['pickup_date'] is not None
+    transit = int((values['actual_delivery_date'] - values['pickup_date']).total_seconds()) if delivered else 0
+    return Contribution(lane, 1, Decimal(values['total_amount'] or 0), int(delivered), max(transit, 0))
+
+
+def apply_delta(lane, order_count=0, revenue=0, expense_total=0, delivered_count=0, transit_seconds=0):
+    if not any((order_count, revenue, expense_total, delivered_count, transit_seconds)):
+        return
+    owner_id, pickup_id, delivery_id = lane
+    lookup = {'owner_id': owner_id, 'pickup_place_id': pickup_id, 'delivery_place_id': delivery_id}
+    changes = {
+        'order_count': F('order_count') + order_count,
+        'revenue': F('revenue') + revenue,
+        'expense_total': F('expense_total') + expense_total,
+        'delivered_count': F('delivered_count') + delivered_count,
+        'transit_seconds': F('transit_seconds') + transit_seconds,
+    }
+    if LaneStat.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            LaneStat.objects.create(
+                **lookup, order_count=order_count, revenue=revenue, expense_total=expense_total,
+                delivered_count=delivered_count, transit_seconds=transit_seconds,
+            )
+    except IntegrityError:
+        LaneStat.objects.filter(**lookup).update(**changes)
+
+
+def order_expense_total(order_id):
+    return Expense.objects.filter(order_id=order_id).aggregate(total=Sum('amount'))['total'] or Decimal(0)
+
+
+def order_changed(old, new, order_id):
+    """Move an order's contribution from its previous state to its current one."""
+    if old == new:
+        return
+    if old is not None:
+        apply_delta(old.lane, -old.order_count, -old.revenue, 0, -old.delivered_count, -old.transit_seconds)
+    if new is not None:
+        apply_delta(new.lane, new.order_count, new.revenue, 0, new.delivered_count, new.transit_seconds)
+
+    old_lane = old.lane if old else None
+    new_lane = new.lane if new else None
+    if old_lane != new_lane and order_id is not None:
+        # The order's existing expenses follow it to the new lane.
+        expenses = order_expense_total(order_id)
+        if old_lane:
+            apply_delta(old_lane, expense_total=-expenses)
+        if new_lane:
+            apply_delta(new_lane, expense_total=expenses)
+
+
+def order_lane(order_id):
+    row = TransportationOrder.objects.filter(pk=order_id).values_list(
+        'owner_id', 'pickup_place_id', 'delivery_place_id'
+    ).first()
+    return row if row and None not in row else None
+
+
+def expense_changed(old_order_id, old_amount, new_order_id, new_amount):
+    if old_order_id == new_order_id:
+        if old_amount != new_amount and (lane := order_lane(new_order_id)):
+            apply_delta(lane, expense_total=new_amount - old_amount)
+        return
+    if old_order_id is not None and (lane := order_lane(old_order_id)):
+        apply_delta(lane, expense_total=-old_amount)
+    if new_order_id is not None and (lane := order_lane(new_order_id)):
+        apply_delta(lane, expense_total=new_amount)
+
+
+LANE_FIELDS = ('owner_id', 'pickup_place_id', 'delivery_place_id')
+
+
+def _empty_totals():
+    return {
+        'order_count': 0, 'revenue': Decimal(0), 'expense_total': Decimal(0),
+        'delivered_count': 0, 'transit': timedelta(0),
+    }
+
+
+def add_totals(totals, orders, expense_model):
+    """Add the lane contributions of ``orders`` and their expenses to ``totals`` (keyed by lane)."""
+    orders = orders.filter(pickup_place__isnull=False, delivery_place__isnull=False)
+    active = ~Q(status='cancelled')
+    delivered = active & Q(actual_delivery_date__isnull=False)
+    order_rows = orders.values(*LANE_FIELDS).order_by().annotate(
+        order_count=Count('id', filter=active),
+        revenue=Sum('total_amount', filter=active),
+        delivered_count=Count('id', filter=delivered),
+        # Clamped at zero like order_contribution() (delivered before the planned pickup)
+        transit=Sum(
+            Greatest(
+                ExpressionWrapper(F('actual_delivery_date') - F('pickup_date'), output_field=DurationField()),
+                Value(timedelta(0)),
+            ),
+            filter=delivered,
+        ),
+    )
+    for row in order_rows:
+        lane = totals[tuple(row[f] for f in LANE_FIELDS)]
+        lane['order_count'] += row['order_count']
+        lane['revenue'] += row['revenue'] or 0
+        lane['delivered_count'] += row['delivered_count']
+        lane['transit'] += row['transit'] or timedelta(0)
+
+    # Grouped by the order's columns (expenses have their own copy of owner_id)
+    order_lane_fields = [f'order__{f}' for f in LANE_FIELDS]
+    expense_rows = expense_model.objects.filter(order__in=orders).values(*order_lane_fields).order_by().annotate(
+        total=Sum('amount')
+    )
+    for row in expense_rows:
+        totals[tuple(row[f] for f in order_lane_fields)]['expense_total'] += row['total']
+
+
+def remove_orders(orders, expense_model=Expense):
+    """Take ``orders`` (live or archived) and their expenses off their lanes in one pass."""
+    totals = defaultdict(_empty_totals)
+    add_totals(totals, orders, expense_model)
+    for lane, values in totals.items():
+        apply_delta(
+            lane, -values['order_count'], -values['revenue'], -values['expense_total'],
+            -values['delivered_count'], -int(values['transit'].total_seconds()),
+        )
+
+
+def rebuild():
+    """Recompute every LaneStat row from the orders and expenses tables, archived ones included."""
+    from .locations import resolve_place
+
+    totals = defaultdict(_empty_totals)
+    for order_model, expense_model in ((TransportationOrder, Expense), (ArchivedOrder, ArchivedExpense)):
+        # Backfill place links for orders saved before normalization existed.
+        for field in ('pickup', 'delivery'):
+            missing = order_model.objects.filter(**{f'{field}_place__isnull': True})
+            for location in list(missing.values_list(f'{field}_location', flat=True).distinct()):
+                missing.filter(**{f'{field}_location': location}).update(
+                    **{f'{field}_place_id': resolve_place(location)}
+                )
+        add_totals(totals, order_model.objects.all(), expense_model)
+
+    stats = [
+        LaneStat(
+            **dict(zip(LANE_FIELDS, key)),
+            order_count=lane['order_count'],
+            revenue=lane['revenue'],
+            expense_total=lane['expense_total'],
+            delivered_count=lane['delivered_count'],
+            transit_seconds=int(lane['transit'].total_seconds()),
+        )
+        for key, lane in totals.items()
+    ]
+    with transaction.atomic():
+        LaneStat.objects.all().delete()
+        LaneStat.objects.bulk_create(stats, batch_size=1000)
+    return len(stats)
+
+
+def lane_rows(queryset):
+    """Serialize LaneStat rows (or per-lane sums across owners) with the derived averages."""
+    rows = []
+    for row in queryset:
+        order_count = row['order_count'] or 0
+        delivered = row['delivered_count'] or 0
+        rows.append({
+            'pickup_place': row['pickup_place_id'],
+            'pickup': row['pickup_place__name'],
+            'delivery_place': row['delivery_place_id'],
+            'delivery': row['delivery_place__name'],
+            'order_count': order_count,
+            'revenue': row['revenue'],
+            'expense_total': row['expense_total'],
+            'average_revenue': round(row['revenue'] / order_count, 2) if order_count else 0,
+            'average_expense': round(row['expense_total'] / order_count, 2) if order_count else 0,
+            'average_transit_hours': round(row['transit_seconds'] / delivered / 3600, 1) if delivered else None,
+        })
+    return rows
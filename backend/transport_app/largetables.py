@@ -0,0 +1,161 @@
+# transport_app/largetables.py
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters, ShowFacets
+from django.contrib.admin.utils import get_last_value_from_parameters
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.db import connections
+
+# Changelist query string parameters of the cursor pagination
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+
+
+def estimated_count(model, using='default'):
+    """Rows in ``model``'s table according to the database's statistics, or None when it keeps none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            # Written by ANALYZE; the first number of an index's stat is the table's row count
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for a table that was never analyzed
+    return estimate if estimate >= 0 else None
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    A foreign key filter that searches the related objects as you type (through
+    the admin's autocomplete view) instead of listing all of them.
+    """
+    template = 'admin/transport_app/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = get_last_value_from_parameters(params, self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.choice_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site, attrs={'data-width': '100%'}),
+            required=False,
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        # The selected object is rendered by the widget; the only link is the one clearing it
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': 'All',
+        }
+
+    def widget(self):
+        return self.choice_field.widget.render(self.lookup_kwarg, self.lookup_val)
+
+
+class CursorChangeList(ChangeList):
+    """
+    A changelist that pages by primary key (newest first) instead of by
+    offset, and shows an estimated count instead of counting every row.
+    """
+    cursor_pagination = True
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Changing the filters or the search starts again from the first page
+        return super().get_query_string(new_params, [*(remove or ()), AFTER_VAR, BEFORE_VAR])
+
+    def get_ordering(self, request, queryset):
+        return ['-pk']
+
+    def get_results(self, request):
+        per_page = self.list_per_page
+        after, before = request.GET.get(AFTER_VAR), request.GET.get(BEFORE_VAR)
+        try:
+            if after:
+                rows = list(self.queryset.filter(pk__lt=after)[:per_page + 1])
+            elif before:
+                rows = list(self.queryset.filter(pk__gt=before).reverse()[:per_page + 1])
+            else:
+                rows = list(self.queryset[:per_page + 1])
+        except (ValueError, ValidationError) as e:
+            raise IncorrectLookupParameters(e)
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        if before:
+            rows.reverse()
+
+        self.result_list = rows
+        self.next_url = self.get_query_string({AFTER_VAR: rows[-1].pk}) if rows and (more or before) else None
+        self.previous_url = self.get_query_string({BEFORE_VAR: rows[0].pk}) if rows and (more if before else after) else None
+        self.first_url = self.get_query_string() if after or before else None
+        self.result_count, self.count_is_estimate, self.count_is_capped = self.get_result_count(request)
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        # No page numbers or "Show all"; the cursor links replace them (admin/transport_app/pagination.html)
+        self.can_show_all = False
+        self.multi_page = False
+        self.paginator = None
+
+    def get_result_count(self, request):
+        """(count, whether it is an estimate, whether it stopped at the admin's count_limit)."""
+        if not self.has_active_filters and not self.query:
+            estimate = estimated_count(self.model, self.queryset.db)
+            if estimate:
+                return estimate, True, False
+        limit = self.model_admin.count_limit
+        count = self.queryset.order_by()[:limit + 1].count()
+        return min(count, limit), False, count > limit
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables too big to count, offset through or list
+    every related object of: cursor pagination, estimated counts, no facets
+    and no sorting by column. Use AutocompleteFilter for foreign keys in
+    list_filter, list_select_related for those in list_display, and
+    autocomplete_fields for those on the form.
+    """
+    count_limit = 10000
+    show_full_result_count = False
+    show_facets = ShowFacets.NEVER
+    sortable_by = ()
+
+    def get_changelist(self, request, **kwargs):
+        return CursorChangeList
+
+    @property
+    def media(self):
+        media = super().media
+        filters = [spec for spec in self.list_filter if isinstance(spec, tuple) and spec[1] is AutocompleteFilter]
+        if filters:
+            field = self.model._meta.get_field(filters[0][0])
+            media += AutocompleteSelect(field, self.admin_site).media
+            media += forms.Media(js=['admin/js/jquery.init.js', 'transport_app/admin/autocomplete_filter.js'])
+        return media
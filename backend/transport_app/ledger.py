@@ -0,0 +1,233 @@
+# transport_app/ledger.py
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (
+    TransportationOrder, Expense, MoneyTransfer, DriverLedgerCheckpoint,
+    ArchivedOrder, ArchivedExpense, ArchivedTransfer,
+)
+
+CENT = Decimal('0.01')
+
+# A driver's ledger: money sent to them (+), money returned by them (-) and
+# their expenses (-), ordered by (time, kind, id). The window function gives the
+# running balance relative to the checkpoint the query starts from. Archived
+# rows keep their ids, so archiving an order leaves the ledger unchanged. Rows of
+# soft-deleted orders are left out, as the API hides them; {scope} narrows the
+# ledger to one owner's orders.
+ENTRIES_SQL = """
+SELECT kind, id, ts, amount, order_id, description,
+       SUM(amount) OVER (ORDER BY ts, kind, id ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS running,
+       ROW_NUMBER() OVER (ORDER BY ts, kind, id) AS position
+FROM (
+    SELECT 'expense' AS kind, e.id AS id, e.date AS ts, -e.amount AS amount,
+           e.order_id AS order_id, e.description AS description
+    FROM {expense} e INNER JOIN {order} o ON o.id = e.order_id
+    WHERE e.added_by_id = %s AND o.deleted_at IS NULL{scope} AND e.date >= %s AND e.date <= %s
+    UNION ALL
+    SELECT 'transfer', t.id, t.created_at,
+           CASE WHEN t.transfer_type = 'to_driver' THEN t.amount ELSE -t.amount END,
+           t.order_id, t.description
+    FROM {transfer} t INNER JOIN {order} o ON o.id = t.order_id
+    WHERE o.driver_id = %s AND o.deleted_at IS NULL{scope} AND t.transfer_type IN ('to_driver', 'from_driver') AND t.status = 'completed'
+      AND t.created_at >= %s AND t.created_at <= %s
+    UNION ALL
+    SELECT 'expense', e.id, e.date, -e.amount, e.order_id, e.description
+    FROM {archived_expense} e INNER JOIN {archived_order} o ON o.id = e.order_id
+    WHERE e.added_by_id = %s AND o.deleted_at IS NULL{scope} AND e.date >= %s AND e.date <= %s
+    UNION ALL
+    SELECT 'transfer', t.id, t.created_at,
+           CASE WHEN t.transfer_type = 'to_driver' THEN t.amount ELSE -t.amount END,
+           t.order_id, t.description
+    FROM {archived_transfer} t INNER JOIN {archived_order} o ON o.id = t.order_id
+    WHERE o.driver_id = %s AND o.deleted_at IS NULL{scope} AND t.transfer_type IN ('to_driver', 'from_driver') AND t.status = 'completed'
+      AND t.created_at >= %s AND t.created_at <= %s
+) entries
+WHERE (ts > %s OR (ts = %s AND (kind > %s OR (kind = %s AND id > %s))))
+  AND (ts < %s OR (ts = %s AND (kind < %s OR (kind = %s AND id <= %s))))
+ORDER BY ts, kind, id
+"""
+
+EPOCH = timezone.make_aware(timezone.datetime(1970, 1, 1), dt_timezone.utc)
+FAR_FUTURE = timezone.make_aware(timezone.datetime(9999, 12, 31), dt_timezone.utc)
+START = (EPOCH, '', 0)
+END = (FAR_FUTURE, '~', 2 ** 62)
+
+
+def _datetime(value):
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+def fetch_entries(driver_id, after=START, upto=END, owner_id=None):
+    """
+    Entries in the half-open position range (after, upto], each with its offset from
+    ``after``; only those of ``owner_id``'s orders if given.
+    """
+    sql = ENTRIES_SQL.format(
+        scope=' AND o.owner_id = %s' if owner_id is not None else '',
+        expense=connection.ops.quote_name(Expense._meta.db_table),
+        transfer=connection.ops.quote_name(MoneyTransfer._meta.db_table),
+        order=connection.ops.quote_name(TransportationOrder._meta.db_table),
+        archived_expense=connection.ops.quote_name(ArchivedExpense._meta.db_table),
+        archived_transfer=connection.ops.quote_name(ArchivedTransfer._meta.db_table),
+        archived_order=connection.ops.quote_name(ArchivedOrder._meta.db_table),
+    )
+    adapt = connection.ops.adapt_datetimefield_value
+    lo_ts, hi_ts = adapt(after[0]), adapt(upto[0])
+    selection = [driver_id] + ([owner_id] if owner_id is not None else []) + [lo_ts, hi_ts]
+    params = [
+        *selection * 4,
+        lo_ts, lo_ts, after[1], after[1], after[2],
+        hi_ts, hi_ts, upto[1], upto[1], upto[2],
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            {
+                'kind': kind, 'id': entry_id, 'time': _datetime(ts), 'amount': _money(amount),
+                'order': order_id, 'description': description,
+                'offset': _money(running), 'position': position,
+            }
+            for kind, entry_id, ts, amount, order_id, description, running, position in cursor.fetchall()
+        ]
+
+
+def _key(checkpoint):
+    if checkpoint is None:
+        return START
+    return (checkpoint.entry_time, checkpoint.entry_kind, checkpoint.entry_id)
+
+
+def checkpoints(driver_id, owner_id=None):
+    """The checkpoints of the driver's whole ledger, or of its part for ``owner_id``'s orders."""
+    return DriverLedgerCheckpoint.objects.filter(driver_id=driver_id, owner_id=owner_id)
+
+
+def latest_checkpoint(driver_id, owner_id=None):
+    return checkpoints(driver_id, owner_id).first()
+
+
+def extend_checkpoints(driver_id, base, entries, owner_id=None):
+    """Record a checkpoint every LEDGER_CHECKPOINT_INTERVAL entries of an uncheckpointed tail."""
+    interval = settings.LEDGER_CHECKPOINT_INTERVAL
+    base_balance = base.balance if base else Decimal(0)
+    base_count = base.entry_count if base else 0
+    created = [
+        DriverLedgerCheckpoint(
+            driver_id=driver_id, owner_id=owner_id, entry_time=entry['time'], entry_kind=entry['kind'], entry_id=entry['id'],
+            entry_count=base_count + entry['position'], balance=base_balance + entry['offset'],
+        )
+        for entry in entries if entry['position'] % interval == 0
+    ]
+    if created:
+        # A concurrent request may have written some of these already
+        DriverLedgerCheckpoint.objects.bulk_create(created, ignore_conflicts=True)
+    return created[-1] if created else base
+
+
+def balance(driver_id, owner_id=None):
+    """
+    Current balance from the latest checkpoint plus the entries after it; of
+    ``owner_id``'s orders only if given.
+
+    At most LEDGER_CHECKPOINT_INTERVAL entries are read once checkpoints are
+    current; a longer tail is checkpointed on the way.
+    """
+    checkpoint = latest_checkpoint(driver_id, owner_id)
+    tail = fetch_entries(driver_id, after=_key(checkpoint), owner_id=owner_id)
+    base_balance = checkpoint.balance if checkpoint else Decimal(0)
+    base_count = checkpoint.entry_count if checkpoint else 0
+    if len(tail) >= settings.LEDGER_CHECKPOINT_INTERVAL:
+        extend_checkpoints(driver_id, checkpoint, tail, owner_id)
+    return {
+        'balance': base_balance + (tail[-1]['offset'] if tail else 0),
+        'entry_count': base_count + len(tail),
+        'as_of': tail[-1]['time'] if tail else (checkpoint.entry_time if checkpoint else None),
+    }
+
+
+def statement(driver_id, cursor=None, owner_id=None):
+    """
+    One page of the statement, newest entry first; of ``owner_id``'s orders only if given.
+
+    Pages are the spans between consecutive checkpoints, so each page costs one
+    bounded query however long the history is. ``cursor`` is the checkpoint id
+    that closes the requested page; None means the latest page.
+    """
+    if cursor is None:
+        balance(driver_id, owner_id)  # makes sure the tail is checkpointed
+        upper = None
+        lower = latest_checkpoint(driver_id, owner_id)
+    else:
+        upper = checkpoints(driver_id, owner_id).filter(pk=cursor).first()
+        if upper is None:
+            return None
+        lower = checkpoints(driver_id, owner_id).filter(entry_count__lt=upper.entry_count).order_by('-entry_count').first()
+
+    opening = lower.balance if lower else Decimal(0)
+    entries = fetch_entries(driver_id, after=_key(lower), upto=_key(upper) if upper else END, owner_id=owner_id)
+    if not entries and upper is None and lower is not None:
+        # Nothing since the last checkpoint: start from the page it closes.
+        return statement(driver_id, cursor=lower.pk, owner_id=owner_id)
+    for entry in entries:
+        entry['balance'] = opening + entry.pop('offset')
+        del entry['position']
+    entries.reverse()
+
+    return {
+        'opening_balance': opening,
+        'closing_balance': entries[0]['balance'] if entries else opening,
+        'entries': entries,
+        'previous_cursor': lower.pk if lower else None,
+    }
+
+
+def invalidate(driver_id, since):
+    """
+    Drop checkpoints that include entries at or after ``since`` (an entry was edited
+    or removed), in the whole ledger and in every owner's part of it.
+    """
+    if driver_id is not None and since is not None:
+        DriverLedgerCheckpoint.objects.filter(driver_id=driver_id, entry_time__gte=since).delete()
+
+
+def invalidate_order(order_id, driver_ids):
+    """An order changed driver: its transfers move between ledgers."""
+    first = MoneyTransfer.objects.filter(order_id=order_id).order_by('created_at').values_list(
+        'created_at', flat=True
+    ).first()
+    if first is not None:
+        DriverLedgerCheckpoint.objects.filter(
+            driver_id__in=[d for d in driver_ids if d], entry_time__gte=first
+        ).delete()
+
+
+def invalidate_orders(orders):
+    """``orders`` (live or archived) are being soft-deleted: their entries leave the ledgers."""
+    archived = orders.model is ArchivedOrder
+    expenses = (ArchivedExpense if archived else Expense)._base_manager.filter(order_id__in=orders.values('pk'))
+    transfers = (ArchivedTransfer if archived else MoneyTransfer)._base_manager.filter(
+        order_id__in=orders.values('pk'), transfer_type__in=('to_driver', 'from_driver'),
+    )
+    for driver_id, since in expenses.values('added_by_id').annotate(since=Min('date')).values_list(
+        'added_by_id', 'since',
+    ):
+        invalidate(driver_id, since)
+    for driver_id, since in transfers.values('order__driver_id').annotate(since=Min('created_at')).values_list(
+        'order__driver_id', 'since',
+    ):
+        invalidate(driver_id, since)
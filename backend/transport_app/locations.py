@@ -0,0 +1,92 @@
+# transport_app/locations.py
+import re
+import threading
+
+from django.db import IntegrityError, transaction
+
+from .models import Place, PlaceAlias
+
+# Trailing address parts that do not change the place ("Chennai, TN", "Madurai, Tamil Nadu, India").
+REGION_NAMES = {
+    'india', 'in', 'ind',
+    'andhra pradesh', 'ap', 'karnataka', 'ka', 'kerala', 'kl', 'tamil nadu', 'tamilnadu', 'tn',
+    'telangana', 'ts', 'tg', 'puducherry', 'pondicherry', 'py', 'maharashtra', 'mh', 'goa', 'ga',
+    'gujarat', 'gj', 'odisha', 'orissa', 'od', 'west bengal', 'wb', 'delhi', 'dl', 'new delhi',
+    'haryana', 'hr', 'punjab', 'pb', 'rajasthan', 'rj', 'uttar pradesh', 'up', 'madhya pradesh', 'mp',
+    'bihar', 'br', 'jharkhand', 'jh', 'chhattisgarh', 'cg', 'assam', 'as', 'uttarakhand', 'uk',
+}
+PINCODE_RE = re.compile(r'\b\d{6}\b')
+NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+
+CACHE_SIZE = 10000
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def raw_key(text):
+    return ' '.join((text or '').lower().split())[:255]
+
+
+def normalize_key(text):
+    """Canonical matching key: lower-cased, no pincode, punctuation or trailing state/country."""
+    text = PINCODE_RE.sub(' ', raw_key(text))
+    parts = [NON_WORD_RE.sub(' ', part).strip() for part in text.split(',')]
+    parts = [part for part in parts if part]
+    while len(parts) > 1 and parts[-1] in REGION_NAMES:
+        parts.pop()
+    return ' '.join(' '.join(parts).split())[:200]
+
+
+def resolve_place(text):
+    """
+    Return the Place id for a free-text location, creating the place on first sight.
+
+    Lookups go through an in-process cache, then the PlaceAlias table (exact typed
+    text), then the normalized Place key; only unseen spellings reach the last step.
+    """
+    alias = raw_key(text)
+    if not alias:
+        return None
+    place_id = _cache.get(alias)
+    if place_id is not None:
+        return place_id
+
+    place_id = PlaceAlias.objects.filter(raw_key=alias).values_list('place_id', flat=True).first()
+    if place_id is None:
+        key = normalize_key(text) or alias
+        try:
+            with transaction.atomic():
+                place, _ = Place.objects.get_or_create(key=key, defaults={'name': key.title()})
+                PlaceAlias.objects.create(raw_key=alias, place=place)
+        except IntegrityError:
+            # Another request registered the same spelling first.
+            pass
+        place_id = PlaceAlias.objects.filter(raw_key=alias).values_list('place_id', flat=True).first()
+
+    # Only once the caller's transaction commits: a rolled-back place's id is handed
+    # out again to the next new place, and the cache would send this spelling there.
+    transaction.on_commit(lambda: _remember(alias, place_id))
+    return place_id
+
+
+def _remember(alias, place_id):
+    with _cache_lock:
+        if len(_cache) >= CACHE_SIZE:
+            _cache.clear()
+        _cache[alias] = place_id
+
+
+def find_place(text):
+    """Like resolve_place() but never creates anything; for read-only lookups."""
+    alias = raw_key(text)
+    place_id = _cache.get(alias)
+    if place_id is None:
+        place_id = PlaceAlias.objects.filter(raw_key=alias).values_list('place_id', flat=True).first()
+    if place_id is None:
+        place_id = Place.objects.filter(key=normalize_key(text)).values_list('id', flat=True).first()
+    return place_id
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
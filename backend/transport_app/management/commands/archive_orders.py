@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from transport_app import archive
+from transport_app.models import ArchivedOrder
+
+
+class Command(BaseCommand):
+    help = (
+        "Move delivered and cancelled orders not changed for ARCHIVE_AFTER_DAYS, with their expenses, "
+        "transfers and timeline, to the archive tables (e.g. nightly from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive orders untouched for this many days (default: ARCHIVE_AFTER_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders moved per transaction.')
+        parser.add_argument('--limit', type=int, help='Stop after this many orders.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the orders that would be archived.')
+        parser.add_argument('--restore', nargs='+', metavar='ORDER_NUMBER',
+                            help='Move these archived orders back to the live tables instead.')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            order_ids = list(
+                ArchivedOrder.objects.filter(order_number__in=options['restore']).values_list('pk', flat=True)
+            )
+            if len(order_ids) != len(set(options['restore'])):
+                raise CommandError('Some of these order numbers are not archived.')
+            restored = archive.restore_orders(order_ids)
+            self.stdout.write(self.style.SUCCESS(f'Restored {restored} orders.'))
+            return
+
+        days = settings.ARCHIVE_AFTER_DAYS if options['days'] is None else options['days']
+        if days < 0:
+            raise CommandError('--days must not be negative.')
+        if options['dry_run']:
+            count = archive.candidates(timezone.now() - timedelta(days=days)).count()
+            self.stdout.write(f'{count} orders untouched for {days} days would be archived.')
+            return
+
+        moved = archive.archive_orders(
+            days=days, batch_size=max(options['batch_size'], 1), limit=options['limit'],
+            stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} orders untouched for {days} days.'))
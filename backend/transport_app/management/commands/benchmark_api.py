@@ -0,0 +1,237 @@
+import gc
+import json
+import logging
+import platform
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from transport_app.models import TransportationOrder
+from transport_app.urls import router as transport_router
+from users.models import User
+from users.urls import router as users_router
+
+ROUTERS = (transport_router, users_router)
+ROLES = ('admin', 'owner', 'driver')
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _ledger_driver(user):
+    # The ledger is keyed by driver id rather than by a queryset.
+    if user.role == 'driver':
+        return user.pk
+    orders = TransportationOrder.objects.filter(driver__isnull=False)
+    if user.role == 'owner':
+        orders = orders.filter(owner=user)
+    return orders.order_by('-pk').values_list('driver_id', flat=True).first()
+
+
+DETAIL_IDS = {
+    'ledger': _ledger_driver,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks every GET endpoint registered on the transport and users routers as an admin, "
+        "an owner and a driver: status, p50/p95 latency, queries per request and throughput. "
+        "Results can be saved with --output and compared against an earlier run with --baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per endpoint and role.')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests before timing (fills caches).')
+        parser.add_argument('--roles', nargs='+', choices=ROLES, default=list(ROLES))
+        parser.add_argument('--as', dest='emails', nargs='+', default=[],
+                            help='Emails of the users to benchmark as (default: the busiest user of each role).')
+        parser.add_argument('--endpoint', nargs='+', default=[],
+                            help='Only endpoints whose URL name contains one of these strings.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--baseline', help='JSON file from an earlier --output run to compare with.')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Relative median slowdown reported as a regression (default 0.25 = 25%%).')
+        parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                            help='Ignore median slowdowns smaller than this, whatever the ratio (timer noise).')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1.')
+        users = self.pick_users(options['roles'], options['emails'])
+        endpoints = [
+            endpoint for endpoint in self.endpoints()
+            if not options['endpoint'] or any(part in endpoint[0] for part in options['endpoint'])
+        ]
+        if not endpoints:
+            raise CommandError('No matching endpoints.')
+
+        # Expected 403/404s for roles without access would log a warning per request.
+        request_logger = logging.getLogger('django.request')
+        previous_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            results = self.run(users, endpoints, options['warmup'], options['iterations'])
+        finally:
+            request_logger.setLevel(previous_level)
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'iterations': options['iterations'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['baseline']:
+            regressions = self.compare(report, options['baseline'], options['threshold'], options['min_delta_ms'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}.')
+
+    def run(self, users, endpoints, warmup, iterations):
+        results = {}
+        for role, user in users.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{role}: {user.email}'))
+            client = APIClient(SERVER_NAME='localhost', raise_request_exception=False)
+            client.force_authenticate(user)
+            for name, viewset, basename, detail in endpoints:
+                kwargs = {}
+                if detail:
+                    pk = self.detail_pk(viewset, basename, user)
+                    if pk is None:
+                        self.stdout.write(f'  {name:<32} skipped (no object visible to this user)')
+                        continue
+                    kwargs['pk'] = pk
+                result = self.measure(client, reverse(name, kwargs=kwargs), warmup, iterations)
+                results[f'{role} {name}'] = result
+                self.stdout.write(
+                    f"  {name:<32} {result['status']:>3}  p50 {result['p50_ms']:8.2f} ms  "
+                    f"p95 {result['p95_ms']:8.2f} ms  {result['queries']:6.1f} queries  {result['rps']:8.1f} req/s"
+                )
+        return results
+
+    def pick_users(self, roles, emails):
+        users = {}
+        for email in emails:
+            user = User.objects.filter(email=email).first()
+            if user is None:
+                raise CommandError(f'No user with email {email}.')
+            users[user.role] = user
+        busiest = {
+            'admin': User.objects.filter(role='admin').order_by('pk'),
+            'owner': User.objects.filter(role='owner').annotate(n=Count('owner_orders')).order_by('-n', 'pk'),
+            'driver': User.objects.filter(role='driver').annotate(n=Count('driver_orders')).order_by('-n', 'pk'),
+        }
+        for role in roles:
+            if role not in users:
+                user = busiest[role].filter(is_active=True).first()
+                if user is None:
+                    self.stderr.write(f'No active {role} user; skipping the role.')
+                    continue
+                users[role] = user
+        return {role: users[role] for role in ROLES if role in users and role in roles}
+
+    def endpoints(self):
+        """(url name, viewset, basename, detail) for every GET route of the registered viewsets."""
+        found = []
+        for router in ROUTERS:
+            for prefix, viewset, basename in router.registry:
+                for route in router.get_routes(viewset):
+                    if 'get' in router.get_method_map(viewset, route.mapping):
+                        found.append((route.name.format(basename=basename), viewset, basename, route.detail))
+        return found
+
+    def detail_pk(self, viewset, basename, user):
+        """The newest object the user can see, as the viewset itself scopes it."""
+        if basename in DETAIL_IDS:
+            return DETAIL_IDS[basename](user)
+        request = Request(APIRequestFactory().get('/'))
+        request.user = user
+        view = viewset(request=request, action='retrieve', format_kwarg=None, args=(), kwargs={})
+        try:
+            queryset = view.get_queryset()
+        except (AssertionError, AttributeError):
+            return None
+        return queryset.order_by('-pk').values_list('pk', flat=True).first()
+
+    def measure(self, client, url, warmup, iterations):
+        for _ in range(warmup):
+            client.get(url)
+        timings, queries, statuses = [], [], set()
+        # Like timeit: a full collection in the middle of a request is noise, not endpoint cost.
+        gc.collect()
+        gc.disable()
+        started = time.perf_counter()
+        try:
+            for _ in range(iterations):
+                with CaptureQueriesContext(connection) as captured:
+                    t0 = time.perf_counter()
+                    response = client.get(url)
+                    timings.append((time.perf_counter() - t0) * 1000)
+                queries.append(len(captured.captured_queries))
+                statuses.add(response.status_code)
+        finally:
+            gc.enable()
+        total = time.perf_counter() - started
+        return {
+            'url': url,
+            'status': max(statuses),
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(_percentile(timings, 0.95), 3),
+            'queries': round(statistics.mean(queries), 1),
+            'rps': round(iterations / total, 1),
+        }
+
+    def compare(self, report, path, threshold, min_delta_ms):
+        try:
+            with open(path) as f:
+                baseline = json.load(f)['results']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Compared with {path}'))
+        regressions = []
+        for key, result in report['results'].items():
+            before = baseline.get(key)
+            if before is None:
+                self.stdout.write(f'  {key:<40} new')
+                continue
+            problems = []
+            if result['status'] != before['status']:
+                problems.append(f"status {before['status']} -> {result['status']}")
+            if result['queries'] > before['queries']:
+                problems.append(f"queries {before['queries']} -> {result['queries']}")
+            slower = result['p50_ms'] - before['p50_ms']
+            if slower > min_delta_ms and result['p50_ms'] > before['p50_ms'] * (1 + threshold):
+                problems.append(f"p50 {before['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms")
+            change = (result['p50_ms'] / before['p50_ms'] - 1) * 100 if before['p50_ms'] else 0.0
+            if problems:
+                regressions.append(key)
+                self.stdout.write(self.style.ERROR(f"  {key:<40} {'; '.join(problems)}"))
+            else:
+                self.stdout.write(f'  {key:<40} p50 {change:+6.1f}%')
+        roles = {key.split()[0] for key in report['results']}
+        for key in sorted(set(baseline) - set(report['results'])):
+            if key.split()[0] in roles:
+                self.stdout.write(f'  {key:<40} missing from this run')
+
+        if regressions:
+            self.stdout.write(self.style.ERROR(f'{len(regressions)} regression(s).'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
+        return regressions
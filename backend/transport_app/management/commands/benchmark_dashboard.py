@@ -0,0 +1,160 @@
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User
+
+# (label, sync view, async view)
+ENDPOINTS = (
+    ('stats', 'dashboard-stats', 'dashboard-stats-async'),
+    ('owner_dashboard', 'dashboard-owner-dashboard', 'dashboard-owner-dashboard-async'),
+)
+ROLES = ('admin', 'owner')
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _wsgi_get(handler, path, query, token):
+    """One GET through Django's WSGI handler, as a threaded WSGI server would make it."""
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'localhost',
+        'HTTP_AUTHORIZATION': f'Bearer {token}', 'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(),
+        'wsgi.url_scheme': 'http', 'wsgi.version': (1, 0), 'wsgi.multithread': True,
+        'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    statuses = []
+    response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        body = b''.join(response)
+    finally:
+        response.close()
+    return int(statuses[0].split()[0]), body
+
+
+async def _asgi_get(application, path, query, token):
+    """One GET through Django's ASGI handler (sms_transports/asgi.py), as an ASGI server would make it."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    messages, body_sent = [], False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client stays connected; Django cancels this wait once it has responded
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    status = next(message['status'] for message in messages if message['type'] == 'http.response.start')
+    return status, b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the sync dashboard actions served over WSGI with their async versions served over "
+        "ASGI, under concurrent load: p50/p95/p99/max latency and throughput per endpoint and role."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint, role and server.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight at a time.')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--roles', nargs='+', choices=ROLES, default=list(ROLES))
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be at least 1.')
+        owner = User.objects.filter(role='owner').annotate(n=Count('owner_orders')).order_by('-n', 'pk').first()
+        if owner is None:
+            raise CommandError('No owners; run generate_fleet first.')
+        users = {'admin': User.objects.filter(role='admin').order_by('pk').first(), 'owner': owner}
+        wsgi, asgi = WSGIHandler(), ASGIHandler()
+
+        self.stdout.write(
+            f"{options['requests']} requests per run, {options['concurrency']} in flight; "
+            f"owner {owner.email} ({owner.n} orders)"
+        )
+        for role in options['roles']:
+            user = users[role]
+            if user is None:
+                continue
+            token = str(AccessToken.for_user(user))
+            query = urlencode({'owner_id': owner.pk}) if role == 'admin' else ''
+            for label, sync_name, async_name in ENDPOINTS:
+                sync_path, async_path = reverse(sync_name), reverse(async_name)
+                sync = self.run_wsgi(wsgi, sync_path, query, token, options)
+                asynchronous = asyncio.run(self.run_asgi(asgi, async_path, query, token, options))
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{label} as {role}"))
+                for name, result in (('sync/wsgi', sync), ('async/asgi', asynchronous)):
+                    self.report(name, result)
+                same = json.loads(sync['body']) == json.loads(asynchronous['body'])
+                self.stdout.write(f"  responses {'match' if same else 'DIFFER'}")
+
+    def run_wsgi(self, handler, path, query, token, options):
+        def timed(_):
+            start = time.perf_counter()
+            status, body = _wsgi_get(handler, path, query, token)
+            return time.perf_counter() - start, status, body
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(timed, range(options['warmup'])))
+            start = time.perf_counter()
+            results = list(pool.map(timed, range(options['requests'])))
+            wall = time.perf_counter() - start
+        return self.summarize(results, wall)
+
+    async def run_asgi(self, application, path, query, token, options):
+        slots = asyncio.Semaphore(options['concurrency'])
+
+        async def timed():
+            async with slots:
+                start = time.perf_counter()
+                status, body = await _asgi_get(application, path, query, token)
+                return time.perf_counter() - start, status, body
+
+        await asyncio.gather(*(timed() for _ in range(options['warmup'])))
+        start = time.perf_counter()
+        results = await asyncio.gather(*(timed() for _ in range(options['requests'])))
+        wall = time.perf_counter() - start
+        return self.summarize(results, wall)
+
+    def summarize(self, results, wall):
+        latencies = [seconds * 1000 for seconds, _, _ in results]
+        return {
+            'statuses': sorted({status for _, status, _ in results}),
+            'p50': _percentile(latencies, 0.50),
+            'p95': _percentile(latencies, 0.95),
+            'p99': _percentile(latencies, 0.99),
+            'max': max(latencies),
+            'rps': len(results) / wall,
+            'body': results[-1][2],
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"  {name:<11} status {','.join(map(str, result['statuses'])):<4} "
+            f"p50 {result['p50']:7.1f}  p95 {result['p95']:7.1f}  p99 {result['p99']:7.1f}  "
+            f"max {result['max']:7.1f} ms  {result['rps']:6.1f} req/s"
+        )
@@ -0,0 +1,84 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+
+from transport_app.models import Expense, MoneyTransfer, TimelineEvent
+from users.models import User
+
+# The per-viewset scoping that for_user() replaced, joined through the orders table.
+LEGACY_SCOPES = {
+    Expense: {
+        'owner': lambda rows, user: rows.filter(order__owner=user),
+        'driver': lambda rows, user: rows.filter(added_by=user),
+    },
+    MoneyTransfer: {
+        'owner': lambda rows, user: rows.filter(order__owner=user),
+        'driver': lambda rows, user: rows.filter(Q(order__driver=user) | Q(transfer_type__in=['to_driver', 'from_driver'])),
+    },
+    TimelineEvent: {
+        'owner': lambda rows, user: rows.filter(order__owner=user),
+        'driver': lambda rows, user: rows.filter(order__driver=user),
+    },
+}
+
+
+def _median_ms(func, iterations):
+    timings = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(timings)
+
+
+def _plan(queryset):
+    """'index' or 'scan' for the scoped table, from SQLite's query plan."""
+    table = queryset.model._meta.db_table
+    plan = queryset.explain()
+    scans = [line for line in plan.splitlines() if f'SCAN {table}' in line and 'USING' not in line]
+    return 'scan' if scans else 'index'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the join-based role scoping of expenses, transfers and timeline events with "
+        "for_user() on the busiest owner and driver: rows visible, count and first-page latency "
+        "and, on SQLite, whether the scoped table is scanned."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1.')
+        users = {
+            'owner': User.objects.filter(role='owner').annotate(n=Count('owner_orders')).order_by('-n', 'pk').first(),
+            'driver': User.objects.filter(role='driver').annotate(n=Count('driver_orders')).order_by('-n', 'pk').first(),
+        }
+        page = options['page_size']
+        for model, scopes in LEGACY_SCOPES.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(model.__name__))
+            for role, legacy_scope in scopes.items():
+                user = users[role]
+                if user is None:
+                    continue
+                legacy = legacy_scope(model._base_manager.filter(order__deleted_at__isnull=True), user)
+                scoped = model.objects.for_user(user)
+                results = []
+                for queryset in (legacy, scoped):
+                    count_ms = _median_ms(queryset.count, options['iterations'])
+                    page_ms = _median_ms(lambda: list(queryset[:page]), options['iterations'])
+                    plan = _plan(queryset) if connection.vendor == 'sqlite' else '-'
+                    results.append((queryset.count(), count_ms, page_ms, plan))
+                (old_rows, old_count, old_page, old_plan), (rows, count_ms, page_ms, plan) = results
+                self.stdout.write(
+                    f"  {role:<7} rows {old_rows:>7} -> {rows:<7} "
+                    f"count {old_count:7.2f} -> {count_ms:7.2f} ms  "
+                    f"page {old_page:7.2f} -> {page_ms:7.2f} ms  "
+                    f"plan {old_plan} -> {plan}"
+                )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from transport_app import ledger
+from transport_app.models import DriverLedgerCheckpoint
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Bring every driver's ledger checkpoints up to date (use --rebuild to recompute them from scratch)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Delete existing checkpoints first.")
+        parser.add_argument('--driver', type=int, help="Only this driver id.")
+
+    def handle(self, *args, **options):
+        drivers = User.objects.filter(role='driver')
+        if options['driver']:
+            drivers = drivers.filter(pk=options['driver'])
+        if options['rebuild']:
+            DriverLedgerCheckpoint.objects.filter(driver__in=drivers).delete()
+
+        for driver_id in drivers.values_list('id', flat=True).iterator():
+            result = ledger.balance(driver_id)
+            self.stdout.write(f"Driver {driver_id}: {result['entry_count']} entries, balance {result['balance']}")
+        self.stdout.write(self.style.SUCCESS("Ledger checkpoints up to date."))
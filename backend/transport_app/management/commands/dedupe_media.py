@@ -0,0 +1,72 @@
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from transport_app import storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move existing uploads under MEDIA_ROOT into the content-addressed blob store, "
+        "rewrite the FileField values that point at them, recount references and "
+        "garbage-collect unreferenced blobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without touching files or rows.')
+        parser.add_argument('--no-gc', action='store_true', help='Skip garbage collection of unreferenced blobs.')
+        parser.add_argument('--grace', type=int, default=None,
+                            help='Only collect blobs unreferenced for this many seconds (default: CAS_GC_GRACE_SECONDS).')
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, storage.ContentAddressedStorage):
+            raise CommandError('The default storage backend is not ContentAddressedStorage.')
+
+        dry_run = options['dry_run']
+        migrated = {}
+        missing = set()
+
+        for model, fields in storage.file_field_models():
+            label = model._meta.label
+            for field in fields:
+                updates = defaultdict(list)
+                rows = (
+                    model._base_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                    .exclude(**{f'{field}__startswith': f'{storage.BLOB_PREFIX}/'})
+                    .values_list('pk', field)
+                )
+                for pk, name in rows.iterator(chunk_size=2000):
+                    if name not in migrated:
+                        if not default_storage.exists(name):
+                            missing.add(name)
+                            continue
+                        migrated[name] = name if dry_run else default_storage.ingest(name)
+                    updates[migrated[name]].append(pk)
+
+                if not dry_run:
+                    for new_name, pks in updates.items():
+                        for start in range(0, len(pks), 500):
+                            model._base_manager.filter(pk__in=pks[start:start + 500]).update(**{field: new_name})
+                if updates:
+                    count = sum(len(pks) for pks in updates.values())
+                    self.stdout.write(f"{label}.{field}: {count} rows -> {len(updates)} blobs")
+
+        self.stdout.write(f"Legacy files ingested: {len(migrated)}")
+        if missing:
+            self.stdout.write(self.style.WARNING(f"Referenced files missing on disk: {len(missing)}"))
+            for name in sorted(missing)[:20]:
+                self.stdout.write(f"  {name}")
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS('Dry run complete; nothing was changed.'))
+            return
+
+        changed = storage.recount_references()
+        self.stdout.write(f"Reference counts corrected: {changed}")
+
+        if not options['no_gc']:
+            removed, reclaimed = storage.collect_garbage(grace_seconds=options['grace'])
+            self.stdout.write(f"Orphaned blobs removed: {removed} ({reclaimed} bytes)")
+
+        self.stdout.write(self.style.SUCCESS('Media deduplication complete.'))
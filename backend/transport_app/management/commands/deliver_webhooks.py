@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from transport_app import webhooks
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued webhook events, batched per endpoint, retrying failed endpoints with "
+        "exponential backoff (e.g. every minute from cron, or continuously with --watch)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.WEBHOOK_CONCURRENCY,
+                            help='Endpoints posted to at the same time.')
+        parser.add_argument('--batch-size', type=int, default=settings.WEBHOOK_BATCH_SIZE,
+                            help='Events per POST.')
+        parser.add_argument('--timeout', type=float, default=settings.WEBHOOK_TIMEOUT, help='Seconds per POST.')
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help='Keep running, polling for new events every SECONDS.')
+
+    def handle(self, *args, **options):
+        delivered = failed = 0
+        while True:
+            results = webhooks.deliver_due(
+                concurrency=max(options['concurrency'], 1), batch_size=max(options['batch_size'], 1),
+                timeout=options['timeout'],
+            )
+            for subscription_id, count, error in results:
+                delivered += count
+                if error:
+                    failed += 1
+                    self.stderr.write(self.style.WARNING(f"  subscription {subscription_id}: {error}"))
+                elif count and options['verbosity'] > 1:
+                    self.stdout.write(f"  subscription {subscription_id}: {count} events")
+            # Endpoints that took a full batch may have more waiting
+            if any(count for _, count, _ in results):
+                continue
+            if not options['watch']:
+                break
+            time.sleep(options['watch'])
+        self.stdout.write(self.style.SUCCESS(f"{delivered} events delivered, {failed} failed POSTs."))
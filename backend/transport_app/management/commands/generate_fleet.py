@@ -0,0 +1,345 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from functools import partial
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Max
+
+from transport_app import analytics, lanes
+from transport_app.locations import resolve_place
+from transport_app.models import Truck, TransportationOrder, Expense, MoneyTransfer, TimelineEvent
+from users.models import User
+
+CITIES = [
+    'Chennai', 'Coimbatore', 'Madurai', 'Tiruchirappalli', 'Salem', 'Tirunelveli', 'Erode', 'Vellore',
+    'Bengaluru', 'Mysuru', 'Hubballi', 'Mangaluru', 'Hyderabad', 'Vijayawada', 'Visakhapatnam',
+    'Kochi', 'Thiruvananthapuram', 'Kozhikode', 'Puducherry', 'Mumbai', 'Pune', 'Nagpur',
+    'Ahmedabad', 'Surat', 'Delhi', 'Jaipur', 'Kolkata', 'Bhubaneswar', 'Indore', 'Lucknow',
+]
+FIRST_NAMES = ['Arun', 'Bala', 'Dinesh', 'Ganesh', 'Karthik', 'Murugan', 'Prakash', 'Ravi', 'Senthil', 'Vijay',
+               'Anand', 'Kumar', 'Mani', 'Raja', 'Suresh', 'Venkat', 'Ramesh', 'Saravanan', 'Mohan', 'Selvam']
+LAST_NAMES = ['Kumar', 'Raj', 'Pandian', 'Natarajan', 'Subramanian', 'Krishnan', 'Iyer', 'Reddy', 'Nair', 'Rao']
+LOAD_TYPES = ['Cement', 'Steel', 'Rice', 'Textiles', 'Electronics', 'Furniture', 'Vegetables', 'Sugar', 'Machinery']
+TRUCK_MODELS = [('Tata', 'Signa 4825'), ('Ashok Leyland', 'Ecomet 1615'), ('Eicher', 'Pro 3015'),
+                ('BharatBenz', '2823R'), ('Mahindra', 'Blazo X 28')]
+ORDER_STATUSES = [('delivered', 70), ('in_transit', 8), ('assigned', 7), ('pending', 10), ('cancelled', 5)]
+EXPENSE_CATEGORIES = [('fuel', 50), ('toll', 25), ('food', 12), ('accommodation', 5), ('maintenance', 5), ('other', 3)]
+
+
+@contextmanager
+def historical_timestamps(*models):
+    """Let ORM-created rows keep the created/updated times given to them instead of now()."""
+    fields = [f for m in models for f in m._meta.concrete_fields if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+class RowWriter:
+    """
+    Buffers rows as plain dicts and writes them with executemany.
+
+    Skips model instantiation and per-object query compilation, which dominate
+    bulk_create() at millions of rows. Primary keys are assigned here so child
+    rows can reference their parents before anything is written.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = model._meta.concrete_fields
+        ops = connection.ops
+        self.converters = []
+        for field in self.fields:
+            kind = field.get_internal_type()
+            if kind == 'DateTimeField':
+                convert = ops.adapt_datetimefield_value
+            elif kind == 'DateField':
+                convert = ops.adapt_datefield_value
+            elif kind == 'DecimalField':
+                convert = partial(ops.adapt_decimalfield_value, max_digits=field.max_digits, decimal_places=field.decimal_places)
+            else:
+                convert = None
+            self.converters.append((field.attname, field.get_default(), convert))
+        self.sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            ops.quote_name(model._meta.db_table),
+            ', '.join(ops.quote_name(field.column) for field in self.fields),
+            ', '.join(['%s'] * len(self.fields)),
+        )
+        self.next_id = (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        self.rows = []
+
+    def add(self, **values):
+        values['id'] = row_id = self.next_id
+        self.next_id += 1
+        self.rows.append(values)
+        return row_id
+
+    def flush(self, cursor):
+        params = [
+            tuple(
+                (convert(value) if convert and value is not None else value)
+                for attname, default, convert in self.converters
+                for value in (row.get(attname, default),)
+            )
+            for row in self.rows
+        ]
+        if params:
+            cursor.executemany(self.sql, params)
+        self.rows = []
+        return len(params)
+
+
+def delete_rows(queryset):
+    """
+    Delete the rows of ``queryset`` and everything that cascades from them with
+    set-based SQL. Generated rows never went through signals, so removing them
+    does not need to either (QuerySet.delete() would load and signal every row).
+    """
+    model = queryset.model
+    pks = queryset.values('pk')
+    for field in model._meta.get_fields(include_hidden=True):
+        if not (field.one_to_many or field.one_to_one) or not field.auto_created or field.concrete:
+            continue
+        related = field.related_model._base_manager.filter(**{f'{field.field.name}__in': pks})
+        if field.on_delete is models.CASCADE:
+            delete_rows(related)
+        elif field.on_delete is models.SET_NULL:
+            related.update(**{field.field.name: None})
+    sql, params = pks.query.sql_with_params()
+    table, pk = connection.ops.quote_name(model._meta.db_table), connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {pk} IN ({sql})', params)
+
+
+def weighted(rng, choices):
+    return rng.choices([c for c, _ in choices], weights=[w for _, w in choices])[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic synthetic fleet (owners, drivers, trucks, orders, expenses, transfers, "
+        "timeline events) with bulk inserts, for load testing and benchmarks. The same --seed and --prefix "
+        "always produce the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='gen', help='Prefix for generated emails, truck and order numbers.')
+        parser.add_argument('--owners', type=int, default=10)
+        parser.add_argument('--drivers-per-owner', type=int, default=8)
+        parser.add_argument('--trucks-per-owner', type=int, default=10)
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--expenses-per-order', type=float, default=3, help='Average; actual count varies per order.')
+        parser.add_argument('--days', type=int, default=365, help='Spread pickups over this many days up to today.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--password', default='password123', help='Password of every generated user.')
+        parser.add_argument('--clear', action='store_true', help='Delete data generated earlier with this prefix first.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix'].lower()
+        if not prefix.isalnum() or len(prefix) > 6:
+            raise CommandError('--prefix must be at most 6 letters or digits.')
+        self.prefix = prefix
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        generated_users = User.objects.filter(email__endswith=f'@{prefix}.example.com')
+        if options['clear']:
+            with transaction.atomic():
+                delete_rows(TransportationOrder.objects.filter(order_number__startswith=prefix.upper()))
+                delete_rows(generated_users)
+        elif generated_users.exists():
+            raise CommandError(f'Data with prefix "{prefix}" already exists; use --clear or another --prefix.')
+
+        self.today = date.today()
+        self.now = datetime.combine(self.today, datetime.min.time(), tzinfo=dt_timezone.utc)
+        password = make_password(options['password'])
+
+        with historical_timestamps(Truck):
+            fleet = self.create_fleet(rng, options, password)
+        self.stdout.write(
+            f"Created {len(fleet['owners'])} owners, {sum(len(d) for d in fleet['drivers'].values())} drivers, "
+            f"{sum(len(t) for t in fleet['trucks'].values())} trucks, 1 admin"
+        )
+        totals = self.create_orders(rng, options, fleet)
+
+        # Derived tables that the bulk inserts bypassed
+        lanes.rebuild()
+        analytics.bump_version()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {totals['orders']} orders, {totals['expenses']} expenses, {totals['transfers']} transfers, "
+            f"{totals['events']} timeline events in {elapsed:.1f}s. Log in as {prefix}-admin@{prefix}.example.com "
+            f"with the --password value."
+        ))
+
+    def user(self, role, n, password, rng):
+        return User(
+            email=f'{self.prefix}-{role}{n}@{self.prefix}.example.com', username=f'{self.prefix}-{role}{n}',
+            first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES), role=role,
+            phone=f'9{rng.randrange(10 ** 8, 10 ** 9)}', password=password,
+            driving_license=f'TN{rng.randrange(10 ** 12, 10 ** 13)}' if role == 'driver' else '',
+            license_expiry=self.today + timedelta(days=rng.randrange(-30, 1500)) if role == 'driver' else None,
+        )
+
+    @transaction.atomic
+    def create_fleet(self, rng, options, password):
+        admin = self.user('admin', '', password, rng)
+        admin.is_staff = True
+        admin.save()
+        owners = User.objects.bulk_create([self.user('owner', i, password, rng) for i in range(options['owners'])])
+
+        drivers, trucks = {}, {}
+        for o, owner in enumerate(owners):
+            drivers[owner.pk] = User.objects.bulk_create([
+                self.user('driver', o * options['drivers_per_owner'] + i, password, rng)
+                for i in range(options['drivers_per_owner'])
+            ])
+            owner_trucks = []
+            for i in range(options['trucks_per_owner']):
+                make, model = rng.choice(TRUCK_MODELS)
+                created = self.now - timedelta(days=options['days'] + rng.randrange(30, 700))
+                owner_trucks.append(Truck(
+                    truck_number=f'{self.prefix.upper()}{o:03d}T{i:04d}', make=make, model=model,
+                    year=rng.randrange(2012, self.today.year + 1), axle_count=rng.choice([2, 3, 4]),
+                    rc_expiry=self.today + timedelta(days=rng.randrange(-20, 2000)),
+                    insurance_expiry=self.today + timedelta(days=rng.randrange(-20, 365)),
+                    pollution_expiry=self.today + timedelta(days=rng.randrange(-20, 180)),
+                    status=weighted(rng, [('available', 80), ('on_trip', 12), ('maintenance', 6), ('out_of_service', 2)]),
+                    owner=owner, assigned_driver=drivers[owner.pk][i % len(drivers[owner.pk])] if drivers[owner.pk] else None,
+                    capacity=Decimal(rng.choice([9, 16, 21, 25, 31])), current_mileage=Decimal(rng.randrange(5000, 400000)),
+                    created_at=created, updated_at=created,
+                ))
+            trucks[owner.pk] = Truck.objects.bulk_create(owner_trucks)
+        return {'admin': admin, 'owners': owners, 'drivers': drivers, 'trucks': trucks}
+
+    def create_orders(self, rng, options, fleet):
+        places = {city: resolve_place(city) for city in CITIES}
+        writers = {model: RowWriter(model) for model in (TransportationOrder, Expense, MoneyTransfer, TimelineEvent)}
+        fleet['driver_names'] = {
+            d.pk: d.get_full_name() for drivers in fleet['drivers'].values() for d in drivers
+        }
+        totals = {model: 0 for model in writers}
+        batch_size = max(options['batch_size'], 1)
+        for start in range(0, options['orders'], batch_size):
+            count = min(batch_size, options['orders'] - start)
+            self.create_order_batch(rng, options, fleet, places, writers, start, count)
+            with transaction.atomic(), connection.cursor() as cursor:
+                for model, writer in writers.items():
+                    totals[model] += writer.flush(cursor)
+            self.stdout.write(f"  {start + count}/{options['orders']} orders")
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(writers)):
+                cursor.execute(sql)
+        return {
+            'orders': totals[TransportationOrder], 'expenses': totals[Expense],
+            'transfers': totals[MoneyTransfer], 'events': totals[TimelineEvent],
+        }
+
+    def create_order_batch(self, rng, options, fleet, places, writers, start, count):
+        admin_id = fleet['admin'].pk
+        orders, expenses, transfers, events = (
+            writers[TransportationOrder], writers[Expense], writers[MoneyTransfer], writers[TimelineEvent]
+        )
+        for n in range(start, start + count):
+            owner = rng.choice(fleet['owners'])
+            pickup_city, delivery_city = rng.sample(CITIES, 2)
+            order_status = weighted(rng, ORDER_STATUSES)
+            # Finished orders are spread over the period; open ones are from the last week
+            age = rng.uniform(8, max(options['days'], 9)) if order_status in ('delivered', 'cancelled') else rng.uniform(0, 7)
+            created = self.now - timedelta(days=age)
+            pickup = created + timedelta(hours=rng.uniform(2, 72))
+            estimated = pickup + timedelta(hours=rng.uniform(10, 96))
+            delivered = estimated + timedelta(hours=rng.uniform(-8, 24)) if order_status == 'delivered' else None
+            total = Decimal(rng.randrange(8000, 120000))
+            advance = (total * Decimal(rng.choice([0, 10, 20, 30, 50])) / 100).quantize(Decimal('1'))
+            has_crew = order_status != 'pending'
+            truck = rng.choice(fleet['trucks'][owner.pk]).pk if has_crew and fleet['trucks'][owner.pk] else None
+            driver_id = rng.choice(fleet['drivers'][owner.pk]).pk if has_crew and fleet['drivers'][owner.pk] else None
+            order_number = f'{self.prefix.upper()}{n:09d}'
+            order_id = orders.add(
+                order_number=order_number,
+                description=f'{rng.choice(LOAD_TYPES)} from {pickup_city} to {delivery_city}',
+                pickup_location=pickup_city, pickup_contact=rng.choice(FIRST_NAMES), pickup_phone=f'9{rng.randrange(10 ** 8, 10 ** 9)}',
+                delivery_location=delivery_city, delivery_contact=rng.choice(FIRST_NAMES), delivery_phone=f'9{rng.randrange(10 ** 8, 10 ** 9)}',
+                pickup_place_id=places[pickup_city], delivery_place_id=places[delivery_city],
+                pickup_date=pickup, estimated_delivery_date=estimated, actual_delivery_date=delivered,
+                load_type=rng.choice(LOAD_TYPES), weight=Decimal(rng.randrange(2, 30)),
+                total_amount=total, advance_amount=advance, balance_amount=total - advance,
+                truck_id=truck, driver_id=driver_id, owner_id=owner.pk, status=order_status,
+                created_by_id=admin_id, created_at=created, updated_at=max(created, delivered or created),
+            )
+
+            # Copied from the order onto its rows (models.OrderScopedModel)
+            scope = {'owner_id': owner.pk, 'driver_id': driver_id}
+            events.add(
+                **scope, order_id=order_id, event_type='order_created', title=f'New Order Created: {order_number}',
+                description=f'Order {order_number} created', created_by_id=admin_id, created_at=created,
+            )
+            if driver_id is None:
+                continue
+            events.add(
+                **scope, order_id=order_id, event_type='order_assigned', title=f'Driver Assigned: {order_number}',
+                description=f"Assigned to {fleet['driver_names'][driver_id]}", created_by_id=admin_id,
+                created_at=created + timedelta(minutes=30),
+            )
+            if order_status in ('in_transit', 'delivered'):
+                events.add(
+                    **scope, order_id=order_id, event_type='trip_started', title=f'Trip Started: {order_number}',
+                    description='Status changed from Assigned to In Transit', created_by_id=driver_id,
+                    created_at=pickup,
+                )
+            if order_status == 'delivered':
+                events.add(
+                    **scope, order_id=order_id, event_type='trip_completed', title=f'Trip Completed: {order_number}',
+                    description='Status changed from In Transit to Delivered', created_by_id=driver_id,
+                    created_at=delivered,
+                )
+
+            # Trip float sent to the driver, spent on the way, remainder returned on delivery
+            float_amount = (total * Decimal('0.15')).quantize(Decimal('1'))
+            sent_at = pickup - timedelta(hours=1)
+            transfers.add(
+                **scope, order_id=order_id, transfer_type='to_driver', amount=float_amount, description='Trip advance',
+                status='completed', created_by_id=admin_id, created_at=sent_at, updated_at=sent_at,
+            )
+            if order_status not in ('in_transit', 'delivered'):
+                continue
+            trip_end = delivered or self.now
+            spent = Decimal(0)
+            for _ in range(min(int(rng.expovariate(1 / options['expenses_per_order']) + 0.5), 20)):
+                category = weighted(rng, EXPENSE_CATEGORIES)
+                amount = Decimal(rng.randrange(150, 6000 if category == 'fuel' else 1500))
+                at = pickup + (trip_end - pickup) * rng.random()
+                spent += amount
+                expenses.add(
+                    owner_id=owner.pk, order_id=order_id, category=category, description=f'{category.title()} on the way', amount=amount,
+                    added_by_id=driver_id, date=at, updated_at=at,
+                )
+            if order_status == 'delivered' and float_amount > spent:
+                returned = float_amount - spent if rng.random() < 0.9 else (float_amount - spent) / 2
+                returned_at = trip_end + timedelta(hours=6)
+                transfers.add(
+                    **scope, order_id=order_id, transfer_type='from_driver', amount=returned.quantize(Decimal('1')),
+                    description='Unspent float returned', status='completed', created_by_id=admin_id,
+                    created_at=returned_at, updated_at=returned_at,
+                )
+            if order_status == 'delivered':
+                paid_at = trip_end + timedelta(days=2)
+                transfers.add(
+                    **scope, order_id=order_id, transfer_type='to_owner', amount=total - advance,
+                    description='Balance payment', status=rng.choice(['completed'] * 9 + ['pending']),
+                    created_by_id=admin_id, created_at=paid_at, updated_at=paid_at,
+                )
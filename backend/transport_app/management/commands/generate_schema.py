@@ -0,0 +1,47 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sms_transports import schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the OpenAPI schema to OPENAPI_SCHEMA_FILE at build time (e.g. next to collectstatic); "
+        "/api/schema.json serves it and the Swagger and ReDoc pages load it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Where to write the schema (default: OPENAPI_SCHEMA_FILE).')
+        parser.add_argument('--check', action='store_true',
+                            help='Only fail if the file is missing or differs from the current API, e.g. in CI.')
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.OPENAPI_SCHEMA_FILE
+        body = schema.generate()
+
+        if options['check']:
+            try:
+                with open(path, 'rb') as f:
+                    current = f.read()
+            except FileNotFoundError:
+                raise CommandError(f'{path} does not exist; run generate_schema.')
+            if current != body:
+                raise CommandError(f'{path} is out of date; run generate_schema.')
+            self.stdout.write(self.style.SUCCESS(f'{path} is up to date.'))
+            return
+
+        # Write next to the target and rename, so running workers never read half a file
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.stdout.write(self.style.SUCCESS(f'Wrote {path} ({len(body)} bytes).'))
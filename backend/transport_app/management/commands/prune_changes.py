@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from transport_app import changes
+
+
+class Command(BaseCommand):
+    help = "Delete change log entries older than CHANGES_RETENTION_DAYS (e.g. nightly from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Keep entries from the last this many days (default: CHANGES_RETENTION_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Entries deleted per statement.')
+
+    def handle(self, *args, **options):
+        days = settings.CHANGES_RETENTION_DAYS if options['days'] is None else options['days']
+        if days < 0:
+            raise CommandError('--days must not be negative.')
+        deleted = changes.prune(days=days, batch_size=max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change log entries older than {days} days.'))
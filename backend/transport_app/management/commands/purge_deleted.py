@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transport_app.models import PurgeJob
+from transport_app.purge import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the rows hidden by soft-deleting trucks, orders and users, dependents first, "
+        "one batch per transaction (e.g. every few minutes from cron, or continuously with --watch)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows deleted per transaction.')
+        parser.add_argument('--job', type=int, nargs='+', default=[], help='Run these jobs, whatever their status.')
+        parser.add_argument('--retry-failed', action='store_true', help='Also pick up jobs that failed before.')
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help='Keep running, polling for new jobs every SECONDS.')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        stdout = self.stdout if options['verbosity'] > 1 else None
+
+        if options['job']:
+            jobs = list(PurgeJob.objects.filter(pk__in=options['job']))
+            missing = set(options['job']) - {job.pk for job in jobs}
+            if missing:
+                raise CommandError(f"No purge job with id {', '.join(map(str, sorted(missing)))}.")
+            for job in jobs:
+                self.run(job, batch_size, stdout)
+            return
+
+        while True:
+            job = claim_next_job(retry_failed=options['retry_failed'])
+            if job is not None:
+                self.run(job, batch_size, stdout)
+            elif options['watch']:
+                time.sleep(options['watch'])
+            else:
+                break
+
+    def run(self, job, batch_size, stdout):
+        self.stdout.write(f"Purging {job.object_repr} (job {job.pk})")
+        try:
+            run_job(job, batch_size=batch_size, stdout=stdout)
+        except Exception as e:
+            # The job records the error; move on to the next one
+            self.stderr.write(self.style.ERROR(f"  failed: {e}"))
+            return
+        self.stdout.write(self.style.SUCCESS(f"  {job.rows_deleted} rows deleted"))
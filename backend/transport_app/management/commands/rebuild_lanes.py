@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from transport_app import lanes
+
+
+class Command(BaseCommand):
+    help = "Link orders to normalized places and rebuild the lane rollup table from scratch."
+
+    def handle(self, *args, **options):
+        count = lanes.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} lanes."))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from transport_app.reconciliation import claim_next_run, run_reconciliation
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcile transfers and expenses of orders changed since the last run (e.g. nightly from cron). "
+        "A run queued through the API is done instead of a new one; with --watch, only queued runs are done."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-check every order, not just changed ones.')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Orders checked per query batch.')
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help='Keep running, polling for queued runs every SECONDS.')
+
+    def handle(self, *args, **options):
+        chunk_size = max(options['chunk_size'], 1)
+        stdout = self.stdout if options['verbosity'] > 1 else None
+
+        while True:
+            run = claim_next_run()
+            if run is not None:
+                try:
+                    run = run_reconciliation(run=run, chunk_size=chunk_size, stdout=stdout)
+                except Exception as e:
+                    if not options['watch']:
+                        raise
+                    # The run records the error; keep serving the queue
+                    self.stderr.write(self.style.ERROR(f"Run {run.pk} failed: {e}"))
+                    continue
+            elif options['watch']:
+                time.sleep(options['watch'])
+                continue
+            else:
+                try:
+                    run = run_reconciliation(full=options['full'], chunk_size=chunk_size, stdout=stdout)
+                except IntegrityError:
+                    raise CommandError('A reconciliation run is already in progress.')
+            self.stdout.write(self.style.SUCCESS(
+                f"{'Full' if run.full else 'Incremental'} run: {run.orders_checked} orders checked, "
+                f"{run.issues_found} with issues."
+            ))
+            if not options['watch']:
+                break
@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transport_app import documents
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the invoice and statement PDFs requested through the API in a process pool "
+        "(e.g. continuously with --watch), or with --month every owner's statement for a month-end run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', metavar='YYYY-MM',
+                            help="Render the statement of every owner with orders picked up in this month.")
+        parser.add_argument('--invoices', action='store_true', help="With --month, also the invoices of those orders.")
+        parser.add_argument('--force', action='store_true', help='Render again even where the sources have not changed.')
+        parser.add_argument('--workers', type=int, help='Rendering processes (default: DOCUMENT_WORKERS).')
+        parser.add_argument('--batch-size', type=int, default=50, help='Requested documents claimed at a time.')
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help='Keep running, polling for requested documents every SECONDS.')
+
+    def handle(self, *args, **options):
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers must be at least 1.')
+        if options['month']:
+            try:
+                period = documents.parse_month(options['month'])
+            except ValueError:
+                raise CommandError('--month must be a month, YYYY-MM.')
+            self.month_end(period, options)
+            return
+
+        batch_size = max(options['batch_size'], 1)
+        # One pool for every batch, so the processes only start once
+        with documents.executor(options['workers']) as pool:
+            while True:
+                claimed = documents.claim_pending(batch_size)
+                if claimed:
+                    counts = documents.render_documents(
+                        claimed, workers=options['workers'], force=options['force'], pool=pool,
+                    )
+                    self.stdout.write(
+                        f"{counts['rendered']} rendered, {counts['reused']} unchanged, {counts['failed']} failed"
+                    )
+                elif options['watch']:
+                    time.sleep(options['watch'])
+                else:
+                    break
+
+    def month_end(self, period, options):
+        self.stdout.write(f"Rendering documents for {period:%B %Y}")
+        reported = [0]
+
+        def progress(run):
+            done = run.rendered + run.reused + run.failed
+            # About twenty lines for the whole run
+            if done == run.total or done - reported[0] >= max(run.total // 20, 1):
+                reported[0] = done
+                self.stdout.write(
+                    f"  {done}/{run.total}: {run.rendered} rendered, {run.reused} unchanged, {run.failed} failed"
+                )
+
+        run = documents.run_month(
+            period, invoices=options['invoices'], workers=options['workers'], force=options['force'],
+            progress=progress,
+        )
+        style = self.style.WARNING if run.failed else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Run {run.pk}: {run.total} documents, {run.rendered} rendered, {run.reused} unchanged, "
+            f"{run.failed} failed"
+        ))
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transport_app.expiry import run_scan
+
+
+class Command(BaseCommand):
+    help = "Send batched alerts for truck documents and driving licences nearing expiry. Safe to run repeatedly (e.g. daily from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Scan as of this date (YYYY-MM-DD) instead of today.')
+        parser.add_argument('--dry-run', action='store_true', help='Report alerts without sending or recording them.')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format.')
+
+        result = run_scan(today=today, dry_run=options['dry_run'])
+        self.stdout.write(
+            f"Documents in alert windows: {result['notices']}, "
+            f"new alerts: {result['sent']}, recipients: {result['recipients']}"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Dry run complete; nothing was sent.'))
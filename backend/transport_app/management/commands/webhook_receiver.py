@@ -0,0 +1,55 @@
+import hmac
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from transport_app.webhooks import sign
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local webhook endpoint that prints the batches it receives and checks their "
+        "signatures; --fail-rate makes it answer some POSTs with 503 to exercise retries. "
+        "Deliveries to it need WEBHOOK_ALLOW_PRIVATE_ADDRESSES=True."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--secret', default='', help="The subscription's secret; signatures are checked if given.")
+        parser.add_argument('--fail-rate', type=float, default=0.0, help='Share of POSTs answered with 503.')
+
+    def handle(self, *args, **options):
+        command = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if random.random() < options['fail_rate']:
+                    self.send_response(503)
+                    self.end_headers()
+                    command.stdout.write(command.style.WARNING(f"rejected {len(body)} bytes (simulated outage)"))
+                    return
+                signed = ''
+                if options['secret']:
+                    expected = sign(options['secret'], self.headers.get('X-Webhook-Timestamp', ''), body)
+                    valid = hmac.compare_digest(expected, self.headers.get('X-Webhook-Signature', ''))
+                    signed = ', signature ok' if valid else ', BAD SIGNATURE'
+                events = json.loads(body)['events']
+                types = ', '.join(sorted({event['type'] for event in events}))
+                command.stdout.write(f"{len(events)} events ({types}){signed}")
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), Handler)
+        self.stdout.write(f"Listening on http://127.0.0.1:{options['port']}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
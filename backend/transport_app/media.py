@@ -0,0 +1,165 @@
+# transport_app/media.py
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date
+from rest_framework.permissions import AllowAny
+from rest_framework.views import APIView
+
+from users.models import User
+from .storage import digest_from_name, is_blob_name
+from .views import (
+    ArchiveReadMixin, TruckViewSet, TransportationOrderViewSet, ExpenseViewSet, MoneyTransferViewSet, DocumentViewSet,
+)
+
+# Every viewset that owns uploaded files, with the FileFields it exposes.
+MEDIA_SOURCES = (
+    (TruckViewSet, ('rc_document', 'insurance_document', 'pollution_certificate')),
+    (TransportationOrderViewSet, ('waybill', 'lr_copy', 'other_documents')),
+    (ExpenseViewSet, ('bill_photo',)),
+    (MoneyTransferViewSet, ('receipt',)),
+    (DocumentViewSet, ('file',)),
+)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+SIGNING_SALT = 'transport_app.media'
+
+
+def sign_media_url(url, name, user):
+    """Append a short-lived token so plain links (<a href>, <img src>) can be opened."""
+    signed = signing.TimestampSigner(salt=SIGNING_SALT).sign(f"{name}:{user.pk}")
+    # The name is already in the URL path; only "<user>:<timestamp>:<signature>" is sent.
+    token = signed[len(name) + 1:]
+    return f"{url}{'&' if '?' in url else '?'}token={quote(token)}"
+
+
+def user_from_token(token, name):
+    try:
+        user_id = signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            f"{name}:{token}", max_age=settings.MEDIA_URL_MAX_AGE
+        ).rpartition(':')[2]
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(pk=user_id, is_active=True).first()
+
+
+def can_access(request, name):
+    """True if the file is referenced by a row inside the user's viewset scope."""
+    for viewset_class, fields in MEDIA_SOURCES:
+        view = viewset_class(request=request, action='retrieve', format_kwarg=None, kwargs={})
+        querysets = [view.get_queryset()]
+        if isinstance(view, ArchiveReadMixin):
+            querysets.append(view.get_archive_queryset())
+        for queryset in querysets:
+            for field in fields:
+                if queryset.filter(**{field: name}).exists():
+                    return True
+    return False
+
+
+class ProtectedMediaView(APIView):
+    """
+    Serves MEDIA_ROOT files after applying the owning viewset's role scoping.
+
+    With MEDIA_SERVE_MODE='accel' (nginx) or 'sendfile' (Apache/lighttpd) only the
+    headers are produced here and the web server transfers the bytes; otherwise
+    the file is streamed from Django with single-range support.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, path):
+        name = os.path.normpath(path).replace('\\', '/')
+        if name.startswith(('../', '/')) or name == '..':
+            raise Http404
+
+        user = request.user if request.user.is_authenticated else None
+        if user is None and request.query_params.get('token'):
+            user = user_from_token(request.query_params['token'], name)
+            request.user = user
+        if user is None or not can_access(request, name):
+            # 404 rather than 403 so file names cannot be probed.
+            raise Http404
+
+        if not default_storage.exists(name):
+            raise Http404
+        return serve(request, name)
+
+
+def serve(request, name):
+    content_type, encoding = mimetypes.guess_type(name)
+    content_type = content_type or 'application/octet-stream'
+    etag = f'"{digest_from_name(name)}"' if is_blob_name(name) else None
+
+    if etag and request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified()
+
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == 'accel':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_LOCATION + quote(name)
+    elif mode == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = default_storage.path(name)
+    else:
+        response = stream_file(request, name, content_type)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if etag:
+        # Blob names are content hashes, so the bytes behind a URL never change.
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def stream_file(request, name, content_type):
+    path = default_storage.path(name)
+    size = os.path.getsize(path)
+    match = RANGE_RE.match(request.headers.get('Range', '').strip())
+
+    if not match or match.groups() == ('', ''):
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+        response['Last-Modified'] = http_date(os.path.getmtime(path))
+        return response
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the final N bytes.
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or start > end:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    response = StreamingHttpResponse(
+        read_range(path, start, end - start + 1), status=206, content_type=content_type
+    )
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def read_range(path, offset, length):
+    with open(path, 'rb') as fh:
+        fh.seek(offset)
+        while length > 0:
+            chunk = fh.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0002_alter_transportationorder_balance_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='transport_a_ref_cou_b1d62c_idx')],
+            },
+        ),
+    ]
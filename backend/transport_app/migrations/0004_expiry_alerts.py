@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0003_storedblob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='truck',
+            name='insurance_expiry',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='truck',
+            name='pollution_expiry',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='truck',
+            name='rc_expiry',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.CreateModel(
+            name='ExpiryAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('rc', 'RC'), ('insurance', 'Insurance'), ('pollution', 'Pollution Certificate'), ('license', 'Driving License')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('expiry_date', models.DateField()),
+                ('window_days', models.IntegerField(help_text='Alert window the document fell into (0 = already expired)')),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('driver', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='license_alerts', to=settings.AUTH_USER_MODEL)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expiry_alerts', to=settings.AUTH_USER_MODEL)),
+                ('truck', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='expiry_alerts', to='transport_app.truck')),
+            ],
+            options={
+                'ordering': ['-sent_at'],
+                'indexes': [models.Index(fields=['expiry_date'], name='transport_a_expiry__b39d33_idx')],
+                'constraints': [models.UniqueConstraint(fields=('document_type', 'object_id', 'expiry_date', 'window_days', 'recipient'), name='unique_expiry_alert')],
+            },
+        ),
+    ]
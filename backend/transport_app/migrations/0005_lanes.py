@@ -0,0 +1,68 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0004_expiry_alerts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Place',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('key', models.CharField(help_text='Normalized form used for matching', max_length=200, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transportationorder',
+            name='delivery_place',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transport_app.place'),
+        ),
+        migrations.AddField(
+            model_name='transportationorder',
+            name='pickup_place',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transport_app.place'),
+        ),
+        migrations.CreateModel(
+            name='PlaceAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('raw_key', models.CharField(help_text='Location text as typed, lower-cased and trimmed', max_length=255, unique=True)),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='transport_app.place')),
+            ],
+            options={
+                'verbose_name_plural': 'Place aliases',
+            },
+        ),
+        migrations.CreateModel(
+            name='LaneStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expense_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('delivered_count', models.IntegerField(default=0)),
+                ('transit_seconds', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lane_stats', to=settings.AUTH_USER_MODEL)),
+                ('delivery_place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='transport_app.place')),
+                ('pickup_place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='transport_app.place')),
+            ],
+            options={
+                'ordering': ['-order_count'],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'pickup_place', 'delivery_place'), name='unique_owner_lane')],
+            },
+        ),
+    ]
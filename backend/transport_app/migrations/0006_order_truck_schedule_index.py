@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0005_lanes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transportationorder',
+            index=models.Index(fields=['truck', 'pickup_date'], name='transport_a_truck_i_43aa43_idx'),
+        ),
+    ]
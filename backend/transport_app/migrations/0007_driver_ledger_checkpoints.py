@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0006_order_truck_schedule_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverLedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_time', models.DateTimeField()),
+                ('entry_kind', models.CharField(max_length=10)),
+                ('entry_id', models.BigIntegerField()),
+                ('entry_count', models.IntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_checkpoints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-entry_time', '-entry_kind', '-entry_id'],
+                'indexes': [models.Index(fields=['driver', 'entry_time'], name='transport_a_driver__e27363_idx')],
+            },
+        ),
+    ]
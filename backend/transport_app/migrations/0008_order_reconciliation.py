@@ -0,0 +1,72 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0007_driver_ledger_checkpoints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='moneytransfer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='transportationorder',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('orders_checked', models.IntegerField(default=0)),
+                ('issues_found', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReconciliationResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sent_to_driver', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('returned_by_driver', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expense_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('received_by_owner', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('paid_by_owner', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('driver_float', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expected_balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('overspend', models.BooleanField(default=False)),
+                ('unreturned_float', models.BooleanField(default=False)),
+                ('balance_drift', models.BooleanField(default=False)),
+                ('has_issues', models.BooleanField(db_index=True, default=False)),
+                ('stale', models.BooleanField(db_index=True, default=False)),
+                ('checked_at', models.DateTimeField()),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reconciliation', to='transport_app.transportationorder')),
+                ('run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='results', to='transport_app.reconciliationrun')),
+            ],
+            options={
+                'ordering': ['-checked_at'],
+            },
+        ),
+    ]
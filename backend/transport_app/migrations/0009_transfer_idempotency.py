@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def blank_duplicate_transaction_ids(apps, schema_editor):
+    # The first transfer with a transaction ID keeps it; later copies are blanked so the constraint can be added
+    MoneyTransfer = apps.get_model('transport_app', 'MoneyTransfer')
+    duplicates = MoneyTransfer.objects.exclude(transaction_id='').order_by().values('transaction_id').annotate(
+        first=Min('pk'), count=Count('pk'),
+    ).filter(count__gt=1)
+    for row in duplicates:
+        MoneyTransfer.objects.filter(transaction_id=row['transaction_id']).exclude(pk=row['first']).update(
+            transaction_id='',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0008_order_reconciliation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moneytransfer',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(blank_duplicate_transaction_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='moneytransfer',
+            constraint=models.UniqueConstraint(condition=models.Q(('transaction_id', ''), _negated=True), fields=('transaction_id',), name='unique_transfer_transaction_id'),
+        ),
+    ]
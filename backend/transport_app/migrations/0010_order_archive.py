@@ -0,0 +1,111 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0009_transfer_idempotency'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('order_number', models.CharField(blank=True, max_length=20, unique=True)),
+                ('description', models.TextField()),
+                ('pickup_location', models.CharField(max_length=255)),
+                ('pickup_contact', models.CharField(max_length=100)),
+                ('pickup_phone', models.CharField(max_length=15)),
+                ('delivery_location', models.CharField(max_length=255)),
+                ('delivery_contact', models.CharField(max_length=100)),
+                ('delivery_phone', models.CharField(max_length=15)),
+                ('pickup_date', models.DateTimeField()),
+                ('estimated_delivery_date', models.DateTimeField()),
+                ('actual_delivery_date', models.DateTimeField(blank=True, null=True)),
+                ('load_type', models.CharField(max_length=100)),
+                ('weight', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('volume', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('advance_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('balance_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('assigned', 'Assigned'), ('in_transit', 'In Transit'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('waybill', models.FileField(blank=True, null=True, upload_to='documents/waybills/')),
+                ('lr_copy', models.FileField(blank=True, null=True, upload_to='documents/lr/')),
+                ('other_documents', models.FileField(blank=True, null=True, upload_to='documents/other/')),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('delivery_place', models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transport_app.place')),
+                ('driver', models.ForeignKey(blank=True, limit_choices_to={'role': 'driver'}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(limit_choices_to={'role': 'owner'}, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('pickup_place', models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transport_app.place')),
+                ('truck', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transport_app.truck')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedExpense',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('category', models.CharField(choices=[('fuel', 'Fuel'), ('toll', 'Toll'), ('maintenance', 'Maintenance'), ('food', 'Food'), ('accommodation', 'Accommodation'), ('other', 'Other')], max_length=20)),
+                ('description', models.TextField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('bill_photo', models.FileField(blank=True, null=True, upload_to='expenses/bills/')),
+                ('date', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('added_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expenses', to='transport_app.archivedorder')),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransfer',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('transfer_type', models.CharField(choices=[('to_driver', 'To Driver'), ('from_driver', 'From Driver'), ('to_owner', 'To Owner'), ('from_owner', 'From Owner')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('description', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('transaction_id', models.CharField(blank=True, max_length=100)),
+                ('bank_name', models.CharField(blank=True, max_length=100)),
+                ('account_number', models.CharField(blank=True, max_length=50)),
+                ('ifsc_code', models.CharField(blank=True, max_length=20)),
+                ('receipt', models.FileField(blank=True, null=True, upload_to='transfers/receipts/')),
+                ('idempotency_key', models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfers', to='transport_app.archivedorder')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTimelineEvent',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('event_type', models.CharField(choices=[('order_created', 'Order Created'), ('order_assigned', 'Order Assigned'), ('order_status_changed', 'Order Status Changed'), ('expense_added', 'Expense Added'), ('money_transferred', 'Money Transferred'), ('document_uploaded', 'Document Uploaded'), ('trip_started', 'Trip Started'), ('trip_completed', 'Trip Completed')], max_length=30)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to='transport_app.archivedorder')),
+                ('related_expense', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='transport_app.archivedexpense')),
+                ('related_transfer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='transport_app.archivedtransfer')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
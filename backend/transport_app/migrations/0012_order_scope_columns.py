@@ -0,0 +1,104 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_order_columns(apps, schema_editor):
+    tables = (
+        ('TransportationOrder', ('Expense', 'MoneyTransfer', 'TimelineEvent')),
+        ('ArchivedOrder', ('ArchivedExpense', 'ArchivedTransfer', 'ArchivedTimelineEvent')),
+    )
+    for order_name, child_names in tables:
+        orders = apps.get_model('transport_app', order_name)._base_manager
+        for child_name in child_names:
+            child = apps.get_model('transport_app', child_name)
+            columns = [f.name for f in child._meta.concrete_fields if f.name in ('owner', 'driver')]
+            child._base_manager.update(**{
+                f'{column}_id': Subquery(orders.filter(pk=OuterRef('order_id')).values(f'{column}_id')[:1])
+                for column in columns
+            })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0011_soft_delete'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedexpense',
+            name='owner',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedtimelineevent',
+            name='driver',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedtimelineevent',
+            name='owner',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedtransfer',
+            name='driver',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedtransfer',
+            name='owner',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='moneytransfer',
+            name='driver',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='moneytransfer',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='timelineevent',
+            name='driver',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='timelineevent',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['owner', 'date', 'order'], name='transport_a_owner_i_f23bb0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['owner', 'created_at', 'order'], name='transport_a_owner_i_5174be_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['driver', 'created_at', 'order'], name='transport_a_driver__75550a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineevent',
+            index=models.Index(fields=['owner', 'created_at', 'order'], name='transport_a_owner_i_36e0f5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineevent',
+            index=models.Index(fields=['driver', 'created_at', 'order'], name='transport_a_driver__71206f_idx'),
+        ),
+        migrations.RunPython(copy_order_columns, migrations.RunPython.noop),
+    ]
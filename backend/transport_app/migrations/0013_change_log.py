@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0012_order_scope_columns'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Created or updated'), ('delete', 'Deleted')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('creator', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('driver', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('owner', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['owner', 'id'], name='transport_a_owner_i_045132_idx'), models.Index(fields=['driver', 'id'], name='transport_a_driver__d598cf_idx'), models.Index(fields=['creator', 'id'], name='transport_a_creator_793074_idx')],
+            },
+        ),
+    ]
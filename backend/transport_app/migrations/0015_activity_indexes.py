@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0014_webhooks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['added_by', 'date'], name='transport_a_added_b_3642c4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['order', 'date'], name='transport_a_order_i_e1f4a1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['order', 'created_at'], name='transport_a_order_i_19b404_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineevent',
+            index=models.Index(fields=['order', 'created_at'], name='transport_a_order_i_7a0cf0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineevent',
+            index=models.Index(fields=['created_by', 'created_at'], name='transport_a_created_513e0b_idx'),
+        ),
+    ]
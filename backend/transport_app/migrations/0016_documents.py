@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0015_activity_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('invoices', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('total', models.IntegerField(default=0)),
+                ('rendered', models.IntegerField(default=0)),
+                ('reused', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('started_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Document',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('invoice', 'Invoice'), ('statement', 'Trip statement')], max_length=20)),
+                ('period', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('rendering', 'Rendering'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('file', models.FileField(blank=True, null=True, upload_to='documents/generated/')),
+                ('source_version', models.CharField(blank=True, max_length=64)),
+                ('error', models.TextField(blank=True)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('rendered_at', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='transport_app.transportationorder')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documents', to=settings.AUTH_USER_MODEL)),
+                ('run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='documents', to='transport_app.documentrun')),
+            ],
+            options={
+                'ordering': ['-requested_at'],
+                'indexes': [models.Index(fields=['status', 'requested_at'], name='transport_a_status_8cff69_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('kind', 'invoice')), fields=('order',), name='unique_order_invoice'), models.UniqueConstraint(condition=models.Q(('kind', 'statement')), fields=('owner', 'period'), name='unique_owner_statement')],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0016_documents'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTrackSegment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('count', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('driver', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_segments', to='transport_app.archivedorder')),
+                ('truck', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transport_app.truck')),
+            ],
+            options={
+                'ordering': ['started_at', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TruckPosition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('recorded_at', models.DateTimeField()),
+                ('driver', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transport_app.transportationorder')),
+                ('truck', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='position', to='transport_app.truck')),
+            ],
+            options={
+                'ordering': ['-recorded_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrackSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('count', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('driver', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_segments', to='transport_app.transportationorder')),
+                ('truck', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transport_app.truck')),
+            ],
+            options={
+                'ordering': ['started_at', 'id'],
+                'indexes': [models.Index(fields=['order', 'started_at'], name='transport_a_order_i_83c859_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0017_tracking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='archived_order',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='transport_app.archivedorder'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='document',
+            constraint=models.UniqueConstraint(condition=models.Q(('kind', 'invoice')), fields=('archived_order',), name='unique_archived_order_invoice'),
+        ),
+    ]
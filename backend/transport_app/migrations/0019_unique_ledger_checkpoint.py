@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_checkpoints(apps, schema_editor):
+    # Checkpoints are derived data; copies written by concurrent requests hold the same balance
+    DriverLedgerCheckpoint = apps.get_model('transport_app', 'DriverLedgerCheckpoint')
+    duplicates = DriverLedgerCheckpoint.objects.order_by().values('driver', 'entry_count').annotate(
+        first=Min('pk'), count=Count('pk'),
+    ).filter(count__gt=1)
+    for row in duplicates:
+        DriverLedgerCheckpoint.objects.filter(driver=row['driver'], entry_count=row['entry_count']).exclude(
+            pk=row['first'],
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0018_document_claims_and_archived_orders'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_checkpoints, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='driverledgercheckpoint',
+            constraint=models.UniqueConstraint(fields=('driver', 'entry_count'), name='unique_ledger_checkpoint'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fail_extra_running_runs(apps, schema_editor):
+    # Runs whose process died stayed running; only the latest can still be going
+    ReconciliationRun = apps.get_model('transport_app', 'ReconciliationRun')
+    latest = ReconciliationRun.objects.filter(status='running').order_by('-started_at', '-pk').first()
+    if latest is not None:
+        ReconciliationRun.objects.filter(status='running').exclude(pk=latest.pk).update(
+            status='failed', error='Abandoned: still running after an hour.', finished_at=F('started_at'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0019_unique_ledger_checkpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_extra_running_runs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reconciliationrun',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='reconciliationrun',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('pending', 'running'))), fields=('status',), name='one_active_reconciliation'),
+        ),
+    ]
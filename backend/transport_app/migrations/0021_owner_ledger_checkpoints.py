@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def delete_checkpoints(apps, schema_editor):
+    # They counted the rows of soft-deleted orders; the next balance read rebuilds them
+    apps.get_model('transport_app', 'DriverLedgerCheckpoint').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transport_app', '0020_one_active_reconciliation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_checkpoints, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='driverledgercheckpoint',
+            name='unique_ledger_checkpoint',
+        ),
+        migrations.AddField(
+            model_name='driverledgercheckpoint',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='driverledgercheckpoint',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner__isnull', True)), fields=('driver', 'entry_count'), name='unique_ledger_checkpoint'),
+        ),
+        migrations.AddConstraint(
+            model_name='driverledgercheckpoint',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner__isnull', False)), fields=('driver', 'owner', 'entry_count'), name='unique_owner_ledger_checkpoint'),
+        ),
+    ]
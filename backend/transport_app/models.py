@@ -1,8 +1,44 @@
 # transport_app/models.py - FIXED VERSION
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 from users.models import User
 
+
+class ScopedQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """
+        Rows ``user`` may see: all of them for admins, otherwise the rows whose
+        ROLE_SCOPES columns for the user's role hold the user's id.
+        """
+        if user.role == 'admin':
+            return self
+        columns = self.model.ROLE_SCOPES.get(user.role, ())
+        if not columns:
+            return self.none()
+        if len(columns) == 1:
+            return self.filter(**{columns[0]: user.pk})
+        # An OR across columns makes SQLite scan the table; a UNION of one index lookup per column does not
+        branches = [self.model._base_manager.filter(**{column: user.pk}).order_by().values('pk') for column in columns]
+        return self.filter(pk__in=branches[0].union(*branches[1:]))
+
+
+ScopedManager = models.Manager.from_queryset(ScopedQuerySet)
+
+
+class NotDeletedManager(ScopedManager):
+    # Soft-deleted rows (transport_app/purge.py) are hidden until purged; use all_objects to see them
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class OrderRowsManager(ScopedManager):
+    # Rows of a soft-deleted order are hidden with it
+    def get_queryset(self):
+        orders = self.model._meta.get_field('order').related_model
+        return super().get_queryset().exclude(order__in=orders.all_objects.filter(deleted_at__isnull=False).values('pk'))
+
+
 class Truck(models.Model):
     STATUS_CHOICES = (
         ('available', 'Available'),
@@ -18,13 +54,13 @@ class Truck(models.Model):
     axle_count = models.IntegerField(default=2, validators=[MinValueValidator(2)])
     
     rc_document = models.FileField(upload_to='documents/rc/', null=True, blank=True)
-    rc_expiry = models.DateField()
+    rc_expiry = models.DateField(db_index=True)
     
     insurance_document = models.FileField(upload_to='documents/insurance/', null=True, blank=True)
-    insurance_expiry = models.DateField()
+    insurance_expiry = models.DateField(db_index=True)
     
     pollution_certificate = models.FileField(upload_to='documents/pollution/', null=True, blank=True)
-    pollution_expiry = models.DateField()
+    pollution_expiry = models.DateField(db_index=True)
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='available')
     owner = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role': 'owner'}, related_name='owned_trucks')
@@ -37,6 +73,13 @@ class Truck(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
+    
+    objects = NotDeletedManager()
+    all_objects = models.Manager()
+    
+    # Columns that give owners and drivers access (see ScopedQuerySet.for_user)
+    ROLE_SCOPES = {'owner': ('owner',), 'driver': ('assigned_driver',)}
     
     class Meta:
         ordering = ['-created_at']
@@ -48,6 +91,29 @@ class Truck(models.Model):
         return dict(self.STATUS_CHOICES).get(self.status, self.status)
 
 
+class Place(models.Model):
+    name = models.CharField(max_length=200)
+    key = models.CharField(max_length=200, unique=True, help_text="Normalized form used for matching")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
+class PlaceAlias(models.Model):
+    raw_key = models.CharField(max_length=255, unique=True, help_text="Location text as typed, lower-cased and trimmed")
+    place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='aliases')
+    
+    class Meta:
+        verbose_name_plural = 'Place aliases'
+    
+    def __str__(self):
+        return f"{self.raw_key} -> {self.place}"
+
+
 class TransportationOrder(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -57,6 +123,15 @@ class TransportationOrder(models.Model):
         ('cancelled', 'Cancelled'),
     )
     
+    # Allowed status changes; delivered and cancelled orders are final
+    STATUS_TRANSITIONS = {
+        'pending': ('assigned', 'in_transit', 'cancelled'),
+        'assigned': ('pending', 'in_transit', 'cancelled'),
+        'in_transit': ('delivered', 'cancelled'),
+        'delivered': (),
+        'cancelled': (),
+    }
+    
     order_number = models.CharField(max_length=20, unique=True, blank=True)
     description = models.TextField()
     
@@ -68,6 +143,9 @@ class TransportationOrder(models.Model):
     delivery_contact = models.CharField(max_length=100)
     delivery_phone = models.CharField(max_length=15)
     
+    pickup_place = models.ForeignKey(Place, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+')
+    delivery_place = models.ForeignKey(Place, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+')
+    
     pickup_date = models.DateTimeField()
     estimated_delivery_date = models.DateTimeField()
     actual_delivery_date = models.DateTimeField(null=True, blank=True)
@@ -94,10 +172,19 @@ class TransportationOrder(models.Model):
     
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_orders')
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
+    
+    objects = NotDeletedManager()
+    all_objects = models.Manager()
+    
+    ROLE_SCOPES = {'owner': ('owner',), 'driver': ('driver',)}
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['truck', 'pickup_date']),
+        ]
     
     def __str__(self):
         return f"{self.order_number} - {self.load_type}"
@@ -108,19 +195,45 @@ class TransportationOrder(models.Model):
             import random
             self.order_number = f"TRANS{random.randint(100000, 999999)}"
             # Check if unique
-            while TransportationOrder.objects.filter(order_number=self.order_number).exists():
+            while (TransportationOrder.all_objects.filter(order_number=self.order_number).exists()
+                   or ArchivedOrder.all_objects.filter(order_number=self.order_number).exists()):
                 self.order_number = f"TRANS{random.randint(100000, 999999)}"
         
         if self.total_amount and self.advance_amount:
             self.balance_amount = self.total_amount - self.advance_amount
         
+        from .locations import resolve_place
+        self.pickup_place_id = resolve_place(self.pickup_location)
+        self.delivery_place_id = resolve_place(self.delivery_location)
+        
         super().save(*args, **kwargs)
     
     def get_status_display(self):
         return dict(self.STATUS_CHOICES).get(self.status, self.status)
 
 
-class Expense(models.Model):
+class OrderScopedModel(models.Model):
+    """
+    A row belonging to an order that keeps a copy of the order's owner and driver
+    (ORDER_COPIED_FIELDS), so scoping by role filters an indexed column instead
+    of joining the orders table. The order's post_save signal updates the copies.
+    """
+    ORDER_COPIED_FIELDS = ('owner', 'driver')
+    
+    class Meta:
+        abstract = True
+    
+    def save(self, *args, **kwargs):
+        order = self.order if self.order_id else None
+        for field in self.ORDER_COPIED_FIELDS:
+            setattr(self, f'{field}_id', getattr(order, f'{field}_id', None))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'order' in update_fields:
+            kwargs['update_fields'] = {*update_fields, *self.ORDER_COPIED_FIELDS}
+        super().save(*args, **kwargs)
+
+
+class Expense(OrderScopedModel):
     CATEGORY_CHOICES = (
         ('fuel', 'Fuel'),
         ('toll', 'Toll'),
@@ -137,9 +250,25 @@ class Expense(models.Model):
     bill_photo = models.FileField(upload_to='expenses/bills/', null=True, blank=True)
     date = models.DateTimeField(auto_now_add=True)
     added_by = models.ForeignKey(User, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, editable=False, db_index=False, related_name='+')
+    
+    objects = OrderRowsManager()
+    
+    ORDER_COPIED_FIELDS = ('owner',)
+    ROLE_SCOPES = {'owner': ('owner',), 'driver': ('added_by',)}
     
     class Meta:
         ordering = ['-date']
+        # Scope column first, then the list ordering, so a page is read straight from the index;
+        # order_id makes counts index-only (OrderRowsManager checks it)
+        indexes = [
+            models.Index(fields=['owner', 'date', 'order']),
+            # The activity feed's driver and order streams (transport_app/activity.py)
+            models.Index(fields=['added_by', 'date']),
+            models.Index(fields=['order', 'date']),
+        ]
     
     def __str__(self):
         return f"{self.order.order_number} - {self.category}: ₹{self.amount}"
@@ -148,7 +277,7 @@ class Expense(models.Model):
         return dict(self.CATEGORY_CHOICES).get(self.category, self.category)
 
 
-class MoneyTransfer(models.Model):
+class MoneyTransfer(OrderScopedModel):
     TRANSFER_TYPE_CHOICES = (
         ('to_driver', 'To Driver'),
         ('from_driver', 'From Driver'),
@@ -175,12 +304,33 @@ class MoneyTransfer(models.Model):
     
     receipt = models.FileField(upload_to='transfers/receipts/', null=True, blank=True)
     
+    # Client-supplied Idempotency-Key header of the request that created the transfer
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, editable=False, db_index=False, related_name='+')
+    driver = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, editable=False, db_index=False, related_name='+')
+    
+    objects = OrderRowsManager()
+    
+    ROLE_SCOPES = {'owner': ('owner',), 'driver': ('driver',)}
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', 'created_at', 'order']),
+            models.Index(fields=['driver', 'created_at', 'order']),
+            models.Index(fields=['order', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['transaction_id'], condition=~models.Q(transaction_id=''),
+                name='unique_transfer_transaction_id',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.order.order_number} - {self.transfer_type}: ₹{self.amount}"
@@ -192,7 +342,7 @@ class MoneyTransfer(models.Model):
         return dict(self.STATUS_CHOICES).get(self.status, self.status)
 
 
-class TimelineEvent(models.Model):
+class TimelineEvent(OrderScopedModel):
     EVENT_TYPE_CHOICES = (
         ('order_created', 'Order Created'),
         ('order_assigned', 'Order Assigned'),
@@ -215,11 +365,522 @@ class TimelineEvent(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, editable=False, db_index=False, related_name='+')
+    driver = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, editable=False, db_index=False, related_name='+')
+    
+    objects = OrderRowsManager()
+    
+    # Drivers also see the events they created, e.g. for expenses on an order since reassigned
+    ROLE_SCOPES = {'owner': ('owner',), 'driver': ('driver', 'created_by')}
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', 'created_at', 'order']),
+            models.Index(fields=['driver', 'created_at', 'order']),
+            models.Index(fields=['order', 'created_at']),
+            models.Index(fields=['created_by', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.order.order_number} - {self.title}"
     
     def get_event_type_display(self):
-        return dict(self.EVENT_TYPE_CHOICES).get(self.event_type, self.event_type)
\ No newline at end of file
+        return dict(self.EVENT_TYPE_CHOICES).get(self.event_type, self.event_type)
+
+class StoredBlob(models.Model):
+    digest = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class ExpiryAlert(models.Model):
+    DOCUMENT_TYPE_CHOICES = (
+        ('rc', 'RC'),
+        ('insurance', 'Insurance'),
+        ('pollution', 'Pollution Certificate'),
+        ('license', 'Driving License'),
+    )
+    
+    document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPE_CHOICES)
+    # Truck id for truck documents, driver id for licences
+    object_id = models.BigIntegerField()
+    truck = models.ForeignKey(Truck, on_delete=models.CASCADE, null=True, blank=True, related_name='expiry_alerts')
+    driver = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='license_alerts')
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expiry_alerts')
+    expiry_date = models.DateField()
+    window_days = models.IntegerField(help_text="Alert window the document fell into (0 = already expired)")
+    sent_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-sent_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['document_type', 'object_id', 'expiry_date', 'window_days', 'recipient'],
+                name='unique_expiry_alert',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['expiry_date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_document_type_display()} #{self.object_id} expires {self.expiry_date} ({self.window_days}d)"
+    
+    def get_document_type_display(self):
+        return dict(self.DOCUMENT_TYPE_CHOICES).get(self.document_type, self.document_type)
+
+
+class LaneStat(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lane_stats')
+    pickup_place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='+')
+    delivery_place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='+')
+    
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expense_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    delivered_count = models.IntegerField(default=0)
+    transit_seconds = models.BigIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-order_count']
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'pickup_place', 'delivery_place'], name='unique_owner_lane'),
+        ]
+    
+    def __str__(self):
+        return f"{self.pickup_place} -> {self.delivery_place} ({self.order_count} orders)"
+
+
+class DriverLedgerCheckpoint(models.Model):
+    # Running balance of a driver's ledger up to and including the entry (time, kind, id)
+    driver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ledger_checkpoints')
+    # Set for the part of the ledger an owner sees: the entries of their orders only
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    entry_time = models.DateTimeField()
+    entry_kind = models.CharField(max_length=10)
+    entry_id = models.BigIntegerField()
+    entry_count = models.IntegerField()
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-entry_time', '-entry_kind', '-entry_id']
+        indexes = [
+            models.Index(fields=['driver', 'entry_time']),
+        ]
+        constraints = [
+            # Two requests extending the same tail write the same checkpoints; only one is kept
+            models.UniqueConstraint(
+                fields=['driver', 'entry_count'], condition=models.Q(owner__isnull=True), name='unique_ledger_checkpoint',
+            ),
+            models.UniqueConstraint(
+                fields=['driver', 'owner', 'entry_count'], condition=models.Q(owner__isnull=False),
+                name='unique_owner_ledger_checkpoint',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.driver} @ {self.entry_time}: ₹{self.balance}"
+
+
+class ReconciliationRun(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
+    full = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    # Orders changed after this moment are re-checked by the next incremental run.
+    # A pending run holds the time it was requested until reconcile_orders starts it.
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    orders_checked = models.IntegerField(default=0)
+    issues_found = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    
+    class Meta:
+        ordering = ['-started_at']
+        constraints = [
+            # At most one run queued and one running (transport_app/reconciliation.py)
+            models.UniqueConstraint(
+                fields=['status'], condition=models.Q(status__in=('pending', 'running')), name='one_active_reconciliation',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Reconciliation {self.started_at:%Y-%m-%d %H:%M} ({self.status})"
+    
+    def get_status_display(self):
+        return dict(self.STATUS_CHOICES).get(self.status, self.status)
+
+
+class ReconciliationResult(models.Model):
+    # Latest reconciliation of one order; amounts count completed transfers only
+    order = models.OneToOneField(TransportationOrder, on_delete=models.CASCADE, related_name='reconciliation')
+    sent_to_driver = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    returned_by_driver = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    expense_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    received_by_owner = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid_by_owner = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    driver_float = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    expected_balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    overspend = models.BooleanField(default=False)
+    unreturned_float = models.BooleanField(default=False)
+    balance_drift = models.BooleanField(default=False)
+    has_issues = models.BooleanField(default=False, db_index=True)
+    # Set when an expense or transfer of the order is deleted, so the next run re-checks it
+    stale = models.BooleanField(default=False, db_index=True)
+    
+    run = models.ForeignKey(ReconciliationRun, on_delete=models.SET_NULL, null=True, blank=True, related_name='results')
+    checked_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-checked_at']
+    
+    def __str__(self):
+        return f"{self.order.order_number}: {'issues' if self.has_issues else 'ok'}"
+
+
+class PurgeJob(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
+    # The soft-deleted row whose dependents are purged, e.g. "transport_app.truck" 12
+    model_label = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    object_repr = models.CharField(max_length=200)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    # Rows deleted so far, per model label
+    deleted_counts = models.JSONField(default=dict, blank=True)
+    rows_deleted = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Purge {self.object_repr} ({self.status})"
+    
+    def get_status_display(self):
+        return dict(self.STATUS_CHOICES).get(self.status, self.status)
+
+
+class ChangeLogEntry(models.Model):
+    ACTION_CHOICES = (
+        ('upsert', 'Created or updated'),
+        ('delete', 'Deleted'),
+    )
+    
+    # One save or delete of a synced row (transport_app/changes.py); the id is the
+    # sequence number the apps sync from.
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # The row's ROLE_SCOPES columns when the entry was written
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_index=False, related_name='+')
+    driver = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_index=False, related_name='+')
+    creator = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_index=False, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    objects = ScopedManager()
+    
+    ROLE_SCOPES = {'owner': ('owner',), 'driver': ('driver', 'creator')}
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['owner', 'id']),
+            models.Index(fields=['driver', 'id']),
+            models.Index(fields=['creator', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"#{self.pk} {self.action} {self.model} {self.object_id}"
+    
+    def get_action_display(self):
+        return dict(self.ACTION_CHOICES).get(self.action, self.action)
+
+
+class WebhookSubscription(models.Model):
+    EVENT_CHOICES = (
+        ('order.status_changed', 'Order status changed'),
+        ('transfer.completed', 'Transfer completed'),
+        ('expense.added', 'Expense added'),
+    )
+    
+    # Owners get the events of their orders, admins those of every owner (transport_app/webhooks.py)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='webhook_subscriptions')
+    url = models.URLField(max_length=500)
+    # Events signed with HMAC-SHA256 of this secret
+    secret = models.CharField(max_length=64, editable=False)
+    # Empty for all event types
+    event_types = models.JSONField(default=list, blank=True)
+    is_active = models.BooleanField(default=True)
+    
+    # Retry state: after a failed POST the queue waits until next_attempt_at; locked_until
+    # is the lease of the worker delivering it, so each endpoint gets one POST at a time.
+    failures = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = ScopedManager()
+    
+    ROLE_SCOPES = {'owner': ('user',)}
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.url} ({self.user})"
+
+
+class WebhookDelivery(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('delivered', 'Delivered'),
+        ('failed', 'Failed'),
+    )
+    
+    # One event queued for one subscription; pending rows are the durable queue
+    subscription = models.ForeignKey(WebhookSubscription, on_delete=models.CASCADE, related_name='deliveries')
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-id']
+        verbose_name_plural = 'Webhook deliveries'
+        indexes = [
+            models.Index(fields=['subscription', 'status', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} -> {self.subscription.url} ({self.status})"
+    
+    def get_status_display(self):
+        return dict(self.STATUS_CHOICES).get(self.status, self.status)
+
+
+class DocumentRun(models.Model):
+    STATUS_CHOICES = (
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
+    # A month-end render of every owner's statement (render_documents --month)
+    period = models.DateField()
+    invoices = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    # Progress: documents in the run, and so far rendered, reused from the cache or failed
+    total = models.IntegerField(default=0)
+    rendered = models.IntegerField(default=0)
+    reused = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Documents for {self.period:%B %Y} ({self.status})"
+    
+    def get_status_display(self):
+        return dict(self.STATUS_CHOICES).get(self.status, self.status)
+
+
+class Document(models.Model):
+    KIND_CHOICES = (
+        ('invoice', 'Invoice'),
+        ('statement', 'Trip statement'),
+    )
+    
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('rendering', 'Rendering'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    )
+    
+    # An order's invoice, or an owner's statement of the orders picked up in a month;
+    # rendered to PDF by the render_documents worker (transport_app/documents.py)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='documents')
+    order = models.ForeignKey(TransportationOrder, on_delete=models.CASCADE, null=True, blank=True, related_name='documents')
+    # Holds the invoice's order instead of ``order`` while the order is archived (transport_app/archive.py)
+    archived_order = models.ForeignKey('ArchivedOrder', on_delete=models.CASCADE, null=True, blank=True,
+                                       editable=False, related_name='documents')
+    period = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # When a worker took it for rendering; one that has not finished in DOCUMENT_CLAIM_TIMEOUT is taken again
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    file = models.FileField(upload_to='documents/generated/', null=True, blank=True)
+    # Digest of the source rows' updated_at when the file was rendered; the file is
+    # reused until the sources change
+    source_version = models.CharField(max_length=64, blank=True)
+    error = models.TextField(blank=True)
+    run = models.ForeignKey(DocumentRun, on_delete=models.SET_NULL, null=True, blank=True, related_name='documents')
+    requested_at = models.DateTimeField(auto_now_add=True)
+    rendered_at = models.DateTimeField(null=True, blank=True)
+    
+    objects = ScopedManager()
+    
+    ROLE_SCOPES = {'owner': ('owner',)}
+    
+    class Meta:
+        ordering = ['-requested_at']
+        indexes = [
+            models.Index(fields=['status', 'requested_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['order'], condition=models.Q(kind='invoice'), name='unique_order_invoice'),
+            models.UniqueConstraint(fields=['archived_order'], condition=models.Q(kind='invoice'),
+                                    name='unique_archived_order_invoice'),
+            models.UniqueConstraint(fields=['owner', 'period'], condition=models.Q(kind='statement'),
+                                    name='unique_owner_statement'),
+        ]
+    
+    def __str__(self):
+        if self.kind == 'invoice':
+            return f"Invoice {self.invoiced_order.order_number}"
+        return f"Statement {self.owner} {self.period:%B %Y}"
+    
+    @property
+    def invoiced_order(self):
+        """The order of an invoice, live or archived."""
+        return self.order if self.order_id else self.archived_order
+    
+    def get_kind_display(self):
+        return dict(self.KIND_CHOICES).get(self.kind, self.kind)
+    
+    def get_status_display(self):
+        return dict(self.STATUS_CHOICES).get(self.status, self.status)
+
+
+class TrackSegment(models.Model):
+    # Up to TRACK_SEGMENT_POINTS GPS pings of an order's trip (transport_app/tracking.py):
+    # milliseconds since started_at and coordinates in millionths of a degree, stored as
+    # delta-encoded int32 columns, zlib-compressed. Pings are appended to the last segment.
+    order = models.ForeignKey(TransportationOrder, on_delete=models.CASCADE, related_name='track_segments')
+    truck = models.ForeignKey(Truck, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    driver = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    count = models.IntegerField()
+    data = models.BinaryField()
+    
+    class Meta:
+        ordering = ['started_at', 'id']
+        indexes = [
+            models.Index(fields=['order', 'started_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.order_id} @ {self.started_at}: {self.count} points"
+
+
+class TruckPosition(models.Model):
+    # The latest ping of each truck, kept by the ping endpoint
+    truck = models.OneToOneField(Truck, on_delete=models.CASCADE, related_name='position')
+    order = models.ForeignKey(TransportationOrder, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    driver = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    recorded_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-recorded_at']
+    
+    def __str__(self):
+        return f"{self.truck} @ {self.latitude:.5f},{self.longitude:.5f}"
+
+
+# Archive tables (transport_app/archive.py). Delivered and cancelled orders past
+# ARCHIVE_AFTER_DAYS are moved here with their expenses, transfers and timeline.
+# The columns and ids are those of the live tables, so rows can be copied with
+# INSERT ... SELECT and serialized by the live serializers; only foreign keys
+# get indexes. Archived rows are read-only.
+def _archive_model(model, name, archived):
+    attrs = {
+        '__module__': __name__,
+        'Meta': type('Meta', (), {'ordering': model._meta.ordering}),
+    }
+    for attr, value in vars(model).items():
+        if attr.isupper() or attr == '__str__' or (attr.startswith('get_') and attr.endswith('_display')):
+            attrs[attr] = value
+    
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            attrs[field.name] = models.BigIntegerField(primary_key=True)
+            continue
+        if field.is_relation:
+            # ForeignKey.deconstruct() needs the app registry, which is still loading here
+            _, _, args, kwargs = models.Field.deconstruct(field)
+            target = archived.get(field.remote_field.model)
+            kwargs.update(
+                to=target or field.remote_field.model,
+                on_delete=field.remote_field.on_delete,
+                related_name=field.remote_field.related_name if target else '+',
+                limit_choices_to=field.remote_field.limit_choices_to,
+            )
+        else:
+            _, _, args, kwargs = field.deconstruct()
+        # Copied rows keep their timestamps
+        for option in ('auto_now', 'auto_now_add', 'db_index'):
+            kwargs.pop(option, None)
+        attrs[field.name] = field.__class__(*args, **kwargs)
+    
+    # The live model's managers: soft-delete filtering and for_user()
+    attrs['objects'] = model._meta.default_manager.__class__()
+    if hasattr(model, 'all_objects'):
+        attrs['all_objects'] = models.Manager()
+    
+    return type(name, (models.Model,), attrs)
+
+
+ArchivedOrder = _archive_model(TransportationOrder, 'ArchivedOrder', {})
+ArchivedExpense = _archive_model(Expense, 'ArchivedExpense', {TransportationOrder: ArchivedOrder})
+ArchivedTransfer = _archive_model(MoneyTransfer, 'ArchivedTransfer', {TransportationOrder: ArchivedOrder})
+ArchivedTimelineEvent = _archive_model(TimelineEvent, 'ArchivedTimelineEvent', {
+    TransportationOrder: ArchivedOrder, Expense: ArchivedExpense, MoneyTransfer: ArchivedTransfer,
+})
+ArchivedTrackSegment = _archive_model(TrackSegment, 'ArchivedTrackSegment', {TransportationOrder: ArchivedOrder})
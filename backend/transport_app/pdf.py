@@ -0,0 +1,90 @@
+# transport_app/pdf.py
+import textwrap
+import zlib
+
+from django.template.loader import render_to_string
+
+# A4 in points, set in Courier so the plain-text templates keep their columns
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 42
+FONT_SIZE = 9
+HEADING_SIZE = 13
+LEADING = 12
+COLUMNS = int((PAGE_WIDTH - 2 * MARGIN) / (FONT_SIZE * 0.6))
+LINES_PER_PAGE = int((PAGE_HEIGHT - 2 * MARGIN) / LEADING) - 2  # the last two hold the footer
+
+
+def _text(value):
+    # The standard fonts use WinAnsiEncoding; characters outside it print as '?'
+    data = value.encode('cp1252', 'replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _lines(text):
+    """(is_heading, line) per printed line; lines starting with '# ' are headings, long lines wrap."""
+    for line in text.splitlines():
+        if line.startswith('# '):
+            yield True, line[2:]
+            continue
+        line = line.rstrip()
+        indent = ' ' * (len(line) - len(line.lstrip()))
+        wrapped = textwrap.wrap(line, COLUMNS, subsequent_indent=indent + '  ', replace_whitespace=False,
+                                drop_whitespace=False) if len(line) > COLUMNS else [line]
+        for part in wrapped:
+            yield False, part
+
+
+def _page_stream(lines, number, count, footer):
+    parts = []
+    y = PAGE_HEIGHT - MARGIN
+    for is_heading, line in lines:
+        font, size = (b'F2', HEADING_SIZE) if is_heading else (b'F1', FONT_SIZE)
+        parts.append(b'BT /%s %d Tf %d %d Td %s Tj ET' % (font, size, MARGIN, y, _text(line)))
+        y -= LEADING
+    footer = f'{footer}  Page {number} of {count}'.strip()
+    parts.append(b'BT /F1 %d Tf %d %d Td %s Tj ET' % (FONT_SIZE - 1, MARGIN, MARGIN - LEADING, _text(footer)))
+    return zlib.compress(b'\n'.join(parts))
+
+
+def render(text, title='', footer=''):
+    """
+    ``text`` as a PDF (bytes): Courier pages with headings in Courier-Bold and
+    ``footer`` and the page number at the bottom of each page. Only the
+    standard PDF fonts are used, so nothing is embedded, and the output is
+    the same for the same input.
+    """
+    lines = list(_lines(text))
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+
+    # Objects 1-5: catalog, page tree, fonts and info; then a page and its content per page
+    page_ids = [6 + 2 * i for i in range(len(pages))]
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(b'%d 0 R' % i for i in page_ids), len(pages)),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold /Encoding /WinAnsiEncoding >>',
+        b'<< /Title %s /Producer (SMS Transports) >>' % _text(title),
+    ]
+    for number, (page_id, page) in enumerate(zip(page_ids, pages), 1):
+        stream = _page_stream(page, number, len(pages), footer)
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>' % (PAGE_WIDTH, PAGE_HEIGHT, page_id + 1)
+        )
+        objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def render_template(template_name, context, title='', footer=''):
+    """Render a plain-text template to a PDF; runs in the render_documents process pool."""
+    return render(render_to_string(template_name, context), title=title, footer=footer)
@@ -0,0 +1,149 @@
+# transport_app/purge.py
+from django.apps import apps
+from django.db import models, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import analytics, changes, lanes, ledger, scheduling
+from .models import Truck, TransportationOrder, Expense, ArchivedOrder, ArchivedExpense, PurgeJob
+from users.models import User
+
+# Orders carry lane rollups (transport_app/lanes.py), taken off when the order is hidden
+LANE_EXPENSES = {TransportationOrder: Expense, ArchivedOrder: ArchivedExpense}
+
+
+def _reverse_relations(model):
+    for field in model._meta.get_fields(include_hidden=True):
+        if (field.one_to_many or field.one_to_one) and field.auto_created and not field.concrete:
+            yield field
+
+
+def _soft_deletable(model):
+    return any(f.name == 'deleted_at' for f in model._meta.concrete_fields)
+
+
+def _hide(rows, now):
+    """Mark ``rows`` and the soft-deletable rows their deletion cascades to as deleted."""
+    model = rows.model
+    # Children first: their filters select through the parent rows that are still visible
+    for relation in _reverse_relations(model):
+        if relation.on_delete is models.CASCADE and _soft_deletable(relation.related_model):
+            _hide(relation.related_model.objects.filter(**{f'{relation.field.name}__in': rows.values('pk')}), now)
+
+    if model in LANE_EXPENSES:
+        lanes.remove_orders(rows, LANE_EXPENSES[model])
+        ledger.invalidate_orders(rows)
+    if model is TransportationOrder:
+        scheduling.on_orders_deleted(list(rows.values_list('pk', flat=True)))
+    elif model is Truck:
+        for truck_id in rows.values_list('pk', flat=True):
+            scheduling.on_truck_deleted(truck_id)
+
+    # Logged as deleted now, while the filters still match; the purge writes no entries for them
+    changes.record_rows(rows, 'delete')
+    if model is TransportationOrder:
+        changes.record_order_rows(rows.values('pk'), 'delete')
+
+    values = {'deleted_at': now}
+    if model is User:
+        values['is_active'] = False
+    rows.update(**values)
+
+
+def soft_delete(obj, user=None):
+    """
+    Hide ``obj`` and everything deleting it would cascade to, and queue a PurgeJob
+    that deletes them for real. One UPDATE per model, however many rows depend on it.
+    """
+    model = type(obj)
+    with transaction.atomic():
+        _hide(model.objects.filter(pk=obj.pk), timezone.now())
+        job = PurgeJob.objects.create(
+            model_label=model._meta.label_lower, object_id=obj.pk, object_repr=str(obj)[:200], requested_by=user,
+        )
+    analytics.bump_version()
+    return job
+
+
+class SoftDeleteMixin:
+    """
+    For viewsets: DELETE hides the object and what cascades from it at once (soft_delete)
+    and answers 202; the rows are deleted in batches by the purge_deleted command.
+    """
+    
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        job = soft_delete(instance, request.user)
+        return Response(
+            {'detail': f'{instance} was deleted; dependent records are being removed.', 'purge_job': job.pk},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+def _record(job, label, count, stdout):
+    if not count:
+        return
+    job.deleted_counts[label] = job.deleted_counts.get(label, 0) + count
+    job.rows_deleted += count
+    job.save(update_fields=['deleted_counts', 'rows_deleted'])
+    if stdout is not None:
+        stdout.write(f"  {job.object_repr}: {label} -{count} ({job.rows_deleted} rows deleted)")
+
+
+def _purge(rows, job, batch_size, stdout, hidden=True):
+    """
+    Delete ``rows`` leaf first, ``batch_size`` rows per transaction. ``hidden`` rows
+    were logged as deleted (transport_app/changes.py) when they were soft-deleted.
+    """
+    model = rows.model
+    for relation in _reverse_relations(model):
+        related = relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': rows.values('pk')})
+        if relation.on_delete is models.CASCADE:
+            child_hidden = hidden and (_soft_deletable(relation.related_model) or model is TransportationOrder)
+            _purge(related, job, batch_size, stdout, child_hidden)
+        elif relation.on_delete is models.SET_NULL:
+            while pks := list(related.values_list('pk', flat=True)[:batch_size]):
+                updated = relation.related_model._base_manager.filter(pk__in=pks)
+                updated.update(**{relation.field.name: None})
+                changes.record_rows(updated, 'upsert')
+        # PROTECT and RESTRICT are left to delete(), which refuses and fails the job
+
+    while True:
+        with transaction.atomic():
+            pks = list(rows.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            # Through the ORM, so the delete signals keep files, lanes, ledgers and reconciliation current
+            with changes.muted(hidden):
+                _, counts = model._base_manager.filter(pk__in=pks).delete()
+        for label, count in counts.items():
+            _record(job, label, count, stdout)
+
+
+def run_job(job, batch_size=500, stdout=None):
+    """Purge what ``job`` hid; safe to re-run after a failure, it picks up where it stopped."""
+    job.status, job.started_at, job.error = 'running', timezone.now(), ''
+    job.save(update_fields=['status', 'started_at', 'error'])
+    model = apps.get_model(job.model_label)
+    try:
+        _purge(model._base_manager.filter(pk=job.object_id, deleted_at__isnull=False), job, batch_size, stdout)
+    except Exception as e:
+        job.status, job.error = 'failed', str(e)
+        raise
+    else:
+        job.status = 'completed'
+    finally:
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        analytics.bump_version()
+    return job
+
+
+def claim_next_job(retry_failed=False):
+    """The oldest pending job, marked running so a second worker skips it; None when there is none."""
+    statuses = ('pending', 'failed') if retry_failed else ('pending',)
+    for job in PurgeJob.objects.filter(status__in=statuses).order_by('created_at', 'pk'):
+        if PurgeJob.objects.filter(pk=job.pk, status=job.status).update(status='running'):
+            return job
+    return None
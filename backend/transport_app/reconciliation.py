@@ -0,0 +1,167 @@
+# transport_app/reconciliation.py
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    TransportationOrder, Expense, MoneyTransfer, ReconciliationRun, ReconciliationResult
+)
+
+TRANSFER_COLUMNS = {
+    'to_driver': 'sent_to_driver',
+    'from_driver': 'returned_by_driver',
+    'to_owner': 'received_by_owner',
+    'from_owner': 'paid_by_owner',
+}
+# Orders past these states should have settled the driver's float.
+CLOSED_STATUSES = ('delivered', 'cancelled')
+RESULT_FIELDS = (
+    'sent_to_driver', 'returned_by_driver', 'expense_total', 'received_by_owner', 'paid_by_owner',
+    'driver_float', 'expected_balance', 'overspend', 'unreturned_float', 'balance_drift',
+    'has_issues', 'stale', 'run', 'checked_at',
+)
+# A run still marked running after this long is taken to have died with its process
+ABANDONED_AFTER = timedelta(hours=1)
+
+
+def orders_to_check(since):
+    """Orders whose own row, expenses or transfers changed at or after ``since`` (all orders if None)."""
+    orders = TransportationOrder.objects.all()
+    if since is None:
+        return orders
+    changed_expenses = Expense.objects.filter(order=OuterRef('pk'), updated_at__gte=since)
+    changed_transfers = MoneyTransfer.objects.filter(order=OuterRef('pk'), updated_at__gte=since)
+    return orders.filter(
+        Q(updated_at__gte=since) | Exists(changed_expenses) | Exists(changed_transfers)
+        | Q(reconciliation__isnull=True) | Q(reconciliation__stale=True)
+    )
+
+
+def reconcile_chunk(order_ids, run, checked_at):
+    """Check a chunk of orders with three grouped queries and upsert their results."""
+    tolerance = settings.RECONCILIATION_TOLERANCE
+    orders = TransportationOrder.objects.filter(pk__in=order_ids).values(
+        'id', 'status', 'total_amount', 'advance_amount', 'balance_amount'
+    )
+    expenses = dict(
+        Expense.objects.filter(order_id__in=order_ids).values('order_id').order_by()
+        .annotate(total=Sum('amount')).values_list('order_id', 'total')
+    )
+    transfers = {
+        row.pop('order_id'): row
+        for row in MoneyTransfer.objects.filter(order_id__in=order_ids, status='completed')
+        .values('order_id').order_by().annotate(**{
+            column: Sum('amount', filter=Q(transfer_type=transfer_type))
+            for transfer_type, column in TRANSFER_COLUMNS.items()
+        })
+    }
+
+    results = []
+    for order in orders:
+        amounts = {column: value or Decimal(0) for column, value in transfers.get(order['id'], {}).items()}
+        amounts = {column: amounts.get(column, Decimal(0)) for column in TRANSFER_COLUMNS.values()}
+        expense_total = expenses.get(order['id']) or Decimal(0)
+        driver_float = amounts['sent_to_driver'] - amounts['returned_by_driver'] - expense_total
+        expected_balance = order['total_amount'] - order['advance_amount']
+
+        overspend = driver_float < -tolerance
+        unreturned_float = order['status'] in CLOSED_STATUSES and driver_float > tolerance
+        balance_drift = abs(order['balance_amount'] - expected_balance) > tolerance
+        results.append(ReconciliationResult(
+            order_id=order['id'], **amounts, expense_total=expense_total,
+            driver_float=driver_float, expected_balance=expected_balance,
+            overspend=overspend, unreturned_float=unreturned_float, balance_drift=balance_drift,
+            has_issues=overspend or unreturned_float or balance_drift,
+            stale=False, run=run, checked_at=checked_at,
+        ))
+
+    ReconciliationResult.objects.bulk_create(
+        results, update_conflicts=True, unique_fields=['order'], update_fields=RESULT_FIELDS,
+    )
+    return sum(result.has_issues for result in results)
+
+
+def _fail_abandoned_runs():
+    ReconciliationRun.objects.filter(status='running', started_at__lt=timezone.now() - ABANDONED_AFTER).update(
+        status='failed', error='Abandoned: still running after an hour.', finished_at=timezone.now(),
+    )
+
+
+def request_run(full=False, user=None):
+    """
+    Queue a run for reconcile_orders (see claim_next_run). IntegrityError if one is
+    already queued; the one_active_reconciliation constraint decides, not a read.
+    """
+    with transaction.atomic():
+        return ReconciliationRun.objects.create(status='pending', full=full, started_at=timezone.now(), started_by=user)
+
+
+def claim_next_run():
+    """The queued run, marked running; None when nothing is queued or another run is still going."""
+    _fail_abandoned_runs()
+    run = ReconciliationRun.objects.filter(status='pending').first()
+    if run is None:
+        return None
+    try:
+        with transaction.atomic():
+            claimed = ReconciliationRun.objects.filter(pk=run.pk, status='pending').update(
+                status='running', started_at=timezone.now(),
+            )
+    except IntegrityError:
+        return None
+    if not claimed:
+        return None
+    run.refresh_from_db()
+    return run
+
+
+def run_reconciliation(full=False, chunk_size=500, user=None, stdout=None, run=None):
+    """
+    Reconcile every order changed since the last completed run (or all orders):
+    ``run`` if given (from claim_next_run), else a new run. IntegrityError if
+    another run is in progress.
+
+    Orders are walked in primary-key chunks, each checked and saved in its own
+    transaction, so a long run holds no lock for longer than one chunk.
+    """
+    if run is None:
+        _fail_abandoned_runs()
+        with transaction.atomic():
+            run = ReconciliationRun.objects.create(full=full, started_at=timezone.now(), started_by=user)
+    last_run = ReconciliationRun.objects.filter(status='completed').first()
+    since = None if run.full or last_run is None else last_run.started_at
+    run.full = since is None
+
+    candidates = orders_to_check(since).order_by('pk').values_list('pk', flat=True)
+    last_pk = 0
+    try:
+        while True:
+            chunk = list(candidates.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            with transaction.atomic():
+                run.issues_found += reconcile_chunk(chunk, run, timezone.now())
+            run.orders_checked += len(chunk)
+            # Progress for runs/, as runs started through the API finish in the background
+            run.save(update_fields=['full', 'orders_checked', 'issues_found'])
+            last_pk = chunk[-1]
+            if stdout is not None:
+                stdout.write(f"Checked {run.orders_checked} orders, {run.issues_found} with issues")
+    except Exception as e:
+        run.status, run.error = 'failed', str(e)
+        raise
+    else:
+        run.status = 'completed'
+    finally:
+        run.finished_at = timezone.now()
+        run.save()
+    return run
+
+
+def mark_stale(order_ids):
+    """An expense or transfer left these orders; have the next run re-check them."""
+    ReconciliationResult.objects.filter(order_id__in=[pk for pk in order_ids if pk]).update(stale=True)
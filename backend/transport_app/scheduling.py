@@ -0,0 +1,224 @@
+# transport_app/scheduling.py
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Truck, TransportationOrder
+
+# Orders in these states hold their truck for pickup_date -> estimated_delivery_date.
+ACTIVE_STATUSES = ('pending', 'assigned', 'in_transit')
+UNAVAILABLE_TRUCK_STATUSES = ('maintenance', 'out_of_service')
+
+TruckInfo = namedtuple('TruckInfo', 'capacity status owner_id')
+
+
+class TruckIntervals:
+    """Booked windows of one truck, sorted by start, with a running maximum of the ends."""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.order_ids = []
+        self.max_ends = []
+
+    def add(self, start, end, order_id):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.order_ids.insert(i, order_id)
+        self._refresh_max(i)
+
+    def remove(self, start, order_id):
+        i = bisect_left(self.starts, start)
+        while i < len(self.starts) and self.order_ids[i] != order_id:
+            i += 1
+        if i < len(self.starts):
+            del self.starts[i], self.ends[i], self.order_ids[i], self.max_ends[i]
+            self._refresh_max(i)
+
+    def _refresh_max(self, i):
+        del self.max_ends[i:]
+        running = self.max_ends[i - 1] if i else float('-inf')
+        for end in self.ends[i:]:
+            running = max(running, end)
+            self.max_ends.append(running)
+
+    def conflicts(self, start, end, exclude_order=None):
+        """Order ids whose window overlaps [start, end)."""
+        found = []
+        # Only windows starting before `end` can overlap; walk back while some end can still reach `start`.
+        j = bisect_left(self.starts, end) - 1
+        while j >= 0 and self.max_ends[j] > start:
+            if self.ends[j] > start and self.order_ids[j] != exclude_order:
+                found.append(self.order_ids[j])
+            j -= 1
+        return found
+
+
+class AvailabilityIndex:
+    """
+    Per-process interval index of truck bookings.
+
+    Built from the database on first use, kept current from the order/truck
+    signals, and rebuilt after SCHEDULER_INDEX_TTL seconds so changes made by
+    other worker processes are picked up. Assignments are still checked against
+    the database (see check_assignment); the index only serves suggestions.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built_at = None
+        self.trucks = {}
+        self.by_capacity = []
+        self.intervals = {}
+        self.slots = {}
+
+    def ensure_fresh(self):
+        if self.built_at is None or time.monotonic() - self.built_at > settings.SCHEDULER_INDEX_TTL:
+            self.rebuild()
+
+    def rebuild(self):
+        trucks = Truck.objects.values_list('id', 'capacity', 'status', 'owner_id')
+        orders = TransportationOrder.objects.filter(
+            status__in=ACTIVE_STATUSES, truck__isnull=False
+        ).values_list('id', 'truck_id', 'pickup_date', 'estimated_delivery_date')
+        with self.lock:
+            self.trucks = {}
+            self.by_capacity = []
+            self.intervals = {}
+            self.slots = {}
+            for truck_id, capacity, truck_status, owner_id in trucks:
+                self._set_truck(truck_id, capacity, truck_status, owner_id)
+            for order_id, truck_id, start, end in orders:
+                self._book(order_id, truck_id, start.timestamp(), end.timestamp())
+            self.built_at = time.monotonic()
+
+    def _set_truck(self, truck_id, capacity, truck_status, owner_id):
+        old = self.trucks.get(truck_id)
+        if old is not None:
+            self.by_capacity.remove((old.capacity, truck_id))
+        info = TruckInfo(float(capacity), truck_status, owner_id)
+        self.trucks[truck_id] = info
+        insort(self.by_capacity, (info.capacity, truck_id))
+
+    def _book(self, order_id, truck_id, start, end):
+        self.intervals.setdefault(truck_id, TruckIntervals()).add(start, end, order_id)
+        self.slots[order_id] = (truck_id, start)
+
+    def _unbook(self, order_id):
+        slot = self.slots.pop(order_id, None)
+        if slot is not None:
+            self.intervals[slot[0]].remove(slot[1], order_id)
+
+    def order_saved(self, order_id, truck_id, start, end, order_status):
+        if self.built_at is None:
+            return
+        with self.lock:
+            self._unbook(order_id)
+            if truck_id is not None and order_status in ACTIVE_STATUSES:
+                self._book(order_id, truck_id, start.timestamp(), end.timestamp())
+
+    def order_deleted(self, order_id):
+        if self.built_at is None:
+            return
+        with self.lock:
+            self._unbook(order_id)
+
+    def truck_saved(self, truck_id, capacity, truck_status, owner_id):
+        if self.built_at is None:
+            return
+        with self.lock:
+            self._set_truck(truck_id, capacity, truck_status, owner_id)
+
+    def truck_deleted(self, truck_id):
+        if self.built_at is None:
+            return
+        with self.lock:
+            info = self.trucks.pop(truck_id, None)
+            if info is not None:
+                self.by_capacity.remove((info.capacity, truck_id))
+            for order_id in self.intervals.pop(truck_id, TruckIntervals()).order_ids:
+                self.slots.pop(order_id, None)
+
+    def available(self, start, end, weight, owner_id=None, exclude_order=None, limit=10):
+        """Trucks free for [start, end) that can carry ``weight``, smallest sufficient capacity first."""
+        self.ensure_fresh()
+        start, end = start.timestamp(), end.timestamp()
+        found = []
+        with self.lock:
+            for capacity, truck_id in self.by_capacity[bisect_left(self.by_capacity, (float(weight), -1)):]:
+                info = self.trucks[truck_id]
+                if info.status in UNAVAILABLE_TRUCK_STATUSES:
+                    continue
+                if owner_id is not None and info.owner_id != owner_id:
+                    continue
+                booked = self.intervals.get(truck_id)
+                if booked is not None and booked.conflicts(start, end, exclude_order):
+                    continue
+                found.append((truck_id, capacity))
+                if len(found) >= limit:
+                    break
+        return found
+
+
+index = AvailabilityIndex()
+
+
+def check_assignment(truck, weight, start, end, exclude_order=None):
+    """
+    Validate a truck assignment against the database; call inside a transaction.
+
+    The truck row is locked first so two concurrent assignments of the same truck
+    are checked one after the other.
+    """
+    if truck is None:
+        return
+    truck = Truck.objects.select_for_update().get(pk=truck.pk)
+    if truck.status in UNAVAILABLE_TRUCK_STATUSES:
+        raise serializers.ValidationError({'truck': f"Truck {truck.truck_number} is {truck.get_status_display()}."})
+    if weight is not None and weight > truck.capacity:
+        raise serializers.ValidationError(
+            {'truck': f"Load of {weight} tons exceeds truck {truck.truck_number} capacity of {truck.capacity} tons."}
+        )
+    if start is None or end is None:
+        return
+    conflicts = TransportationOrder.objects.filter(
+        truck=truck, status__in=ACTIVE_STATUSES, pickup_date__lt=end, estimated_delivery_date__gt=start
+    )
+    if exclude_order is not None:
+        conflicts = conflicts.exclude(pk=exclude_order)
+    numbers = list(conflicts.values_list('order_number', flat=True)[:5])
+    if numbers:
+        raise serializers.ValidationError(
+            {'truck': f"Truck {truck.truck_number} is already booked in this window by {', '.join(numbers)}."}
+        )
+
+
+def on_order_saved(order):
+    args = (order.pk, order.truck_id, order.pickup_date, order.estimated_delivery_date, order.status)
+    transaction.on_commit(lambda: index.order_saved(*args))
+
+
+def on_order_deleted(order_id):
+    transaction.on_commit(lambda: index.order_deleted(order_id))
+
+
+def on_orders_deleted(order_ids):
+    def unbook():
+        for order_id in order_ids:
+            index.order_deleted(order_id)
+    transaction.on_commit(unbook)
+
+
+def on_truck_saved(truck):
+    args = (truck.pk, truck.capacity, truck.status, truck.owner_id)
+    transaction.on_commit(lambda: index.truck_saved(*args))
+
+
+def on_truck_deleted(truck_id):
+    transaction.on_commit(lambda: index.truck_deleted(truck_id))
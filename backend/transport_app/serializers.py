@@ -1,8 +1,28 @@
+from django.db import models
 from rest_framework import serializers
-from .models import Truck, TransportationOrder, Expense, MoneyTransfer, TimelineEvent
-from users.serializers import UserSerializer
+from .models import (
+    Truck, TransportationOrder, Expense, MoneyTransfer, TimelineEvent, ReconciliationRun, ReconciliationResult,
+    PurgeJob, WebhookSubscription, WebhookDelivery, Document, DocumentRun, TruckPosition
+)
+from users.serializers import UserSerializer, unique_with_deleted
+
+class ProtectedFileField(serializers.FileField):
+    # Links carry a signed token so they can be opened outside the API client
+    def to_representation(self, value):
+        url = super().to_representation(value)
+        request = self.context.get('request')
+        if url and request is not None and request.user.is_authenticated:
+            from .media import sign_media_url
+            url = sign_media_url(url, value.name, request.user)
+        return url
+
+PROTECTED_FILE_FIELD_MAPPING = {
+    **serializers.ModelSerializer.serializer_field_mapping,
+    models.FileField: ProtectedFileField,
+}
 
 class TruckSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = PROTECTED_FILE_FIELD_MAPPING
     owner_detail = UserSerializer(source='owner', read_only=True)
     driver_detail = UserSerializer(source='assigned_driver', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -11,11 +31,13 @@ class TruckSerializer(serializers.ModelSerializer):
         model = Truck
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
+        extra_kwargs = unique_with_deleted(Truck, 'truck_number')
 
 class TruckCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Truck
         fields = '__all__'
+        extra_kwargs = unique_with_deleted(Truck, 'truck_number')
     
     def validate(self, data):
         from django.utils import timezone
@@ -33,6 +55,7 @@ class TruckCreateSerializer(serializers.ModelSerializer):
         return data
 
 class TransportationOrderSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = PROTECTED_FILE_FIELD_MAPPING
     truck_detail = TruckSerializer(source='truck', read_only=True)
     driver_detail = UserSerializer(source='driver', read_only=True)
     owner_detail = UserSerializer(source='owner', read_only=True)
@@ -65,6 +88,7 @@ class TransportationOrderCreateSerializer(serializers.ModelSerializer):
         return data
 
 class ExpenseSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = PROTECTED_FILE_FIELD_MAPPING
     added_by_detail = UserSerializer(source='added_by', read_only=True)
     category_display = serializers.CharField(source='get_category_display', read_only=True)
     order_number = serializers.CharField(source='order.order_number', read_only=True)
@@ -84,6 +108,7 @@ class ExpenseCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 class MoneyTransferSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = PROTECTED_FILE_FIELD_MAPPING
     created_by_detail = UserSerializer(source='created_by', read_only=True)
     transfer_type_display = serializers.CharField(source='get_transfer_type_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -125,6 +150,85 @@ class TimelineEventSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('created_by', 'created_at')
 
+class ReconciliationRunSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = ReconciliationRun
+        fields = '__all__'
+
+class TruckPositionSerializer(serializers.ModelSerializer):
+    truck_number = serializers.CharField(source='truck.truck_number', read_only=True)
+    
+    class Meta:
+        model = TruckPosition
+        fields = ('truck', 'truck_number', 'order', 'driver', 'latitude', 'longitude', 'recorded_at')
+
+class PurgeJobSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = PurgeJob
+        fields = '__all__'
+
+class DocumentSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = PROTECTED_FILE_FIELD_MAPPING
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    order_number = serializers.CharField(source='invoiced_order.order_number', read_only=True, default=None)
+    
+    class Meta:
+        model = Document
+        fields = ('id', 'kind', 'kind_display', 'owner', 'order', 'archived_order', 'order_number', 'period', 'status',
+                  'status_display', 'file', 'error', 'run', 'requested_at', 'rendered_at')
+        read_only_fields = fields
+
+class DocumentRunSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = DocumentRun
+        fields = '__all__'
+
+class WebhookSubscriptionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WebhookSubscription
+        fields = ('id', 'user', 'url', 'event_types', 'is_active', 'secret', 'failures', 'next_attempt_at',
+                  'last_error', 'created_at', 'updated_at')
+        read_only_fields = ('user', 'failures', 'next_attempt_at', 'last_error', 'created_at', 'updated_at')
+    
+    def validate_url(self, value):
+        # The address is checked when sending (transport_app/webhooks.py), as DNS can change
+        if value.split(':', 1)[0].lower() not in ('http', 'https'):
+            raise serializers.ValidationError("Must be an http or https URL.")
+        return value
+    
+    def validate_event_types(self, value):
+        known = dict(WebhookSubscription.EVENT_CHOICES)
+        if not isinstance(value, list) or any(event_type not in known for event_type in value):
+            raise serializers.ValidationError(f"Must be a list of: {', '.join(known)}.")
+        return sorted(set(value))
+
+class WebhookDeliverySerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = WebhookDelivery
+        fields = '__all__'
+
+class ReconciliationResultSerializer(serializers.ModelSerializer):
+    order_number = serializers.CharField(source='order.order_number', read_only=True)
+    order_status = serializers.CharField(source='order.status', read_only=True)
+    owner = serializers.IntegerField(source='order.owner_id', read_only=True)
+    driver = serializers.IntegerField(source='order.driver_id', read_only=True)
+    total_amount = serializers.DecimalField(source='order.total_amount', max_digits=12, decimal_places=2, read_only=True)
+    advance_amount = serializers.DecimalField(source='order.advance_amount', max_digits=12, decimal_places=2, read_only=True)
+    balance_amount = serializers.DecimalField(source='order.balance_amount', max_digits=12, decimal_places=2, read_only=True)
+    
+    class Meta:
+        model = ReconciliationResult
+        fields = '__all__'
+
 class DashboardStatsSerializer(serializers.Serializer):
     total_orders = serializers.IntegerField()
     active_orders = serializers.IntegerField()
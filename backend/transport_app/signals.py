@@ -0,0 +1,342 @@
+# transport_app/signals.py
+from decimal import Decimal
+
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+
+from . import analytics, changes, lanes, ledger, locations, reconciliation, scheduling, storage, webhooks
+from .workflow import order_status_changed
+from .models import (
+    Truck, TransportationOrder, Expense, MoneyTransfer, TimelineEvent, PlaceAlias,
+    ArchivedOrder, ArchivedExpense, ArchivedTransfer, Document,
+)
+
+# Archiving moves rows with plain SQL and keeps their references; archived rows
+# only release them when deleted (e.g. with their owner).
+FILE_FIELDS = {
+    model: [f.attname for f in model._meta.concrete_fields if f.get_internal_type() == 'FileField']
+    for model in (Truck, TransportationOrder, Expense, MoneyTransfer, ArchivedOrder, ArchivedExpense, ArchivedTransfer,
+                  Document)
+}
+
+
+def _file_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+def snapshot_file_names(sender, instance, **kwargs):
+    # Deferred fields are left out; their reference is unknown and skipped on save.
+    instance._stored_file_names = {
+        attname: _file_name(instance.__dict__[attname])
+        for attname in FILE_FIELDS[sender] if attname in instance.__dict__
+    }
+
+
+def track_file_references(sender, instance, created, update_fields=None, **kwargs):
+    previous = getattr(instance, '_stored_file_names', {})
+    for attname in FILE_FIELDS[sender]:
+        if update_fields is not None and attname not in update_fields:
+            continue
+        if not created and attname not in previous:
+            continue
+        old_name = '' if created else previous[attname]
+        new_name = _file_name(getattr(instance, attname))
+        if old_name != new_name:
+            storage.retain(new_name)
+            storage.release(old_name)
+    snapshot_file_names(sender, instance)
+
+
+def release_file_references(sender, instance, **kwargs):
+    for attname in FILE_FIELDS[sender]:
+        storage.release(_file_name(instance.__dict__.get(attname)))
+
+
+for _model in FILE_FIELDS:
+    post_init.connect(snapshot_file_names, sender=_model, dispatch_uid=f'cas_snapshot_{_model.__name__}')
+    post_save.connect(track_file_references, sender=_model, dispatch_uid=f'cas_track_{_model.__name__}')
+    post_delete.connect(release_file_references, sender=_model, dispatch_uid=f'cas_release_{_model.__name__}')
+
+
+def invalidate_analytics(sender, **kwargs):
+    analytics.bump_version()
+
+
+for _model in (Truck, TransportationOrder, Expense):
+    post_save.connect(invalidate_analytics, sender=_model, dispatch_uid=f'analytics_save_{_model.__name__}')
+    post_delete.connect(invalidate_analytics, sender=_model, dispatch_uid=f'analytics_delete_{_model.__name__}')
+
+
+# Lane rollups (transport_app/lanes.py) are kept current from the state each
+# instance was loaded with, so no extra query is needed to diff an update.
+NOT_LOADED = object()
+
+
+def snapshot_order_lane(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._lane_snapshot = None
+    elif all(f in instance.__dict__ for f in lanes.ORDER_FIELDS):
+        instance._lane_snapshot = lanes.order_contribution(instance.__dict__)
+    else:
+        instance._lane_snapshot = NOT_LOADED
+
+
+def load_order_lane(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk and getattr(instance, '_lane_snapshot', NOT_LOADED) is NOT_LOADED:
+        row = TransportationOrder.objects.filter(pk=instance.pk).values(*lanes.ORDER_FIELDS).first()
+        instance._lane_snapshot = lanes.order_contribution(row) if row else None
+
+
+def update_order_lane(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else instance._lane_snapshot
+    new = lanes.order_contribution({f: getattr(instance, f) for f in lanes.ORDER_FIELDS})
+    lanes.order_changed(old, new, None if created else instance.pk)
+    instance._lane_snapshot = new
+
+
+def remove_order_lane(sender, instance, **kwargs):
+    if instance.deleted_at is not None:
+        return  # taken off its lane, expenses included, when it was soft-deleted
+    # Expenses were already subtracted one by one by the cascade.
+    old = getattr(instance, '_lane_snapshot', NOT_LOADED)
+    if old is NOT_LOADED:
+        old = lanes.order_contribution({f: getattr(instance, f) for f in lanes.ORDER_FIELDS})
+    lanes.order_changed(old, None, None)
+
+
+def snapshot_expense(sender, instance, **kwargs):
+    instance._lane_snapshot = (
+        None if instance.pk is None
+        else (instance.__dict__.get('order_id'), instance.__dict__.get('amount'))
+    )
+
+
+def update_expense_lane(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_order_id, old_amount = (None, 0) if created else instance._lane_snapshot
+    amount = Decimal(str(instance.amount))
+    lanes.expense_changed(old_order_id, Decimal(str(old_amount or 0)), instance.order_id, amount)
+    instance._lane_snapshot = (instance.order_id, amount)
+
+
+def remove_expense_lane(sender, instance, **kwargs):
+    lanes.expense_changed(instance.order_id, Decimal(str(instance.amount)), None, 0)
+
+
+def clear_location_cache(sender, **kwargs):
+    locations.clear_cache()
+
+
+post_init.connect(snapshot_order_lane, sender=TransportationOrder, dispatch_uid='lane_snapshot_order')
+pre_save.connect(load_order_lane, sender=TransportationOrder, dispatch_uid='lane_load_order')
+post_save.connect(update_order_lane, sender=TransportationOrder, dispatch_uid='lane_update_order')
+post_delete.connect(remove_order_lane, sender=TransportationOrder, dispatch_uid='lane_remove_order')
+post_init.connect(snapshot_expense, sender=Expense, dispatch_uid='lane_snapshot_expense')
+post_save.connect(update_expense_lane, sender=Expense, dispatch_uid='lane_update_expense')
+post_delete.connect(remove_expense_lane, sender=Expense, dispatch_uid='lane_remove_expense')
+post_save.connect(clear_location_cache, sender=PlaceAlias, dispatch_uid='location_cache_save')
+post_delete.connect(clear_location_cache, sender=PlaceAlias, dispatch_uid='location_cache_delete')
+
+
+
+def update_schedule_order(sender, instance, raw=False, **kwargs):
+    if not raw:
+        scheduling.on_order_saved(instance)
+
+
+def remove_schedule_order(sender, instance, **kwargs):
+    scheduling.on_order_deleted(instance.pk)
+
+
+def update_schedule_truck(sender, instance, raw=False, **kwargs):
+    if not raw:
+        scheduling.on_truck_saved(instance)
+
+
+def remove_schedule_truck(sender, instance, **kwargs):
+    scheduling.on_truck_deleted(instance.pk)
+
+
+post_save.connect(update_schedule_order, sender=TransportationOrder, dispatch_uid='schedule_update_order')
+post_delete.connect(remove_schedule_order, sender=TransportationOrder, dispatch_uid='schedule_remove_order')
+post_save.connect(update_schedule_truck, sender=Truck, dispatch_uid='schedule_update_truck')
+post_delete.connect(remove_schedule_truck, sender=Truck, dispatch_uid='schedule_remove_truck')
+
+
+
+# Driver ledger checkpoints (transport_app/ledger.py) that include a changed entry are dropped.
+DRIVER_TRANSFER_TYPES = ('to_driver', 'from_driver')
+
+
+def invalidate_expense_ledger(sender, instance, **kwargs):
+    ledger.invalidate(instance.added_by_id, instance.date)
+
+
+def invalidate_transfer_ledger(sender, instance, **kwargs):
+    if instance.transfer_type in DRIVER_TRANSFER_TYPES or kwargs.get('created') is False:
+        driver_id = TransportationOrder.objects.filter(pk=instance.order_id).values_list('driver_id', flat=True).first()
+        ledger.invalidate(driver_id, instance.created_at)
+
+
+def snapshot_order_driver(sender, instance, **kwargs):
+    instance._ledger_driver_id = instance.__dict__.get('driver_id', NOT_LOADED)
+    instance._ledger_owner_id = instance.__dict__.get('owner_id', NOT_LOADED)
+
+
+def invalidate_order_ledger(sender, instance, created, raw=False, **kwargs):
+    old_driver_id = getattr(instance, '_ledger_driver_id', NOT_LOADED)
+    old_owner_id = getattr(instance, '_ledger_owner_id', NOT_LOADED)
+    if not raw and not created and old_driver_id is not NOT_LOADED and old_driver_id != instance.driver_id:
+        ledger.invalidate_order(instance.pk, [old_driver_id, instance.driver_id])
+    if not raw and not created and old_owner_id is not NOT_LOADED and old_owner_id != instance.owner_id:
+        # The order's entries move between owners' parts of the ledgers
+        ledger.invalidate_orders(TransportationOrder._base_manager.filter(pk=instance.pk))
+    instance._ledger_driver_id = instance.driver_id
+    instance._ledger_owner_id = instance.owner_id
+
+
+post_save.connect(invalidate_expense_ledger, sender=Expense, dispatch_uid='ledger_expense_save')
+post_delete.connect(invalidate_expense_ledger, sender=Expense, dispatch_uid='ledger_expense_delete')
+post_save.connect(invalidate_transfer_ledger, sender=MoneyTransfer, dispatch_uid='ledger_transfer_save')
+post_delete.connect(invalidate_transfer_ledger, sender=MoneyTransfer, dispatch_uid='ledger_transfer_delete')
+post_init.connect(snapshot_order_driver, sender=TransportationOrder, dispatch_uid='ledger_snapshot_order')
+post_save.connect(invalidate_order_ledger, sender=TransportationOrder, dispatch_uid='ledger_order_save')
+
+
+
+# Expenses, transfers and timeline events copy their order's owner and driver
+# (models.OrderScopedModel); reassigning the order updates the copies.
+ORDER_SCOPED_MODELS = (Expense, MoneyTransfer, TimelineEvent)
+
+
+def snapshot_order_scope(sender, instance, **kwargs):
+    instance._scope_snapshot = (instance.__dict__.get('owner_id', NOT_LOADED), instance.__dict__.get('driver_id', NOT_LOADED))
+
+
+def copy_order_scope(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_scope_snapshot', (NOT_LOADED, NOT_LOADED))
+    current = (instance.owner_id, instance.driver_id)
+    if not raw and not created and previous != current:
+        changed = {field for field, old, new in zip(('owner', 'driver'), previous, current) if old != new}
+        for model in ORDER_SCOPED_MODELS:
+            if changed.isdisjoint(model.ORDER_COPIED_FIELDS):
+                continue
+            rows = model._base_manager.filter(order_id=instance.pk)
+            # Gone for whoever loses access, then saved for whoever can see the rows now
+            changes.record_rows(rows, 'delete')
+            rows.update(**{f'{field}_id': getattr(instance, f'{field}_id') for field in model.ORDER_COPIED_FIELDS})
+            changes.record_rows(rows, 'upsert')
+    instance._scope_snapshot = current
+
+
+post_init.connect(snapshot_order_scope, sender=TransportationOrder, dispatch_uid='scope_snapshot_order')
+post_save.connect(copy_order_scope, sender=TransportationOrder, dispatch_uid='scope_copy_order')
+
+
+
+# Delta sync (transport_app/changes.py): every save and delete of a synced row is
+# logged. A row whose owner or driver changes is also logged as deleted for the
+# old ones, so it leaves their apps.
+def snapshot_change_scope(sender, instance, **kwargs):
+    instance._change_scope = {
+        column: instance.__dict__.get(f'{field}_id', NOT_LOADED) for field, column in changes.scope_columns(sender)
+    }
+
+
+def log_saved_row(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous, scope = getattr(instance, '_change_scope', None), changes.scope_of(instance)
+    if not created and previous and previous != scope and NOT_LOADED not in previous.values():
+        changes.record(instance, 'delete', previous)
+    changes.record(instance, 'upsert', scope)
+    instance._change_scope = scope
+
+
+def log_deleted_row(sender, instance, **kwargs):
+    changes.record(instance, 'delete')
+
+
+for _name, _model in changes.FEED_MODELS.items():
+    post_init.connect(snapshot_change_scope, sender=_model, dispatch_uid=f'changes_snapshot_{_name}')
+    post_save.connect(log_saved_row, sender=_model, dispatch_uid=f'changes_save_{_name}')
+    post_delete.connect(log_deleted_row, sender=_model, dispatch_uid=f'changes_delete_{_name}')
+
+
+
+# Order reconciliation (transport_app/reconciliation.py) finds changed orders by
+# updated_at; deletions and moves leave no timestamp, so they flag the old order.
+def snapshot_reconciled_order(sender, instance, **kwargs):
+    instance._reconciled_order_id = instance.__dict__.get('order_id')
+
+
+def flag_moved_entry(sender, instance, created, raw=False, **kwargs):
+    old_order_id = getattr(instance, '_reconciled_order_id', None)
+    if not raw and not created and old_order_id != instance.order_id:
+        reconciliation.mark_stale([old_order_id])
+    instance._reconciled_order_id = instance.order_id
+
+
+def flag_removed_entry(sender, instance, **kwargs):
+    reconciliation.mark_stale([instance.order_id])
+
+
+post_init.connect(snapshot_reconciled_order, sender=Expense, dispatch_uid='reconcile_snapshot_expense')
+post_save.connect(flag_moved_entry, sender=Expense, dispatch_uid='reconcile_save_expense')
+post_delete.connect(flag_removed_entry, sender=Expense, dispatch_uid='reconcile_delete_expense')
+post_init.connect(snapshot_reconciled_order, sender=MoneyTransfer, dispatch_uid='reconcile_snapshot_transfer')
+post_save.connect(flag_moved_entry, sender=MoneyTransfer, dispatch_uid='reconcile_save_transfer')
+post_delete.connect(flag_removed_entry, sender=MoneyTransfer, dispatch_uid='reconcile_delete_transfer')
+
+
+
+# Webhooks (transport_app/webhooks.py) are queued in the transaction of the change.
+def snapshot_webhook_status(sender, instance, **kwargs):
+    instance._webhook_status = None if instance.pk is None else instance.__dict__.get('status', NOT_LOADED)
+
+
+def queue_order_webhook(sender, instance, created, raw=False, **kwargs):
+    old_status = instance._webhook_status
+    if not raw and not created and old_status not in (NOT_LOADED, instance.status):
+        webhooks.order_status_changed(instance, old_status)
+    instance._webhook_status = instance.status
+
+
+def queue_transfer_webhook(sender, instance, created, raw=False, **kwargs):
+    old_status = None if created else instance._webhook_status
+    if not raw and instance.status == 'completed' and old_status not in (NOT_LOADED, 'completed'):
+        webhooks.transfer_completed(instance)
+    instance._webhook_status = instance.status
+
+
+def queue_expense_webhook(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        webhooks.expense_added(instance)
+
+
+post_init.connect(snapshot_webhook_status, sender=TransportationOrder, dispatch_uid='webhook_snapshot_order')
+post_save.connect(queue_order_webhook, sender=TransportationOrder, dispatch_uid='webhook_order_save')
+post_init.connect(snapshot_webhook_status, sender=MoneyTransfer, dispatch_uid='webhook_snapshot_transfer')
+post_save.connect(queue_transfer_webhook, sender=MoneyTransfer, dispatch_uid='webhook_transfer_save')
+post_save.connect(queue_expense_webhook, sender=Expense, dispatch_uid='webhook_expense_save')
+
+
+
+# Status transitions (transport_app/workflow.py) are written with a queryset
+# update, so post_save does not fire; bring the same derived state up to date.
+def sync_status_change(sender, instance, old_status, **kwargs):
+    analytics.bump_version()
+    old = getattr(instance, '_lane_snapshot', NOT_LOADED)
+    new = lanes.order_contribution({f: getattr(instance, f) for f in lanes.ORDER_FIELDS})
+    if old is not NOT_LOADED:
+        lanes.order_changed(old, new, instance.pk)
+    instance._lane_snapshot = new
+    scheduling.on_order_saved(instance)
+    changes.record(instance, 'upsert')
+    webhooks.order_status_changed(instance, old_status)
+    instance._webhook_status = instance.status
+
+
+order_status_changed.connect(sync_status_change, sender=TransportationOrder, dispatch_uid='workflow_sync_status')
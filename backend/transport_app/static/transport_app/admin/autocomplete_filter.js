@@ -0,0 +1,15 @@
+'use strict';
+{
+    const $ = django.jQuery;
+    // Reload the changelist filtered by the object picked in an AutocompleteFilter
+    $(function() {
+        $('.autocomplete-filter select').on('change', function() {
+            const queryString = this.closest('.autocomplete-filter').dataset.queryString;
+            const params = new URLSearchParams(queryString);
+            if (this.value) {
+                params.set(this.name, this.value);
+            }
+            window.location.search = params.toString();
+        });
+    });
+}
@@ -0,0 +1,200 @@
+# transport_app/storage.py
+import hashlib
+import os
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = 'blobs'
+TMP_DIR = f'{BLOB_PREFIX}/tmp'
+CHUNK_SIZE = 64 * 1024
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(f'{BLOB_PREFIX}/') and not name.startswith(f'{TMP_DIR}/')
+
+
+def blob_name(digest, ext=''):
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}'
+
+
+def digest_from_name(name):
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every upload once under the SHA-256 of its content.
+
+    The digest is computed while the upload is streamed to a temporary file,
+    so large files are never held in memory. Identical content resolves to
+    the same blob name; reference counts live in ``StoredBlob`` and are
+    maintained by the model signals in ``transport_app.signals``.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save().
+        return name
+
+    def _save(self, name, content):
+        from .models import StoredBlob
+
+        tmp_dir = self.path(TMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    hasher.update(chunk)
+                    fh.write(chunk)
+                    size += len(chunk)
+
+            digest = hasher.hexdigest()
+            # Reusing a blob restarts its grace period, so collect_garbage() leaves it
+            # to the row about to reference it; a blob collected just before is created again.
+            StoredBlob.objects.filter(digest=digest).update(updated_at=timezone.now())
+            blob, _ = StoredBlob.objects.get_or_create(
+                digest=digest,
+                defaults={'name': blob_name(digest, os.path.splitext(name)[1]), 'size': size},
+            )
+            final_path = self.path(blob.name)
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return blob.name
+
+    def delete(self, name):
+        # Blobs may be shared; they are only removed by collect_garbage(). The reference
+        # goes when the row stops pointing at the blob (transport_app/signals.py): a
+        # FieldFile.delete() saves the cleared field, so releasing here too would
+        # count it twice.
+        if is_blob_name(name):
+            return
+        super().delete(name)
+
+    def ingest(self, name):
+        """Move an existing non-blob file into the blob store and return the blob name."""
+        path = self.path(name)
+        with open(path, 'rb') as fh:
+            new_name = self.save(name, File(fh, name=os.path.basename(name)))
+        os.remove(path)
+        return new_name
+
+
+def retain(name):
+    from .models import StoredBlob
+
+    if not is_blob_name(name):
+        return
+    updated = StoredBlob.objects.filter(name=name).update(
+        ref_count=F('ref_count') + 1, updated_at=timezone.now()
+    )
+    if not updated:
+        StoredBlob.objects.get_or_create(
+            digest=digest_from_name(name), defaults={'name': name, 'ref_count': 1}
+        )
+
+
+def release(name):
+    from .models import StoredBlob
+
+    if not is_blob_name(name):
+        return
+    StoredBlob.objects.filter(name=name, ref_count__gt=0).update(
+        ref_count=F('ref_count') - 1, updated_at=timezone.now()
+    )
+
+
+def file_field_models():
+    """Yield (model, [field names]) for every FileField backed by content-addressed storage."""
+    for model in apps.get_models():
+        fields = [
+            f.attname for f in model._meta.concrete_fields
+            if isinstance(f, models.FileField) and isinstance(f.storage, ContentAddressedStorage)
+        ]
+        if fields:
+            yield model, fields
+
+
+def recount_references():
+    """Recompute every ref_count from the rows that actually point at each blob."""
+    from .models import StoredBlob
+
+    counts = Counter()
+    for model, fields in file_field_models():
+        for row in model._base_manager.values_list(*fields).iterator(chunk_size=2000):
+            counts.update(name for name in row if is_blob_name(name))
+
+    changed = 0
+    for blob in StoredBlob.objects.only('pk', 'name', 'ref_count').iterator(chunk_size=2000):
+        actual = counts.pop(blob.name, 0)
+        if blob.ref_count != actual:
+            StoredBlob.objects.filter(pk=blob.pk).update(ref_count=actual, updated_at=timezone.now())
+            changed += 1
+
+    # Referenced blobs without a row (e.g. restored from backup).
+    for name, count in counts.items():
+        path = default_storage.path(name)
+        StoredBlob.objects.update_or_create(
+            digest=digest_from_name(name),
+            defaults={
+                'name': name,
+                'ref_count': count,
+                'size': os.path.getsize(path) if os.path.exists(path) else 0,
+            },
+        )
+        changed += 1
+    return changed
+
+
+def collect_garbage(grace_seconds=None, dry_run=False):
+    """Delete blobs nobody references any more. Returns (count, bytes) reclaimed."""
+    from .models import StoredBlob
+
+    if grace_seconds is None:
+        grace_seconds = settings.CAS_GC_GRACE_SECONDS
+    cutoff = timezone.now() - timedelta(seconds=grace_seconds)
+
+    removed, reclaimed = 0, 0
+    orphans = StoredBlob.objects.filter(ref_count__lte=0, updated_at__lt=cutoff)
+    for blob in orphans.iterator(chunk_size=500):
+        if not dry_run:
+            # Re-check the count and age in the DELETE itself so a concurrent retain() or
+            # upload wins. The file goes before the commit: an upload of the same content
+            # waits on the row until then and finds the file gone.
+            with transaction.atomic():
+                deleted, _ = StoredBlob.objects.filter(pk=blob.pk, ref_count__lte=0, updated_at__lt=cutoff).delete()
+                if not deleted:
+                    continue
+                FileSystemStorage.delete(default_storage, blob.name)
+        removed += 1
+        reclaimed += blob.size
+
+    # Temporary files left behind by interrupted uploads.
+    tmp_dir = default_storage.path(TMP_DIR)
+    if os.path.isdir(tmp_dir):
+        for entry in os.scandir(tmp_dir):
+            if entry.is_file() and entry.stat().st_mtime < cutoff.timestamp() and not dry_run:
+                os.remove(entry.path)
+    return removed, reclaimed
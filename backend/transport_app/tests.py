@@ -0,0 +1,792 @@
+# transport_app/tests.py
+import http.server
+import json
+from datetime import date, timedelta
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core import mail
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from users.models import User
+from . import (
+    activity, archive, changes, documents, expiry, ledger, locations, reconciliation, scheduling, storage, tracking, webhooks,
+)
+from .analytics import fleet_metrics
+from .purge import soft_delete
+from .models import (
+    Truck, TransportationOrder, Expense, MoneyTransfer, TimelineEvent, TrackSegment, TruckPosition, Document, ArchivedOrder,
+    ArchivedTrackSegment, ReconciliationRun, ReconciliationResult, StoredBlob, ChangeLogEntry,
+    WebhookSubscription, WebhookDelivery,
+)
+
+
+def make_user(role, name):
+    return User.objects.create_user(
+        email=f'{name}@example.com', password='secret', username=name,
+        first_name=name.title(), last_name='Test', role=role,
+    )
+
+
+def make_truck(owner, number='KA01AB1234', **fields):
+    expiry = date.today() + timedelta(days=365)
+    values = dict(
+        truck_number=number, model='Model', make='Make', year=2020, capacity=10, owner=owner,
+        rc_expiry=expiry, insurance_expiry=expiry, pollution_expiry=expiry,
+    )
+    return Truck.objects.create(**{**values, **fields})
+
+
+def make_order(owner, **fields):
+    now = timezone.now()
+    values = dict(
+        description='Steel coils', pickup_location='Pune', pickup_contact='A', pickup_phone='1',
+        delivery_location='Mumbai', delivery_contact='B', delivery_phone='2',
+        pickup_date=now, estimated_delivery_date=now + timedelta(days=1),
+        load_type='Steel', weight=10, total_amount=1000, owner=owner, created_by=owner,
+    )
+    return TransportationOrder.objects.create(**{**values, **fields})
+
+
+class ArchiveOrdersTests(TestCase):
+    def setUp(self):
+        self.owner = make_user('owner', 'owner')
+        self.driver = make_user('driver', 'driver')
+        self.truck = make_truck(self.owner, assigned_driver=self.driver)
+        self.order = make_order(self.owner, truck=self.truck, driver=self.driver, status='delivered')
+        now = timezone.now()
+        TrackSegment.objects.create(
+            order=self.order, truck=self.truck, driver=self.driver, started_at=now, ended_at=now, count=0, data=b'',
+        )
+        TruckPosition.objects.create(
+            truck=self.truck, order=self.order, driver=self.driver, latitude=18.5, longitude=73.8, recorded_at=now,
+        )
+        TransportationOrder.objects.filter(pk=self.order.pk).update(updated_at=now - timedelta(days=400))
+
+    def test_archives_order_with_track_and_truck_position(self):
+        self.assertEqual(archive.archive_orders(days=30), 1)
+        # SQLite checks foreign keys at commit; check now, inside the test transaction
+        connection.check_constraints()
+
+        self.assertFalse(TransportationOrder.all_objects.filter(pk=self.order.pk).exists())
+        self.assertTrue(ArchivedOrder.all_objects.filter(pk=self.order.pk).exists())
+        self.assertEqual(ArchivedTrackSegment.objects.filter(order_id=self.order.pk).count(), 1)
+        position = TruckPosition.objects.get(truck=self.truck)
+        self.assertIsNone(position.order_id)
+        self.assertEqual(position.driver_id, self.driver.pk)
+
+
+class PlaceCacheTests(TestCase):
+    def test_rolled_back_place_is_not_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    locations.resolve_place('Nagpur')
+                    raise DatabaseError('rolled back')
+            except DatabaseError:
+                pass
+        # The next place may get the rolled-back id
+        order = make_order(make_user('owner', 'owner'), pickup_location='Nagpur', delivery_location='Pune')
+        order.refresh_from_db()
+        self.assertEqual((order.pickup_place.key, order.delivery_place.key), ('nagpur', 'pune'))
+
+
+class SoftDeletedTruckTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin', 'admin')
+        self.owner = make_user('owner', 'owner')
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.admin)
+
+    def test_number_of_soft_deleted_truck_is_still_taken(self):
+        truck = make_truck(self.owner)
+        soft_delete(truck, self.admin)
+        expiry = (date.today() + timedelta(days=365)).isoformat()
+        response = self.client.post('/api/transport/trucks/', {
+            'truck_number': truck.truck_number, 'model': 'Model', 'make': 'Make', 'year': 2021, 'capacity': '12.00',
+            'owner': self.owner.pk, 'rc_expiry': expiry, 'insurance_expiry': expiry, 'pollution_expiry': expiry,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('truck_number', response.data)
+
+
+class DocumentTests(TestCase):
+    def setUp(self):
+        self.owner = make_user('owner', 'owner')
+        self.order = make_order(self.owner, status='delivered')
+        Expense.objects.create(
+            order=self.order, category='fuel', amount=250, date=date.today(), description='Diesel', added_by=self.owner,
+        )
+        self.period = timezone.localdate(self.order.pickup_date).replace(day=1)
+
+    def test_archived_order_keeps_invoice_and_statement(self):
+        invoice = documents.request_invoice(self.order)
+        long_ago = timezone.now() - timedelta(days=400)
+        TransportationOrder.objects.filter(pk=self.order.pk).update(updated_at=long_ago)
+        Expense.objects.filter(order=self.order).update(updated_at=long_ago)
+        version = documents.statement_versions(self.period, [self.owner.pk])[self.owner.pk]
+        self.assertEqual(archive.archive_orders(days=30), 1)
+        connection.check_constraints()
+
+        invoice.refresh_from_db()
+        self.assertIsNone(invoice.order_id)
+        self.assertEqual(invoice.archived_order_id, self.order.pk)
+        self.assertEqual(documents.request_invoice(ArchivedOrder.objects.get(pk=self.order.pk)).pk, invoice.pk)
+        # Archiving changes nothing a statement shows
+        self.assertEqual(documents.statement_versions(self.period, [self.owner.pk])[self.owner.pk], version)
+        context = documents.statement_context(self.owner, self.period)
+        self.assertEqual([row['number'] for row in context['orders']], [self.order.order_number])
+        self.assertEqual(context['totals']['expenses'], 250)
+
+        self.assertEqual(archive.restore_orders([self.order.pk]), 1)
+        connection.check_constraints()
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.order_id, invoice.archived_order_id), (self.order.pk, None))
+
+    @override_settings(DOCUMENT_CLAIM_TIMEOUT=60)
+    def test_stale_claims_are_taken_again(self):
+        doc = documents.request_invoice(self.order)
+        self.assertEqual([claimed.pk for claimed in documents.claim_pending(10)], [doc.pk])
+        # Claimed by a live worker
+        self.assertEqual(documents.claim_pending(10), [])
+        self.assertEqual(documents.refresh(Document.objects.get(pk=doc.pk)).status, 'rendering')
+
+        Document.objects.filter(pk=doc.pk).update(claimed_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual([claimed.pk for claimed in documents.claim_pending(10)], [doc.pk])
+
+
+@override_settings(LEDGER_CHECKPOINT_INTERVAL=2)
+class DriverLedgerTests(TestCase):
+    def setUp(self):
+        self.driver = make_user('driver', 'driver')
+        self.owner, self.other_owner = make_user('owner', 'owner'), make_user('owner', 'other')
+        own, other, self.deleted = (
+            make_order(owner, driver=self.driver) for owner in (self.owner, self.other_owner, self.owner)
+        )
+        for order, amount in ((own, 100), (other, 70), (self.deleted, 40)):
+            MoneyTransfer.objects.create(
+                order=order, transfer_type='to_driver', amount=amount, description='Float', status='completed',
+                created_by=order.owner,
+            )
+        Expense.objects.create(
+            order=own, category='fuel', amount=30, date=date.today(), description='Diesel', added_by=self.driver,
+        )
+        self.own_order = own
+
+    def get(self, user, path=''):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        return client.get(f'/api/transport/ledger/{self.driver.pk}/{path}')
+
+    def test_soft_deleted_orders_leave_the_ledger(self):
+        self.assertEqual(ledger.balance(self.driver.pk)['balance'], 180)
+        soft_delete(self.deleted, self.owner)
+        result = ledger.balance(self.driver.pk)
+        self.assertEqual((result['balance'], result['entry_count']), (140, 3))
+
+    def test_owner_sees_only_their_orders(self):
+        # Checkpoints of the whole ledger must not leak into an owner's part
+        ledger.balance(self.driver.pk)
+        soft_delete(self.deleted, self.owner)
+        response = self.get(self.owner)
+        self.assertEqual((response.data['balance'], response.data['entry_count']), (70, 2))
+        statement = self.get(self.owner, 'statement/').data
+        self.assertEqual({entry['order'] for entry in statement['entries']}, {self.own_order.pk})
+        self.assertEqual(self.get(self.other_owner).data['balance'], 70)
+        self.assertEqual(self.get(make_user('admin', 'admin')).data['balance'], 140)
+
+
+class OrderUpdateTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin', 'admin')
+        self.owner = make_user('owner', 'owner')
+        self.order = make_order(self.owner, status='assigned')
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.admin)
+        self.url = f'/api/transport/orders/{self.order.pk}/'
+
+    def test_status_change_goes_through_the_workflow(self):
+        response = self.client.patch(self.url, {'status': 'in_transit', 'load_type': 'Cement'})
+        self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.load_type), ('in_transit', 'Cement'))
+        self.assertEqual(
+            list(TimelineEvent.objects.filter(order=self.order).values_list('event_type', flat=True)), ['trip_started'],
+        )
+
+        response = self.client.patch(self.url, {'status': 'pending'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_edit_does_not_revert_a_newer_status(self):
+        stale = TransportationOrder.objects.get(pk=self.order.pk)
+        TransportationOrder.objects.filter(pk=self.order.pk).update(status='cancelled')
+        # As if the order was loaded just before another request cancelled it
+        with mock.patch('transport_app.views.TransportationOrderViewSet.get_object', return_value=stale):
+            response = self.client.patch(self.url, {'load_type': 'Cement'})
+        self.assertEqual(response.status_code, 409)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.load_type), ('cancelled', 'Steel'))
+
+    def test_truck_check_uses_the_new_status(self):
+        booked = make_truck(self.owner, number='KA01AB9999')
+        make_order(self.owner, truck=booked, status='assigned')
+        # Cancelling frees the order from the check, even onto a busy truck
+        response = self.client.patch(self.url, {'status': 'cancelled', 'truck': booked.pk})
+        self.assertEqual(response.status_code, 200)
+
+        # A status change alone is checked against the truck the order already has
+        pending = make_order(self.owner, status='pending')
+        TransportationOrder.objects.filter(pk=pending.pk).update(truck=booked)
+        response = self.client.patch(f'/api/transport/orders/{pending.pk}/', {'status': 'assigned'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('truck', response.data)
+
+
+class FleetAnalyticsTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin', 'admin')
+        self.owner = make_user('owner', 'owner')
+        self.truck = make_truck(self.owner, current_mileage=250000)
+        self.order = make_order(self.owner, truck=self.truck, status='in_transit')
+        Expense.objects.create(
+            order=self.order, category='fuel', amount=500, date=date.today(), description='Diesel', added_by=self.owner,
+        )
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.admin)
+
+    def test_cost_per_km_uses_distance_driven_in_period(self):
+        import numpy as np
+        now_ms = tracking._ms(timezone.now()) - 60_000
+        # About 11.1 km due north, in two segments
+        pings = [[now_ms + i * 1000, 18.5 + i * 0.01, 73.8] for i in range(11)]
+        points = tracking.parse_pings(pings)
+        with self.settings(TRACK_SEGMENT_POINTS=6):
+            tracking.record(self.order, self.owner, points)
+        self.assertEqual(TrackSegment.objects.filter(order=self.order).count(), 2)
+
+        start, end = timezone.now() - timedelta(days=1), timezone.now() + timedelta(days=1)
+        distance = tracking.truck_distances([self.truck.pk], start, end)[self.truck.pk]
+        self.assertTrue(np.isclose(distance, 11_119.5, atol=1))
+
+        row = fleet_metrics(self.admin, 'truck', start, end)['results'][0]
+        self.assertEqual(row['distance_km'], 11.12)
+        self.assertEqual(row['cost_per_km'], round(500 / (distance / 1000), 2))
+
+    def test_non_numeric_owner_id_is_rejected(self):
+        for url in (
+            '/api/transport/dashboard/owner_dashboard/', '/api/transport/dashboard/async/owner_dashboard/',
+            '/api/transport/dashboard/truck_analytics/', '/api/transport/dashboard/driver_analytics/',
+            '/api/transport/dashboard/lanes/',
+        ):
+            self.client.force_login(self.admin)
+            response = self.client.get(url, {'owner_id': 'abc'})
+            self.assertEqual(response.status_code, 400, url)
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        self.owner = make_user('owner', 'owner')
+        self.orders = {}
+        for name, status, sent, spent in (
+            ('unreturned', 'delivered', 500, 300), ('overspent', 'in_transit', 100, 150), ('clean', 'in_transit', 100, 100),
+        ):
+            order = self.orders[name] = make_order(self.owner, status=status, advance_amount=100)
+            MoneyTransfer.objects.create(
+                order=order, transfer_type='to_driver', amount=sent, description='Float', status='completed',
+                created_by=self.owner,
+            )
+            self.add_expense(order, spent)
+        self.orders['drift'] = make_order(self.owner, total_amount=1000, advance_amount=200)
+        TransportationOrder.objects.filter(pk=self.orders['drift'].pk).update(balance_amount=500)
+
+    def add_expense(self, order, amount):
+        return Expense.objects.create(
+            order=order, category='fuel', amount=amount, date=date.today(), description='Diesel', added_by=self.owner,
+        )
+
+    def flags(self, name):
+        result = ReconciliationResult.objects.get(order=self.orders[name])
+        return result.overspend, result.unreturned_float, result.balance_drift
+
+    def test_flags_and_incremental_runs(self):
+        run = reconciliation.run_reconciliation(full=True)
+        self.assertEqual((run.status, run.orders_checked, run.issues_found), ('completed', 4, 3))
+        self.assertEqual(self.flags('unreturned'), (False, True, False))
+        self.assertEqual(self.flags('overspent'), (True, False, False))
+        self.assertEqual(self.flags('drift'), (False, False, True))
+        self.assertEqual(self.flags('clean'), (False, False, False))
+
+        # Only orders changed since the last run are checked again
+        self.assertEqual(reconciliation.run_reconciliation().orders_checked, 0)
+        expense = self.add_expense(self.orders['clean'], 50)
+        run = reconciliation.run_reconciliation()
+        self.assertEqual((run.full, run.orders_checked), (False, 1))
+        self.assertEqual(self.flags('clean'), (True, False, False))
+
+        # A removed expense leaves nothing changed behind; the result is marked stale instead
+        expense.delete()
+        self.assertTrue(ReconciliationResult.objects.get(order=self.orders['clean']).stale)
+        self.assertEqual(reconciliation.run_reconciliation().orders_checked, 1)
+        self.assertEqual(self.flags('clean'), (False, False, False))
+
+
+class ReconciliationRunTests(TestCase):
+    def setUp(self):
+        self.admin = make_user('admin', 'admin')
+        self.order = make_order(make_user('owner', 'owner'))
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.admin)
+
+    def test_run_is_queued_for_the_command(self):
+        response = self.client.post('/api/transport/reconciliation/run/', {'full': 'true'})
+        self.assertEqual((response.status_code, response.data['status']), (202, 'pending'))
+        self.assertFalse(ReconciliationResult.objects.exists())
+        # One queued run at a time
+        self.assertEqual(self.client.post('/api/transport/reconciliation/run/').status_code, 409)
+
+        call_command('reconcile_orders', stdout=StringIO())
+        run = ReconciliationRun.objects.get(pk=response.data['id'])
+        self.assertEqual((run.status, run.full, run.orders_checked), ('completed', True, 1))
+        self.assertTrue(ReconciliationResult.objects.filter(order=self.order).exists())
+
+    def test_only_one_run_at_a_time(self):
+        ReconciliationRun.objects.create(status='running', started_at=timezone.now())
+        reconciliation.request_run()
+        # Queued behind the running one
+        self.assertIsNone(reconciliation.claim_next_run())
+        with self.assertRaises(IntegrityError):
+            reconciliation.run_reconciliation()
+
+
+class FileReferenceTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = self.settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        owner = make_user('owner', 'owner')
+        self.order = make_order(owner)
+        self.expenses = [
+            Expense.objects.create(
+                order=self.order, category='fuel', amount=250, date=date.today(), description='Diesel', added_by=owner,
+                bill_photo=ContentFile(b'same bill', name='bill.jpg'),
+            )
+            for _ in range(2)
+        ]
+
+    def test_deleting_a_shared_file_releases_one_reference(self):
+        first, second = self.expenses
+        self.assertEqual(first.bill_photo.name, second.bill_photo.name)
+        blob = StoredBlob.objects.get(name=first.bill_photo.name)
+        self.assertEqual(blob.ref_count, 2)
+
+        first.bill_photo.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        second.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 0)
+
+    def test_reused_blob_restarts_its_grace_period(self):
+        for expense in self.expenses:
+            expense.delete()
+        blob = StoredBlob.objects.get()
+        StoredBlob.objects.filter(pk=blob.pk).update(updated_at=timezone.now() - timedelta(days=2))
+        # An upload of the same content, not yet saved on a row
+        self.assertEqual(default_storage.save('bill.jpg', ContentFile(b'same bill')), blob.name)
+
+        self.assertEqual(storage.collect_garbage(grace_seconds=3600), (0, 0))
+        self.assertTrue(default_storage.exists(blob.name))
+        StoredBlob.objects.filter(pk=blob.pk).update(updated_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(storage.collect_garbage(grace_seconds=3600)[0], 1)
+        self.assertFalse(default_storage.exists(blob.name))
+
+
+class ConcurrentTransferTests(TransactionTestCase):
+    THREADS = 8
+
+    def setUp(self):
+        self.admin = make_user('admin', 'admin')
+        self.order = make_order(make_user('owner', 'owner'), driver=make_user('driver', 'driver'))
+        # Committed places outlive the flush at the end of the test
+        self.addCleanup(locations.clear_cache)
+
+    def post(self, key, transaction_id=None):
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.admin)
+        data = {'order': self.order.pk, 'transfer_type': 'to_driver', 'amount': '10.00', 'description': 'Float'}
+        if transaction_id:
+            data['transaction_id'] = transaction_id
+        try:
+            response = client.post('/api/transport/transfers/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+            return response.status_code, response.data.get('id')
+        finally:
+            connection.close()
+
+    def fire(self, requests):
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            return list(pool.map(lambda args: self.post(*args), requests))
+
+    def test_retries_with_one_key_create_one_transfer(self):
+        results = self.fire([('retry',)] * self.THREADS)
+        self.assertEqual(MoneyTransfer.objects.filter(idempotency_key='retry').count(), 1)
+        self.assertEqual({result for result in results}, {(201, MoneyTransfer.objects.get().pk)})
+        self.assertEqual(TimelineEvent.objects.filter(related_transfer__isnull=False).count(), 1)
+
+    def test_transaction_id_is_written_once(self):
+        results = self.fire([(f'dup-{i}', 'UTR123') for i in range(self.THREADS)])
+        self.assertEqual(MoneyTransfer.objects.filter(transaction_id='UTR123').count(), 1)
+        codes = Counter(code for code, _ in results)
+        # Requests that start after the winner commits fail validation instead of the constraint
+        self.assertEqual((codes[201], codes[400] + codes[409]), (1, self.THREADS - 1))
+
+
+@override_settings(EXPIRY_ALERT_WINDOWS=[30, 7], EXPIRY_ALERT_LOOKBACK_DAYS=30)
+class ExpiryAlertTests(TestCase):
+    def setUp(self):
+        self.today = date(2026, 3, 1)
+        self.owner = make_user('owner', 'owner')
+        self.admin = make_user('admin', 'admin')
+        self.truck = make_truck(self.owner)
+        Truck.objects.filter(pk=self.truck.pk).update(insurance_expiry=self.today + timedelta(days=20))
+        self.driver = make_user('driver', 'driver')
+        User.objects.filter(pk=self.driver.pk).update(license_expiry=self.today - timedelta(days=2))
+
+    def test_one_mail_per_recipient_and_window(self):
+        result = expiry.run_scan(today=self.today)
+        self.assertEqual(result, {'notices': 2, 'sent': 3, 'recipients': 3})
+        mails = {message.to[0]: message.body for message in mail.outbox}
+        self.assertIn('Insurance for truck KA01AB1234', mails['owner@example.com'])
+        self.assertIn('expired 2 day(s) ago', mails['admin@example.com'])
+        self.assertEqual(set(mails), {'owner@example.com', 'driver@example.com', 'admin@example.com'})
+
+        # Nothing new in the same window; the 7-day window alerts again
+        self.assertEqual(expiry.run_scan(today=self.today + timedelta(days=1))['sent'], 0)
+        result = expiry.run_scan(today=self.today + timedelta(days=14))
+        self.assertEqual((result['sent'], mail.outbox[-1].to), (1, ['owner@example.com']))
+
+    def test_inactive_owner_is_not_mailed(self):
+        User.objects.filter(pk=self.owner.pk).update(is_active=False)
+        expiry.run_scan(today=self.today)
+        self.assertNotIn(['owner@example.com'], [message.to for message in mail.outbox])
+
+
+class SchedulingIndexTests(TestCase):
+    def test_interval_conflicts(self):
+        booked = scheduling.TruckIntervals()
+        for start, end, order_id in ((0, 10, 1), (20, 30, 2), (5, 50, 3)):
+            booked.add(start, end, order_id)
+        self.assertEqual(booked.conflicts(12, 18), [3])
+        # Windows are half-open: one ending at 30 leaves 30 free
+        self.assertEqual(sorted(booked.conflicts(30, 40)), [3])
+        self.assertEqual(sorted(booked.conflicts(8, 22)), [1, 2, 3])
+        self.assertEqual(booked.conflicts(12, 18, exclude_order=3), [])
+        booked.remove(5, 3)
+        self.assertEqual((booked.conflicts(12, 18), booked.conflicts(50, 60)), ([], []))
+
+    def test_available_trucks(self):
+        owner = make_user('owner', 'owner')
+        small = make_truck(owner, 'KA01AA0001', capacity=10)
+        big = make_truck(owner, 'KA01AA0002', capacity=20)
+        make_truck(owner, 'KA01AA0003', capacity=15, status='maintenance')
+        order = make_order(owner, truck=small, status='assigned')
+        index = scheduling.AvailabilityIndex()
+        start = order.pickup_date + timedelta(hours=2)
+        end = start + timedelta(hours=3)
+
+        self.assertEqual(index.available(start, end, 5), [(big.pk, 20.0)])
+        self.assertEqual(index.available(start, end, 5, exclude_order=order.pk), [(small.pk, 10.0), (big.pk, 20.0)])
+        self.assertEqual(index.available(start, end, 12, exclude_order=order.pk), [(big.pk, 20.0)])
+        self.assertEqual(index.available(start, end, 5, owner_id=make_user('owner', 'other').pk), [])
+
+        index.order_saved(order.pk, small.pk, order.pickup_date, order.estimated_delivery_date, 'cancelled')
+        self.assertEqual(index.available(start, end, 5, limit=1), [(small.pk, 10.0)])
+
+    def test_assignment_is_checked_against_the_database(self):
+        owner = make_user('owner', 'owner')
+        truck = make_truck(owner, capacity=10)
+        order = make_order(owner, truck=truck, status='in_transit')
+        start, end = order.pickup_date, order.estimated_delivery_date
+        with self.assertRaisesMessage(ValidationError, order.order_number):
+            scheduling.check_assignment(truck, 5, start + timedelta(hours=1), end + timedelta(hours=1))
+        with self.assertRaisesMessage(ValidationError, 'exceeds'):
+            scheduling.check_assignment(truck, 12, end, end + timedelta(hours=1))
+        scheduling.check_assignment(truck, 5, end, end + timedelta(hours=1))
+        scheduling.check_assignment(truck, 5, start, end, exclude_order=order.pk)
+
+
+class OrderBundleTests(TestCase):
+    def setUp(self):
+        self.owner = make_user('owner', 'owner')
+        self.order = make_order(self.owner, status='delivered', advance_amount=100)
+        for amount in (100, 150, 50):
+            self.add_expense(amount)
+        for amount, transfer_status in ((500, 'completed'), (70, 'pending')):
+            MoneyTransfer.objects.create(
+                order=self.order, transfer_type='to_driver', amount=amount, description='Float', status=transfer_status,
+                created_by=self.owner,
+            )
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.owner)
+        self.url = f'/api/transport/orders/{self.order.pk}/bundle/'
+
+    def add_expense(self, amount):
+        Expense.objects.create(
+            order=self.order, category='fuel', amount=amount, date=date.today(), description='Diesel', added_by=self.owner,
+        )
+
+    def test_pages_and_summary(self):
+        data = self.client.get(self.url, {'page_size': 2}).data
+        self.assertEqual(data['order']['id'], self.order.pk)
+        self.assertEqual((data['expenses']['count'], data['expenses']['next_page']), (3, 2))
+        self.assertEqual(len(data['expenses']['results']), 2)
+        self.assertEqual((data['transfers']['count'], data['transfers']['next_page']), (2, None))
+        summary = data['summary']
+        # The pending transfer is not counted
+        self.assertEqual((summary['expense_total'], summary['sent_to_driver']), (300, 500))
+        self.assertEqual((summary['driver_float'], summary['net_profit']), (200, 700))
+
+        data = self.client.get(self.url, {'page_size': 2, 'include': 'expenses', 'expenses_page': 2}).data
+        self.assertNotIn('transfers', data)
+        self.assertEqual((len(data['expenses']['results']), data['expenses']['next_page']), (1, None))
+        self.assertEqual(self.client.get(self.url, {'expenses_page': 0}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'page_size': 'all'}).status_code, 400)
+
+    def test_query_count_does_not_grow_with_the_order(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url)
+        for amount in range(10):
+            self.add_expense(amount + 1)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(self.url)
+        self.assertEqual(len(large), len(small))
+
+    def test_archived_order(self):
+        long_ago = timezone.now() - timedelta(days=400)
+        TransportationOrder.objects.filter(pk=self.order.pk).update(updated_at=long_ago)
+        Expense.objects.filter(order=self.order).update(updated_at=long_ago)
+        MoneyTransfer.objects.filter(order=self.order).update(updated_at=long_ago)
+        self.assertEqual(archive.archive_orders(days=30), 1)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        data = self.client.get(self.url, {'include_archived': 1}).data
+        self.assertEqual((data['expenses']['count'], data['summary']['driver_float']), (3, 200))
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.owner = make_user('owner', 'owner')
+        self.driver, self.other_driver = make_user('driver', 'driver'), make_user('driver', 'other')
+        self.cursor = changes.head()
+        self.order = make_order(self.owner, driver=self.driver)
+        other_order = make_order(self.owner, driver=self.other_driver)
+        # Reaches the driver through the order's driver and through its creator: one entry, not two
+        self.own_event = TimelineEvent.objects.create(
+            order=self.order, title='Loaded', event_type='status_update', created_by=self.driver,
+        )
+        # Through its creator only
+        self.other_event = TimelineEvent.objects.create(
+            order=other_order, title='Helped', event_type='status_update', created_by=self.driver,
+        )
+
+    def keys(self, page):
+        return [(entry.model, entry.object_id, row is not None) for entry, row in page['changes']]
+
+    def test_driver_feed_merges_scope_columns(self):
+        page = changes.feed(self.driver, self.cursor)
+        self.assertEqual(self.keys(page), [
+            ('orders', self.order.pk, True), ('timeline', self.own_event.pk, True), ('timeline', self.other_event.pk, True),
+        ])
+        self.assertFalse(page['has_more'])
+        self.assertEqual(page['cursor'], changes.head())
+        self.assertEqual(changes.feed(self.driver, page['cursor'])['changes'], [])
+
+        first = changes.feed(self.driver, self.cursor, limit=1)
+        self.assertEqual((self.keys(first), first['has_more']), ([('orders', self.order.pk, True)], True))
+        self.assertEqual(len(changes.feed(self.driver, first['cursor'])['changes']), 2)
+
+    def test_latest_entry_per_row_and_rows_out_of_scope(self):
+        self.order.load_type = 'Cement'
+        self.order.save()
+        keys = self.keys(changes.feed(self.owner, self.cursor))
+        # Collapsed to the latest entry, in that entry's place
+        self.assertEqual([key for key in keys if key[:2] == ('orders', self.order.pk)], [('orders', self.order.pk, True)])
+        self.assertEqual(keys[-1], ('orders', self.order.pk, True))
+
+        # Moved to another driver without an entry the driver can see: a delete for them
+        TransportationOrder.objects.filter(pk=self.order.pk).update(driver=self.other_driver)
+        self.assertIn(('orders', self.order.pk, False), self.keys(changes.feed(self.driver, self.cursor)))
+
+    def test_pruned_cursor_has_expired(self):
+        ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(days=60))
+        head, count = changes.head(), ChangeLogEntry.objects.count()
+        self.assertEqual(changes.prune(days=30), count - 1)
+        # The newest entry is kept, so an expired cursor is still told apart from an empty page
+        self.assertEqual(list(ChangeLogEntry.objects.values_list('pk', flat=True)), [head])
+        self.assertIsNone(changes.feed(self.owner, self.cursor))
+        self.assertIsNotNone(changes.feed(self.owner, head - 1))
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.owner)
+        self.assertEqual(client.get('/api/transport/changes/', {'since': self.cursor}).status_code, 410)
+        self.assertEqual(client.get('/api/transport/changes/', {'since': 'x'}).status_code, 400)
+
+
+class _Endpoint(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((dict(self.headers), body))
+        self.send_response(self.server.status)
+        if self.server.status == 302:
+            self.send_header('Location', 'http://169.254.169.254/')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(WEBHOOK_ALLOW_PRIVATE_ADDRESSES=True, WEBHOOK_MAX_ATTEMPTS=2)
+class WebhookDeliveryTests(TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Endpoint)
+        self.server.requests, self.server.status = [], 200
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.owner = make_user('owner', 'owner')
+        self.subscription = WebhookSubscription.objects.create(
+            user=self.owner, url=f'http://127.0.0.1:{self.server.server_port}/hook?source=sms',
+            secret=webhooks.new_secret(),
+        )
+        for status_value in ('assigned', 'in_transit'):
+            webhooks.queue('order.status_changed', self.owner.pk, {'status': status_value})
+
+    def test_batch_is_signed(self):
+        self.assertEqual(webhooks.deliver(self.subscription.pk), (2, None))
+        ((headers, body),) = self.server.requests
+        self.assertEqual(
+            headers['X-Webhook-Signature'],
+            webhooks.sign(self.subscription.secret, headers['X-Webhook-Timestamp'], body),
+        )
+        self.assertEqual([event['data']['status'] for event in json.loads(body)['events']], ['assigned', 'in_transit'])
+        self.assertEqual(set(WebhookDelivery.objects.values_list('status', flat=True)), {'delivered'})
+
+    def test_failed_batch_is_retried_then_given_up(self):
+        self.server.status = 500
+        self.assertEqual(webhooks.deliver(self.subscription.pk), (0, 'The endpoint answered HTTP 500.'))
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.failures, 1)
+        self.assertGreater(self.subscription.next_attempt_at, timezone.now())
+        # Waiting to retry
+        self.assertEqual(webhooks.deliver(self.subscription.pk), (0, None))
+        self.assertEqual(list(webhooks.due_subscriptions()), [])
+
+        WebhookSubscription.objects.filter(pk=self.subscription.pk).update(next_attempt_at=timezone.now())
+        self.server.status = 302  # not followed
+        self.assertEqual(webhooks.deliver(self.subscription.pk), (0, 'The endpoint answered HTTP 302.'))
+        self.assertEqual(set(WebhookDelivery.objects.values_list('status', 'attempts')), {('failed', 2)})
+        self.subscription.refresh_from_db()
+        self.assertEqual((self.subscription.failures, self.subscription.next_attempt_at), (0, None))
+        self.assertEqual(len(self.server.requests), 2)
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_ADDRESSES=False, WEBHOOK_MAX_ATTEMPTS=10)
+    def test_private_addresses_are_refused(self):
+        error = 'The host does not resolve to a public address.'
+        self.assertEqual(webhooks.deliver(self.subscription.pk), (0, error))
+        for host in ('localhost', '[::ffff:10.0.0.1]', '169.254.169.254'):
+            WebhookSubscription.objects.filter(pk=self.subscription.pk).update(
+                url=f'http://{host}/hook', next_attempt_at=None,
+            )
+            self.assertEqual(webhooks.deliver(self.subscription.pk), (0, error), host)
+        self.assertEqual(self.server.requests, [])
+
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(self.owner)
+        response = client.post('/api/transport/webhooks/', {'url': 'ftp://example.com/hook'}, format='json')
+        self.assertEqual((response.status_code, list(response.data)), (400, ['url']))
+
+
+class ActivityFeedTests(TestCase):
+    def setUp(self):
+        self.owner = make_user('owner', 'owner')
+        self.driver = make_user('driver', 'driver')
+        self.order = make_order(self.owner, driver=self.driver)
+        for amount in (100, 150, 50):
+            Expense.objects.create(
+                order=self.order, category='fuel', amount=amount, description='Diesel', added_by=self.driver,
+            )
+        for amount in (500, 70):
+            MoneyTransfer.objects.create(
+                order=self.order, transfer_type='to_driver', amount=amount, description='Float', created_by=self.owner,
+            )
+        for title in ('Loaded', 'Departed', 'Arrived'):
+            # Reaches the driver through the order's driver and through its creator
+            TimelineEvent.objects.create(
+                order=self.order, title=title, event_type='status_update', created_by=self.driver,
+            )
+        # Ties within a kind and across kinds are ordered by (time, kind, id)
+        moment = timezone.now() - timedelta(hours=1)
+        TimelineEvent.objects.update(created_at=moment)
+        Expense.objects.exclude(amount=50).update(date=moment)
+        MoneyTransfer.objects.filter(amount=500).update(created_at=moment)
+        self.client = APIClient(SERVER_NAME='localhost')
+
+    def expected(self):
+        keys = [
+            (getattr(row, time_field), kind, row.pk)
+            for kind, (model, time_field, _) in activity.KINDS.items()
+            for row in model.objects.filter(order=self.order)
+        ]
+        return [(kind, pk) for _, kind, pk in sorted(keys, reverse=True)]
+
+    def walk(self, user, **params):
+        self.client.force_authenticate(user)
+        seen, cursor = [], None
+        while True:
+            query = dict(params, page_size=2, **({'cursor': cursor} if cursor else {}))
+            response = self.client.get('/api/transport/activity/', query)
+            self.assertEqual(response.status_code, 200)
+            seen += [(item['type'], item['data']['id']) for item in response.data['results']]
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                return seen
+
+    def test_pages_cover_every_row_once_in_order(self):
+        expected = self.expected()
+        self.assertEqual(len(expected), len(set(expected)))
+        self.assertEqual(self.walk(self.owner, order=self.order.pk), expected)
+        self.assertEqual(self.walk(self.owner), expected)
+        # Events are in two of the driver's scope columns but listed once
+        self.assertEqual(self.walk(self.driver), expected)
+
+    def test_cursor_is_stable_under_inserts(self):
+        self.client.force_authenticate(self.owner)
+        first = self.client.get('/api/transport/activity/', {'order': self.order.pk, 'page_size': 4}).data
+        TimelineEvent.objects.create(order=self.order, title='Unloaded', event_type='status_update', created_by=self.owner)
+        rest = self.client.get(
+            '/api/transport/activity/', {'order': self.order.pk, 'page_size': 50, 'cursor': first['next_cursor']},
+        ).data
+        seen = [(item['type'], item['data']['id']) for item in first['results'] + rest['results']]
+        # The newer event belongs before the cursor, so it shows up on neither page
+        self.assertEqual(seen, self.expected()[1:])
+
+    def test_bad_parameters(self):
+        self.client.force_authenticate(self.owner)
+        for params in ({'cursor': 'not-a-cursor'}, {'cursor': activity.encode_cursor((timezone.now(), 'x', 1))},
+                       {'page_size': 0}, {'page_size': 'all'}):
+            self.assertEqual(self.client.get('/api/transport/activity/', params).status_code, 400, params)
+        other = make_user('owner', 'other')
+        self.assertEqual(self.client.get('/api/transport/activity/', {'owner': other.pk}).status_code, 404)
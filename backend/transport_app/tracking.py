@@ -0,0 +1,241 @@
+# transport_app/tracking.py
+import time
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import TrackSegment, TruckPosition, ArchivedTrackSegment
+
+# numpy is imported by the functions that use it, as in analytics.py: views import
+# this module at startup, but only the tracking endpoints need numpy.
+
+SCALE = 1_000_000  # coordinates are stored in millionths of a degree, about 11 cm
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# A segment's times are int32 milliseconds from its start
+MAX_SEGMENT_SPAN_MS = 20 * 24 * 3600 * 1000
+# Phone clocks may run a little ahead
+MAX_CLOCK_SKEW_MS = 5 * 60 * 1000
+EARTH_RADIUS_METRES = 6_371_000
+PINGS_FORMAT = 'pings must be a list of [epoch milliseconds, latitude, longitude].'
+
+
+def _ms(value):
+    return (value - EPOCH) // timedelta(milliseconds=1)
+
+
+def _datetime(ms):
+    return EPOCH + timedelta(milliseconds=int(ms))
+
+
+def parse_pings(pings):
+    """
+    ``pings`` as an (n, 3) int64 array of (epoch ms, latitude, longitude) in storage
+    units, sorted by time, without repeated times and without pings that cannot be
+    positions (out of range, 0,0 from a phone without a fix, or from the future).
+    ValueError if ``pings`` is not a list of [ms, latitude, longitude].
+    """
+    import numpy as np
+    if not isinstance(pings, list) or not pings:
+        raise ValueError(PINGS_FORMAT)
+    if len(pings) > settings.TRACK_MAX_BATCH:
+        raise ValueError(f'At most {settings.TRACK_MAX_BATCH} pings per request.')
+    try:
+        values = np.array(pings, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError(PINGS_FORMAT)
+    if values.ndim != 2 or values.shape[1] != 3:
+        raise ValueError(PINGS_FORMAT)
+
+    times, lat, lon = values.T
+    with np.errstate(invalid='ignore'):
+        valid = (
+            np.isfinite(values).all(axis=1)
+            & (times > 0) & (times <= time.time() * 1000 + MAX_CLOCK_SKEW_MS)
+            & (np.abs(lat) <= 90) & (np.abs(lon) <= 180) & ((lat != 0) | (lon != 0))
+        )
+    points = np.column_stack([times[valid], np.rint(lat[valid] * SCALE), np.rint(lon[valid] * SCALE)]).astype(np.int64)
+    points = points[np.argsort(points[:, 0], kind='stable')]
+    return points[np.diff(points[:, 0], prepend=-1) > 0]
+
+
+def encode(points):
+    """
+    (n, 3) int64 points -> bytes: per column (time, latitude, longitude) the first
+    value and then the differences, as little-endian int32, zlib-compressed.
+    Consecutive pings differ little, so the differences compress well.
+    """
+    import numpy as np
+    deltas = np.diff(points, axis=0, prepend=np.zeros((1, 3), dtype=np.int64))
+    return zlib.compress(deltas.T.astype('<i4').tobytes())
+
+
+def decode(data, count):
+    """The (count, 3) int64 points of ``encode``."""
+    import numpy as np
+    deltas = np.frombuffer(zlib.decompress(data), dtype='<i4').reshape(3, count).T
+    return np.cumsum(deltas, axis=0, dtype=np.int64)
+
+
+def _segment_fields(points):
+    """TrackSegment columns holding ``points`` (epoch ms)."""
+    start = int(points[0, 0])
+    relative = points.copy()
+    relative[:, 0] -= start
+    return {
+        'started_at': _datetime(start),
+        'ended_at': _datetime(points[-1, 0]),
+        'count': len(points),
+        'data': encode(relative),
+    }
+
+
+def record(order, driver, points):
+    """
+    Append ``points`` (from ``parse_pings``) to the track of ``order`` and move its
+    truck's position; returns how many were stored. A track only grows forward in
+    time, so a retried batch or a late ping is dropped.
+
+    The last segment is rewritten with the new points until it holds
+    TRACK_SEGMENT_POINTS, so a batch costs a few queries however many pings it has.
+    """
+    import numpy as np
+    capacity = settings.TRACK_SEGMENT_POINTS
+    with transaction.atomic():
+        segment = TrackSegment.objects.select_for_update().filter(order=order).order_by('-started_at', '-pk').first()
+        if segment is not None:
+            points = points[points[:, 0] > _ms(segment.ended_at)]
+        if not len(points):
+            return 0
+        stored = len(points)
+        last_ms, last_lat, last_lon = (int(value) for value in points[-1])
+
+        if segment is not None and segment.count < capacity:
+            start = _ms(segment.started_at)
+            fits = min(capacity - segment.count, int(np.count_nonzero(points[:, 0] - start < MAX_SEGMENT_SPAN_MS)))
+            if fits:
+                existing = decode(segment.data, segment.count)
+                existing[:, 0] += start
+                for field, value in _segment_fields(np.concatenate([existing, points[:fits]])).items():
+                    setattr(segment, field, value)
+                segment.save(update_fields=['ended_at', 'count', 'data'])
+                points = points[fits:]
+
+        segments = []
+        while len(points):
+            chunk = points[:capacity]
+            chunk = chunk[chunk[:, 0] - chunk[0, 0] < MAX_SEGMENT_SPAN_MS]
+            segments.append(TrackSegment(order=order, truck_id=order.truck_id, driver=driver, **_segment_fields(chunk)))
+            points = points[len(chunk):]
+        TrackSegment.objects.bulk_create(segments)
+
+        if order.truck_id:
+            position = {
+                'order': order, 'driver': driver, 'recorded_at': _datetime(last_ms),
+                'latitude': last_lat / SCALE, 'longitude': last_lon / SCALE,
+            }
+            # Another order of the truck may have sent a later ping
+            if not TruckPosition.objects.filter(truck_id=order.truck_id, recorded_at__lt=position['recorded_at']).update(
+                **position
+            ):
+                TruckPosition.objects.bulk_create([TruckPosition(truck_id=order.truck_id, **position)], ignore_conflicts=True)
+    return stored
+
+
+def path(order, archived=False):
+    """The whole track of ``order`` as an (n, 3) float64 array of (epoch ms, latitude, longitude)."""
+    import numpy as np
+    model = ArchivedTrackSegment if archived else TrackSegment
+    parts = []
+    for started_at, count, data in model.objects.filter(order_id=order.pk).order_by('started_at', 'pk').values_list(
+        'started_at', 'count', 'data',
+    ):
+        points = decode(data, count)
+        points[:, 0] += _ms(started_at)
+        parts.append(points)
+    if not parts:
+        return np.empty((0, 3))
+    points = np.concatenate(parts).astype(np.float64)
+    points[:, 1:] /= SCALE
+    return points
+
+
+def _length(points):
+    """Metres along ``points`` (as from ``decode``, in storage units): great-circle distances added up."""
+    import numpy as np
+    if len(points) < 2:
+        return 0.0
+    lat, lon = np.radians(points[:, 1] / SCALE), np.radians(points[:, 2] / SCALE)
+    a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2
+    return float(2 * EARTH_RADIUS_METRES * np.arcsin(np.sqrt(np.minimum(a, 1))).sum())
+
+
+def truck_distances(truck_ids, start, end):
+    """
+    {truck id: metres driven from ``start`` to ``end``} by the recorded tracks, live
+    and archived. Trucks that sent no pings in the period are left out.
+    """
+    import numpy as np
+    start_ms, end_ms = _ms(start), _ms(end)
+    distances = {}
+    for model in (TrackSegment, ArchivedTrackSegment):
+        rows = model.objects.filter(truck_id__in=truck_ids, started_at__lt=end, ended_at__gte=start).order_by(
+            'truck_id', 'order_id', 'started_at', 'pk',
+        ).values_list('truck_id', 'order_id', 'started_at', 'count', 'data')
+        # An order's segments are joined, so the step from one to the next counts too
+        for (truck_id, _), segments in groupby(rows.iterator(), key=itemgetter(0, 1)):
+            parts = []
+            for _, _, started_at, count, data in segments:
+                points = decode(data, count)
+                points[:, 0] += _ms(started_at)
+                parts.append(points)
+            points = np.concatenate(parts)
+            points = points[(points[:, 0] >= start_ms) & (points[:, 0] < end_ms)]
+            distances[truck_id] = distances.get(truck_id, 0.0) + _length(points)
+    return distances
+
+
+def _kept(xy, tolerance):
+    """Mask of the points Ramer-Douglas-Peucker keeps at ``tolerance`` (in the units of ``xy``)."""
+    import numpy as np
+    keep = np.zeros(len(xy), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(xy) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        # Distance to the segment, not the line, so a truck doubling back is kept
+        direction = xy[last] - xy[first]
+        offsets = xy[first + 1:last] - xy[first]
+        length = direction @ direction
+        along = np.clip(offsets @ direction / length, 0, 1) if length else np.zeros(len(offsets))
+        distances = np.hypot(*(offsets - np.outer(along, direction)).T)
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            index += first + 1
+            keep[index] = True
+            stack += [(first, index), (index, last)]
+    return keep
+
+
+def simplify(points, tolerance, max_points=None):
+    """
+    ``points`` of a path thinned for a map: every dropped point is within
+    ``tolerance`` metres of the path drawn through the kept ones. While more than
+    ``max_points`` are kept the tolerance is doubled. Returns (points, tolerance used).
+    """
+    import numpy as np
+    if len(points) <= 2:
+        return points, tolerance
+    # Equirectangular projection around the path's mean latitude; plenty at the scale of a trip
+    lat, lon = np.radians(points[:, 1]), np.radians(points[:, 2])
+    xy = np.column_stack([lon * np.cos(lat.mean()), lat]) * EARTH_RADIUS_METRES
+    while True:
+        keep = _kept(xy, tolerance)
+        if not max_points or np.count_nonzero(keep) <= max_points:
+            return points[keep], tolerance
+        tolerance = tolerance * 2 if tolerance > 0 else 1.0
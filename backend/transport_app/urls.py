@@ -1,9 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import views
 from .views import (
     TruckViewSet, TransportationOrderViewSet, 
     ExpenseViewSet, MoneyTransferViewSet,
-    TimelineEventViewSet, DashboardViewSet
+    TimelineEventViewSet, DashboardViewSet, DriverLedgerViewSet,
+    ReconciliationViewSet, PurgeJobViewSet, ChangeFeedViewSet, WebhookSubscriptionViewSet,
+    ActivityViewSet, DocumentViewSet, DocumentRunViewSet
 )
 
 router = DefaultRouter()
@@ -13,7 +16,18 @@ router.register(r'expenses', ExpenseViewSet, basename='expense')
 router.register(r'transfers', MoneyTransferViewSet, basename='transfer')
 router.register(r'timeline', TimelineEventViewSet, basename='timeline')
 router.register(r'dashboard', DashboardViewSet, basename='dashboard')
+router.register(r'ledger', DriverLedgerViewSet, basename='ledger')
+router.register(r'reconciliation', ReconciliationViewSet, basename='reconciliation')
+router.register(r'purge-jobs', PurgeJobViewSet, basename='purge-job')
+router.register(r'changes', ChangeFeedViewSet, basename='change')
+router.register(r'activity', ActivityViewSet, basename='activity')
+router.register(r'documents', DocumentViewSet, basename='document')
+router.register(r'document-runs', DocumentRunViewSet, basename='document-run')
+router.register(r'webhooks', WebhookSubscriptionViewSet, basename='webhook')
 
 urlpatterns = [
+    # Concurrent-query versions of dashboard/stats/ and dashboard/owner_dashboard/, for ASGI
+    path('dashboard/async/stats/', views.dashboard_stats_async, name='dashboard-stats-async'),
+    path('dashboard/async/owner_dashboard/', views.owner_dashboard_async, name='dashboard-owner-dashboard-async'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
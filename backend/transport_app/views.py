@@ -1,25 +1,106 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.exceptions import (
+    APIException, AuthenticationFailed, NotAuthenticated, PermissionDenied, ValidationError
+)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.generics import get_object_or_404
+from asgiref.sync import sync_to_async
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import IntegrityError, transaction
 from django.db.models import Sum, Count, Q
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal
 
-from .models import Truck, TransportationOrder, Expense, MoneyTransfer, TimelineEvent
+from .models import (
+    Truck, TransportationOrder, Expense, MoneyTransfer, TimelineEvent, LaneStat,
+    ReconciliationRun, ReconciliationResult, PurgeJob, ArchivedOrder, WebhookSubscription, Document, DocumentRun,
+    TruckPosition
+)
+from .expiry import expiring_filter, expiring_documents
+from .analytics import fleet_metrics, parse_period
+from .archive import ARCHIVED_MODELS, ArchiveUnion
+from .lanes import lane_rows
+from .locations import find_place
+from . import activity, changes, dashboard, documents, ledger, scheduling, tracking, webhooks
+from .purge import SoftDeleteMixin
+from .reconciliation import TRANSFER_COLUMNS, request_run
+from .workflow import StatusConflict, transition_order, validate_transition
 from .serializers import (
     TruckSerializer, TruckCreateSerializer,
     TransportationOrderSerializer, TransportationOrderCreateSerializer,
     ExpenseSerializer, ExpenseCreateSerializer,
     MoneyTransferSerializer, MoneyTransferCreateSerializer,
-    TimelineEventSerializer, DashboardStatsSerializer
+    TimelineEventSerializer, DashboardStatsSerializer,
+    ReconciliationRunSerializer, ReconciliationResultSerializer, PurgeJobSerializer,
+    WebhookSubscriptionSerializer, WebhookDeliverySerializer, DocumentSerializer, DocumentRunSerializer,
+    TruckPositionSerializer
 )
 from users.permissions import IsAdmin, IsOwner, IsDriver, IsAdminOrOwner
 from users.serializers import UserSerializer
 from users.models import User
 
-class TruckViewSet(viewsets.ModelViewSet):
+class ArchiveReadMixin:
+    """
+    With ``?include_archived=true``, reads also see archived rows (transport_app/archive.py):
+    lists merge them in the same ordering and detail routes fall back to them.
+    Archived rows are read-only, so writes never see them.
+    """
+    
+    def include_archived(self):
+        return (
+            self.request.method in SAFE_METHODS
+            and self.request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+        )
+    
+    def get_archive_queryset(self):
+        return self.get_queryset(model=ARCHIVED_MODELS[self.get_queryset().model])
+    
+    def list(self, request, *args, **kwargs):
+        if not self.include_archived():
+            return super().list(request, *args, **kwargs)
+        
+        querysets, errors = [], []
+        for queryset in (self.get_queryset(), self.get_archive_queryset()):
+            try:
+                querysets.append(self.filter_queryset(queryset))
+            except ValidationError as exc:
+                # e.g. ?order= naming an order that only exists on the other side
+                errors.append(exc)
+                querysets.append(queryset.none())
+        if len(errors) == len(querysets):
+            raise errors[0]
+        
+        rows = ArchiveUnion(*querysets)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(rows[:], many=True).data)
+    
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if not self.include_archived():
+                raise
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = get_object_or_404(
+            self.filter_queryset(self.get_archive_queryset()),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class TruckViewSet(SoftDeleteMixin, viewsets.ModelViewSet):
     queryset = Truck.objects.all()
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'owner', 'assigned_driver']
@@ -39,16 +120,7 @@ class TruckViewSet(viewsets.ModelViewSet):
         return TruckSerializer
     
     def get_queryset(self):
-        user = self.request.user
-        
-        if user.role == 'admin':
-            return Truck.objects.all()
-        elif user.role == 'owner':
-            return Truck.objects.filter(owner=user)
-        elif user.role == 'driver':
-            return Truck.objects.filter(assigned_driver=user)
-        
-        return Truck.objects.none()
+        return Truck.objects.for_user(self.request.user)
     
     def perform_create(self, serializer):
         truck = serializer.save()
@@ -60,6 +132,46 @@ class TruckViewSet(viewsets.ModelViewSet):
             created_by=self.request.user
         )
     
+    @action(detail=False, methods=['get'])
+    def expiring(self, request):
+        try:
+            days = int(request.query_params.get('days', max(settings.EXPIRY_ALERT_WINDOWS)))
+        except ValueError:
+            return Response({'error': 'days must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        today = timezone.localdate()
+        limit = today + timedelta(days=days)
+        trucks = self.filter_queryset(self.get_queryset()).filter(expiring_filter(limit)).select_related(
+            'owner', 'assigned_driver'
+        )
+        
+        page = self.paginate_queryset(trucks)
+        rows = page if page is not None else list(trucks)
+        data = self.get_serializer(rows, many=True).data
+        for item, truck in zip(data, rows):
+            item['expiring_documents'] = expiring_documents(truck, limit, today)
+        
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+    
+    @action(detail=True, methods=['get'])
+    def position(self, request, pk=None):
+        # Latest GPS ping of the truck (transport_app/tracking.py)
+        truck = self.get_object()
+        position = TruckPosition.objects.filter(truck=truck).select_related('truck').first()
+        if position is None:
+            return Response({'error': 'No position recorded for this truck.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(TruckPositionSerializer(position).data)
+    
+    @action(detail=False, methods=['get'])
+    def positions(self, request):
+        # Latest positions of all the trucks the user sees, for the fleet map
+        positions = TruckPosition.objects.filter(
+            truck__in=self.filter_queryset(self.get_queryset()).values('pk')
+        ).select_related('truck')
+        return Response(TruckPositionSerializer(positions, many=True).data)
+    
     @action(detail=True, methods=['post'])
     def assign_driver(self, request, pk=None):
         truck = self.get_object()
@@ -83,7 +195,16 @@ class TruckViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Driver not found.'}, status=status.HTTP_404_NOT_FOUND)
 
 
-class TransportationOrderViewSet(viewsets.ModelViewSet):
+# Related rows serialized with an order and each bundle section: (model, serializer, select_related)
+BUNDLE_ORDER_RELATED = ('truck__owner', 'truck__assigned_driver', 'driver', 'owner', 'created_by')
+BUNDLE_SECTIONS = {
+    'expenses': (Expense, ExpenseSerializer, ('added_by',)),
+    'transfers': (MoneyTransfer, MoneyTransferSerializer, ('created_by',)),
+    'timeline': (TimelineEvent, TimelineEventSerializer, ('created_by',)),
+}
+
+
+class TransportationOrderViewSet(SoftDeleteMixin, ArchiveReadMixin, viewsets.ModelViewSet):
     queryset = TransportationOrder.objects.all()
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'owner', 'driver', 'truck']
@@ -104,19 +225,39 @@ class TransportationOrderViewSet(viewsets.ModelViewSet):
             return TransportationOrderCreateSerializer
         return TransportationOrderSerializer
     
-    def get_queryset(self):
-        user = self.request.user
-        
-        if user.role == 'admin': 
-            return TransportationOrder.objects.all()
-        elif user.role == 'owner':
-            return TransportationOrder.objects.filter(owner=user)
-        elif user.role == 'driver':
-            return TransportationOrder.objects.filter(driver=user)
-        
-        return TransportationOrder.objects.none()
+    def get_queryset(self, model=TransportationOrder):
+        queryset = model.objects.for_user(self.request.user)
+        if self.action == 'bundle':
+            queryset = queryset.select_related(*BUNDLE_ORDER_RELATED)
+        return queryset
+    
+    def _check_assignment(self, serializer, status=None):
+        # ``status``: the new status perform_update took out of validated_data
+        data, instance = serializer.validated_data, serializer.instance
+        if status is not None:
+            data = {**data, 'status': status}
+        
+        def value(field):
+            if field in data:
+                return data[field]
+            if instance is None:
+                return TransportationOrder._meta.get_field(field).get_default()
+            return getattr(instance, field)
+        
+        truck = value('truck')
+        changed = instance is None or any(
+            f in data and data[f] != getattr(instance, f)
+            for f in ('truck', 'weight', 'pickup_date', 'estimated_delivery_date', 'status')
+        )
+        if truck is not None and changed and value('status') in scheduling.ACTIVE_STATUSES:
+            scheduling.check_assignment(
+                truck, value('weight'), value('pickup_date'), value('estimated_delivery_date'),
+                exclude_order=instance.pk if instance else None,
+            )
     
+    @transaction.atomic
     def perform_create(self, serializer):
+        self._check_assignment(serializer)
         order = serializer.save()
         
         TimelineEvent.objects.create(
@@ -127,21 +268,32 @@ class TransportationOrderViewSet(viewsets.ModelViewSet):
             created_by=self.request.user
         )
     
+    @transaction.atomic
     def perform_update(self, serializer):
-        old_order = self.get_object()
+        # serializer.instance is the order get_object() loaded; keep its old values before saving
+        old_order = serializer.instance
+        old_status, old_driver_id = old_order.status, old_order.driver_id
+        changing_driver = 'driver' in serializer.validated_data
+        old_driver = old_order.driver.get_full_name() if changing_driver and old_order.driver_id else "None"
+        # A new status is applied by transition_order after the other fields are saved
+        new_status = serializer.validated_data.pop('status', old_status)
+        if new_status != old_status:
+            validate_transition(old_status, new_status)
+        
+        # save() writes the status that was read; if it has changed since, answer 409 rather than revert it
+        current_status = TransportationOrder.objects.select_for_update().filter(
+            pk=old_order.pk,
+        ).values_list('status', flat=True).first()
+        if current_status != old_status:
+            raise StatusConflict({'error': 'The order status was changed by someone else.', 'status': current_status})
+        
+        self._check_assignment(serializer, status=new_status)
         new_order = serializer.save()
         
-        if old_order.status != new_order.status:
-            TimelineEvent.objects.create(
-                title=f"Order Status Changed: {new_order.order_number}",
-                description=f"Status changed from {old_order.get_status_display()} to {new_order.get_status_display()}",
-                event_type='order_status_changed',
-                order=new_order,
-                created_by=self.request.user
-            )
+        if new_status != old_status:
+            transition_order(new_order, new_status, self.request.user, expected_status=old_status)
         
-        if old_order.driver != new_order.driver:
-            old_driver = old_order.driver.get_full_name() if old_order.driver else "None"
+        if changing_driver and old_driver_id != new_order.driver_id:
             new_driver = new_order.driver.get_full_name() if new_order.driver else "None"
             TimelineEvent.objects.create(
                 title=f"Driver Changed for Order: {new_order.order_number}",
@@ -155,43 +307,172 @@ class TransportationOrderViewSet(viewsets.ModelViewSet):
     def timeline(self, request, pk=None):
         order = self.get_object()
         timeline = order.timeline.all()
-        serializer = TimelineEventSerializer(timeline, many=True)
+        serializer = TimelineEventSerializer(timeline, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def expenses(self, request, pk=None):
         order = self.get_object()
         expenses = order.expenses.all()
-        serializer = ExpenseSerializer(expenses, many=True)
+        serializer = ExpenseSerializer(expenses, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def transfers(self, request, pk=None):
         order = self.get_object()
         transfers = order.transfers.all()
-        serializer = MoneyTransferSerializer(transfers, many=True)
+        serializer = MoneyTransferSerializer(transfers, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def bundle(self, request, pk=None):
+        """
+        The order with one page each of its expenses, transfers and timeline, and a
+        financial summary, in a fixed number of queries whatever the order's size.
+        ``?include=expenses,transfers`` limits the sections (e.g. to load a further
+        page with ``expenses_page=2``); ``page_size`` applies to every section.
+        """
+        try:
+            page_size = min(int(request.query_params.get('page_size', settings.REST_FRAMEWORK['PAGE_SIZE'])), 100)
+            pages = {name: int(request.query_params.get(f'{name}_page', 1)) for name in BUNDLE_SECTIONS}
+        except ValueError:
+            return Response({'error': 'page_size and the *_page parameters must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if page_size < 1 or min(pages.values()) < 1:
+            return Response({'error': 'page_size and the *_page parameters must be positive.'}, status=status.HTTP_400_BAD_REQUEST)
+        include = request.query_params.get('include')
+        sections = [name for name in BUNDLE_SECTIONS if include is None or name in include.split(',')]
+        
+        order = self.get_object()
+        archived = isinstance(order, ArchivedOrder)
+        data = {'order': TransportationOrderSerializer(order, context=self.get_serializer_context()).data}
+        
+        expense_model = ARCHIVED_MODELS[Expense] if archived else Expense
+        transfer_model = ARCHIVED_MODELS[MoneyTransfer] if archived else MoneyTransfer
+        expense_totals = expense_model.objects.filter(order=order).aggregate(count=Count('id'), total=Sum('amount'))
+        transfer_totals = transfer_model.objects.filter(order=order).aggregate(
+            count=Count('id'),
+            **{
+                column: Sum('amount', filter=Q(transfer_type=transfer_type, status='completed'))
+                for transfer_type, column in TRANSFER_COLUMNS.items()
+            }
+        )
+        counts = {'expenses': expense_totals.pop('count'), 'transfers': transfer_totals.pop('count')}
+        
+        for name in sections:
+            model, serializer_class, related = BUNDLE_SECTIONS[name]
+            if archived:
+                model = ARCHIVED_MODELS[model]
+            rows = model.objects.filter(order=order)
+            count = counts[name] if name in counts else rows.count()
+            start = (pages[name] - 1) * page_size
+            page = list(rows.select_related(*related)[start:start + page_size])
+            for row in page:
+                row.order = order  # for order_number, without a query per row
+            data[name] = {
+                'count': count,
+                'page': pages[name],
+                'next_page': pages[name] + 1 if start + page_size < count else None,
+                'results': serializer_class(page, many=True, context=self.get_serializer_context()).data,
+            }
+        
+        expense_total = expense_totals['total'] or Decimal(0)
+        transfers = {column: value or Decimal(0) for column, value in transfer_totals.items()}
+        data['summary'] = {
+            'total_amount': order.total_amount,
+            'advance_amount': order.advance_amount,
+            'balance_amount': order.balance_amount,
+            'expense_count': counts['expenses'],
+            'expense_total': expense_total,
+            'transfer_count': counts['transfers'],
+            **transfers,
+            # Completed transfers only, as in reconciliation
+            'driver_float': transfers['sent_to_driver'] - transfers['returned_by_driver'] - expense_total,
+            'net_profit': order.total_amount - expense_total,
+        }
+        return Response(data)
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsDriver])
+    def pings(self, request, pk=None):
+        """
+        GPS pings from the assigned driver's phone, batched (transport_app/tracking.py):
+        ``{"pings": [[epoch_ms, latitude, longitude], ...]}``. Pings already stored or
+        older than the stored track are dropped, so a failed batch can be sent again.
+        """
+        order = self.get_object()
+        if order.driver_id != request.user.pk:
+            return Response({'error': 'Only the assigned driver can send pings.'}, status=status.HTTP_403_FORBIDDEN)
+        pings = request.data.get('pings') if isinstance(request.data, dict) else None
+        try:
+            points = tracking.parse_pings(pings)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        stored = tracking.record(order, request.user, points)
+        return Response({'stored': stored, 'dropped': len(pings) - stored})
+    
+    @action(detail=True, methods=['get'])
+    def track(self, request, pk=None):
+        """
+        The order's GPS path as ``[[epoch_ms, latitude, longitude], ...]``, thinned for a map:
+        dropped points are within ``?tolerance=`` metres of the line (0 keeps every point),
+        raised until at most ``?max_points=`` remain.
+        """
+        order = self.get_object()
+        try:
+            tolerance = float(request.query_params.get('tolerance', settings.TRACK_TOLERANCE_METRES))
+            max_points = int(request.query_params.get('max_points', settings.TRACK_MAX_POINTS))
+        except ValueError:
+            return Response({'error': 'tolerance and max_points must be numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= tolerance < float('inf') or max_points < 2:
+            return Response({'error': 'tolerance must be at least 0 and max_points at least 2.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        points = tracking.path(order, archived=isinstance(order, ArchivedOrder))
+        simplified, tolerance = tracking.simplify(points, tolerance, max_points)
+        return Response({
+            'order': order.pk,
+            'count': len(points),
+            'tolerance': tolerance,
+            'points': [[int(t), round(lat, 6), round(lon, 6)] for t, lat, lon in simplified.tolist()],
+        })
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAdminOrOwner])
+    def suggest_trucks(self, request, pk=None):
+        order = self.get_object()
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 100)
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Only the order owner's trucks can carry it
+        available = scheduling.index.available(
+            order.pickup_date, order.estimated_delivery_date, order.weight,
+            owner_id=order.owner_id, exclude_order=order.pk, limit=limit,
+        )
+        trucks = Truck.objects.in_bulk([truck_id for truck_id, _ in available])
+        data = []
+        for truck_id, capacity in available:
+            if truck_id in trucks:
+                item = TruckSerializer(trucks[truck_id], context={'request': request}).data
+                item['spare_capacity'] = round(capacity - float(order.weight), 2)
+                data.append(item)
+        return Response(data)
+    
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
         order = self.get_object()
         new_status = request.data.get('status')
+        # Clients send the status they saw; a stale view gets 409 instead of overwriting a newer change
+        expected_status = request.data.get('expected_status') or order.status
         
         if new_status not in dict(order.STATUS_CHOICES):
             return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
         
-        old_status = order.status
-        order.status = new_status
-        
-        if new_status == 'delivered' and not order.actual_delivery_date:
-            order.actual_delivery_date = timezone.now()
-        
-        order.save()
+        transition_order(order, new_status, request.user, expected_status=expected_status)
         
-        return Response({'detail': 'Status updated successfully.'})
+        return Response({'detail': 'Status updated successfully.', 'status': order.status})
 
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(ArchiveReadMixin, viewsets.ModelViewSet):
     queryset = Expense.objects.all()
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'order', 'added_by']
@@ -212,17 +493,8 @@ class ExpenseViewSet(viewsets.ModelViewSet):
             return ExpenseCreateSerializer
         return ExpenseSerializer
     
-    def get_queryset(self):
-        user = self.request.user
-        
-        if user.role == 'admin':
-            return Expense.objects.all()
-        elif user.role == 'owner':
-            return Expense.objects.filter(order__owner=user)
-        elif user.role == 'driver': 
-            return Expense.objects.filter(added_by=user)
-        
-        return Expense.objects.none()
+    def get_queryset(self, model=Expense):
+        return model.objects.for_user(self.request.user)
     
     def perform_create(self, serializer):
         expense = serializer.save()
@@ -237,7 +509,7 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         )
 
 
-class MoneyTransferViewSet(viewsets.ModelViewSet):
+class MoneyTransferViewSet(ArchiveReadMixin, viewsets.ModelViewSet):
     queryset = MoneyTransfer.objects.all()
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['transfer_type', 'status', 'order']
@@ -258,22 +530,52 @@ class MoneyTransferViewSet(viewsets.ModelViewSet):
             return MoneyTransferCreateSerializer
         return MoneyTransferSerializer
     
-    def get_queryset(self):
-        user = self.request.user
+    def get_queryset(self, model=MoneyTransfer):
+        # Drivers see the transfers of the orders they drive
+        return model.objects.for_user(self.request.user)
+    
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key', '').strip() or None
+        if key is not None and len(key) > 64:
+            return Response({'error': 'Idempotency-Key must be at most 64 characters'}, status=status.HTTP_400_BAD_REQUEST)
         
-        if user.role == 'admin':
-            return MoneyTransfer.objects.all()
-        elif user.role == 'owner':
-            return MoneyTransfer.objects.filter(order__owner=user)
-        elif user.role == 'driver':
-            return MoneyTransfer.objects.filter(
-                Q(order__driver=user) | Q(transfer_type__in=['to_driver', 'from_driver'])
-            )
+        # A retried request gets the transfer its first attempt created
+        if key is not None and (existing := MoneyTransfer.objects.filter(idempotency_key=key).first()):
+            return self._replay(existing)
         
-        return MoneyTransfer.objects.none()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            self.perform_create(serializer, idempotency_key=key)
+        except IntegrityError:
+            # A concurrent request with the same key or transaction ID committed first; any other
+            # constraint is a bug, not a conflict. _base_manager: rows of deleted orders count too.
+            if key is not None and (existing := MoneyTransfer.objects.filter(idempotency_key=key).first()):
+                return self._replay(existing)
+            if key is not None and MoneyTransfer._base_manager.filter(idempotency_key=key).exists():
+                return Response({'error': 'This Idempotency-Key was already used'}, status=status.HTTP_409_CONFLICT)
+            transaction_id = serializer.validated_data.get('transaction_id')
+            if transaction_id and MoneyTransfer._base_manager.filter(transaction_id=transaction_id).exists():
+                return Response({'error': 'A transfer with this transaction ID already exists'}, status=status.HTTP_409_CONFLICT)
+            raise
+        
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
     
-    def perform_create(self, serializer):
-        transfer = serializer.save()
+    def _replay(self, transfer):
+        if transfer.created_by_id != self.request.user.id:
+            return Response({'error': 'Idempotency-Key was already used by another user'}, status=status.HTTP_409_CONFLICT)
+        response = Response(self.get_serializer(transfer).data, status=status.HTTP_201_CREATED)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+    
+    @transaction.atomic
+    def perform_create(self, serializer, idempotency_key=None):
+        # Transfers of one order are written one at a time, so balances derived
+        # from them (ledger checkpoints, reconciliation) never see a half-applied pair.
+        list(TransportationOrder.objects.select_for_update().filter(pk=serializer.validated_data['order'].pk).values_list('pk'))
+        
+        transfer = serializer.save(status='completed', idempotency_key=idempotency_key)
         
         TimelineEvent.objects.create(
             title=f"Money Transfer: {transfer.get_transfer_type_display()}",
@@ -283,29 +585,297 @@ class MoneyTransferViewSet(viewsets.ModelViewSet):
             related_transfer=transfer,
             created_by=self.request.user
         )
-        
-        transfer.status = 'completed'
-        transfer.save()
 
 
-class TimelineEventViewSet(viewsets.ReadOnlyModelViewSet):
+class TimelineEventViewSet(ArchiveReadMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = TimelineEventSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['event_type', 'order', 'created_by']
     ordering_fields = ['created_at']
     
+    def get_queryset(self, model=TimelineEvent):
+        return model.objects.for_user(self.request.user)
+
+
+class ReconciliationViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = ReconciliationResultSerializer
+    permission_classes = [IsAdmin]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['has_issues', 'overspend', 'unreturned_float', 'balance_drift', 'order__owner', 'order__status']
+    search_fields = ['order__order_number']
+    ordering_fields = ['checked_at', 'driver_float']
+    
+    def get_queryset(self):
+        return ReconciliationResult.objects.select_related('order')
+    
+    @action(detail=False, methods=['post'])
+    def run(self, request):
+        # Queued for reconcile_orders; the run's progress shows under runs/
+        full = str(request.data.get('full', '')).lower() in ('1', 'true', 'yes')
+        try:
+            run = request_run(full=full, user=request.user)
+        except IntegrityError:
+            return Response({'error': 'A reconciliation run is already queued'}, status=status.HTTP_409_CONFLICT)
+        return Response(ReconciliationRunSerializer(run).data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'])
+    def runs(self, request):
+        runs = ReconciliationRun.objects.all()[:20]
+        return Response(ReconciliationRunSerializer(runs, many=True).data)
+
+
+class PurgeJobViewSet(viewsets.ReadOnlyModelViewSet):
+    # Progress of the batched deletes started by DELETE on trucks, orders and users
+    queryset = PurgeJob.objects.all()
+    serializer_class = PurgeJobSerializer
+    permission_classes = [IsAdmin]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['status', 'model_label']
+    ordering_fields = ['created_at', 'finished_at']
+
+
+class WebhookSubscriptionViewSet(viewsets.ModelViewSet):
+    # Outbound webhooks (transport_app/webhooks.py), sent by the deliver_webhooks worker
+    serializer_class = WebhookSubscriptionSerializer
+    permission_classes = [IsAdminOrOwner]
+    
+    def get_queryset(self):
+        return WebhookSubscription.objects.for_user(self.request.user)
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user, secret=webhooks.new_secret())
+    
+    @action(detail=True, methods=['post'])
+    def rotate_secret(self, request, pk=None):
+        subscription = self.get_object()
+        subscription.secret = webhooks.new_secret()
+        subscription.save(update_fields=['secret', 'updated_at'])
+        return Response(self.get_serializer(subscription).data)
+    
+    @action(detail=True, methods=['get'])
+    def deliveries(self, request, pk=None):
+        subscription = self.get_object()
+        deliveries = subscription.deliveries.all()
+        if request.query_params.get('status'):
+            deliveries = deliveries.filter(status=request.query_params['status'])
+        page = self.paginate_queryset(deliveries)
+        if page is not None:
+            return self.get_paginated_response(WebhookDeliverySerializer(page, many=True).data)
+        return Response(WebhookDeliverySerializer(deliveries, many=True).data)
+    
+    @action(detail=True, methods=['post'])
+    def retry(self, request, pk=None):
+        # Failed events are queued again, ahead of newer ones, and the endpoint is tried at once
+        subscription = self.get_object()
+        requeued = subscription.deliveries.filter(status='failed').update(status='pending', attempts=0)
+        WebhookSubscription.objects.filter(pk=subscription.pk).update(failures=0, next_attempt_at=None)
+        return Response({'detail': f'{requeued} events queued again.', 'requeued': requeued})
+
+
+class DocumentViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Order invoices and monthly trip statements as PDFs (transport_app/documents.py).
+    POST ``invoice`` or ``statement`` to get one; until the render_documents worker
+    has rendered it from the current rows the answer is 202, then ``file`` links the PDF.
+    """
+    serializer_class = DocumentSerializer
+    permission_classes = [IsAdminOrOwner]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['kind', 'status', 'order', 'archived_order', 'period']
+    
     def get_queryset(self):
+        return Document.objects.for_user(self.request.user).select_related('order', 'archived_order')
+    
+    def _respond(self, document):
+        code = status.HTTP_200_OK if document.status == 'ready' else status.HTTP_202_ACCEPTED
+        return Response(self.get_serializer(document).data, status=code)
+    
+    @action(detail=False, methods=['post'])
+    def invoice(self, request):
+        try:
+            order = get_object_or_404(TransportationOrder.objects.for_user(request.user), pk=request.data.get('order'))
+        except Http404:
+            order = get_object_or_404(ArchivedOrder.objects.for_user(request.user), pk=request.data.get('order'))
+        return self._respond(documents.request_invoice(order))
+    
+    @action(detail=False, methods=['post'])
+    def statement(self, request):
+        try:
+            period = documents.parse_month(str(request.data.get('period', '')))
+        except ValueError:
+            return Response({'error': 'period must be a month, YYYY-MM.'}, status=status.HTTP_400_BAD_REQUEST)
+        owner = request.user
+        if owner.role == 'admin':
+            owner = get_object_or_404(User.objects.filter(role='owner'), pk=request.data.get('owner'))
+        return self._respond(documents.request_statement(owner, period))
+
+
+class DocumentRunViewSet(viewsets.ReadOnlyModelViewSet):
+    # Progress of month-end runs (render_documents --month)
+    queryset = DocumentRun.objects.all()
+    serializer_class = DocumentRunSerializer
+    permission_classes = [IsAdmin]
+
+
+# Serializer and related rows of each synced model in the change feed
+FEED_SERIALIZERS = {
+    'trucks': (TruckSerializer, ('owner', 'assigned_driver')),
+    'orders': (TransportationOrderSerializer, BUNDLE_ORDER_RELATED),
+    'expenses': (ExpenseSerializer, ('added_by', 'order')),
+    'transfers': (MoneyTransferSerializer, ('created_by', 'order')),
+    'timeline': (TimelineEventSerializer, ('created_by', 'order')),
+}
+
+
+class ChangeFeedViewSet(viewsets.GenericViewSet):
+    """
+    Delta sync for the apps (transport_app/changes.py). Without ``since`` the
+    response only holds the current cursor: take it, download the lists, then
+    call ``?since=<cursor>`` with the cursor of each response while ``has_more``.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def list(self, request):
+        since = request.query_params.get('since')
+        if since is None:
+            return Response({'cursor': changes.head(), 'has_more': False, 'changes': []})
+        if not since.isdigit():
+            return Response({'error': 'since must be a non-negative integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        page = changes.feed(
+            request.user, int(since), related={name: related for name, (_, related) in FEED_SERIALIZERS.items()}
+        )
+        if page is None:
+            return Response({'error': 'Cursor expired; download the lists again.'}, status=status.HTTP_410_GONE)
+        
+        context = self.get_serializer_context()
+        results = []
+        for entry, row in page['changes']:
+            serializer_class = FEED_SERIALIZERS[entry.model][0]
+            results.append({
+                'seq': entry.pk,
+                'type': entry.model,
+                'id': entry.object_id,
+                'action': 'upsert' if row is not None else 'delete',
+                'data': serializer_class(row, context=context).data if row is not None else None,
+            })
+        return Response({'cursor': page['cursor'], 'has_more': page['has_more'], 'changes': results})
+
+
+ACTIVITY_SERIALIZERS = {
+    'event': TimelineEventSerializer,
+    'expense': ExpenseSerializer,
+    'transfer': MoneyTransferSerializer,
+}
+
+
+class ActivityViewSet(viewsets.GenericViewSet):
+    """
+    Timeline events, expenses and transfers interleaved newest first
+    (transport_app/activity.py), for ``?order=``, ``?driver=`` or ``?owner=``;
+    without any, the caller's own. Pass ``next_cursor`` back as ``?cursor=``
+    for older rows.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def _streams(self, request):
+        user = request.user
+        params = request.query_params
+        if 'order' in params:
+            order_id = params['order']
+            if not order_id.isdigit():
+                return None
+            order = TransportationOrder.objects.for_user(user).filter(pk=order_id).first()
+            if order is not None:
+                return activity.order_streams(order)
+            order = ArchivedOrder.objects.for_user(user).filter(pk=order_id).first()
+            return activity.order_streams(order, archived=True) if order is not None else None
+        
+        role = 'driver' if 'driver' in params else 'owner' if 'owner' in params else user.role
+        subject_id = params.get(role, str(user.pk))
+        if role not in ('owner', 'driver') or not subject_id.isdigit():
+            return None
+        subject = User.objects.filter(pk=subject_id, role=role).first()
+        if subject is None or (user.role != 'admin' and subject != user and not (
+            # An owner sees the activity of their drivers on their own orders
+            user.role == 'owner' and role == 'driver'
+            and TransportationOrder.objects.filter(owner=user, driver=subject).exists()
+        )):
+            return None
+        filters = {'owner': user} if user.role == 'owner' and subject != user else {}
+        return activity.user_streams(role, subject.pk, **filters)
+    
+    def list(self, request):
+        try:
+            limit = min(int(request.query_params.get('page_size', activity.PAGE_SIZE)), 200)
+        except ValueError:
+            return Response({'error': 'page_size must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'page_size must be positive.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if request.user.role == 'admin' and not {'order', 'owner', 'driver'} & request.query_params.keys():
+            return Response({'error': 'Pass order, owner or driver.'}, status=status.HTTP_400_BAD_REQUEST)
+        streams = self._streams(request)
+        if streams is None:
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            page = activity.page(streams, request.query_params.get('cursor'), limit)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        context = self.get_serializer_context()
+        return Response({
+            'next_cursor': page['next_cursor'],
+            'results': [
+                {'type': kind, 'data': ACTIVITY_SERIALIZERS[kind](row, context=context).data}
+                for kind, row in page['results']
+            ],
+        })
+
+
+class DriverLedgerViewSet(viewsets.GenericViewSet):
+    permission_classes = [IsAuthenticated]
+    
+    def _get_driver(self, pk):
         user = self.request.user
-        
-        if user.role == 'admin':
-            return TimelineEvent.objects.all()
+        drivers = User.objects.filter(role='driver')
+        if user.role == 'driver':
+            drivers = drivers.filter(pk=user.pk)
         elif user.role == 'owner':
-            return TimelineEvent.objects.filter(order__owner=user)
-        elif user.role == 'driver':
-            return TimelineEvent.objects.filter(order__driver=user)
-        
-        return TimelineEvent.objects.none()
+            drivers = drivers.filter(pk__in=TransportationOrder.objects.filter(owner=user).values('driver_id'))
+        elif user.role != 'admin':
+            drivers = drivers.none()
+        return drivers.filter(pk=pk).first()
+    
+    def _owner_id(self):
+        # An owner sees the part of the ledger from their own orders, not the driver's work for others
+        return self.request.user.pk if self.request.user.role == 'owner' else None
+    
+    def retrieve(self, request, pk=None):
+        driver = self._get_driver(pk)
+        if driver is None:
+            return Response({'error': 'Driver not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'driver': UserSerializer(driver).data,
+            **ledger.balance(driver.pk, owner_id=self._owner_id()),
+        })
+    
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        driver = self._get_driver(pk)
+        if driver is None:
+            return Response({'error': 'Driver not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        cursor = request.query_params.get('cursor')
+        if cursor is not None and not cursor.isdigit():
+            return Response({'error': 'cursor must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        page = ledger.statement(driver.pk, cursor=int(cursor) if cursor else None, owner_id=self._owner_id())
+        if page is None:
+            return Response({'error': 'Unknown or expired cursor'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(page)
 
 
 class DashboardViewSet(viewsets.GenericViewSet):
@@ -313,65 +883,15 @@ class DashboardViewSet(viewsets.GenericViewSet):
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        user = request.user
-        now = timezone.now()
-        
-        # Base queryset based on user role
-        if user.role == 'admin':
-            orders_qs = TransportationOrder.objects.all()
-            expenses_qs = Expense.objects.all()
-        elif user.role == 'owner':
-            orders_qs = TransportationOrder.objects.filter(owner=user)
-            expenses_qs = Expense.objects.filter(order__owner=user)
-        elif user.role == 'driver':
-            orders_qs = TransportationOrder.objects.filter(driver=user)
-            expenses_qs = Expense.objects.filter(added_by=user)
-        else:
-            orders_qs = TransportationOrder.objects.none()
-            expenses_qs = Expense.objects.none()
-        
-        # Calculate stats
-        total_orders = orders_qs.count()
-        active_orders = orders_qs.filter(status__in=['pending', 'assigned', 'in_transit']).count()
-        total_revenue = orders_qs.aggregate(total=Sum('total_amount'))['total'] or 0
-        pending_amount = orders_qs.aggregate(total=Sum('balance_amount'))['total'] or 0
-        total_expenses = expenses_qs.aggregate(total=Sum('amount'))['total'] or 0
-        total_profit = total_revenue - total_expenses
-        
-        # Get recent data - use serializers directly
-        from .serializers import TransportationOrderSerializer, ExpenseSerializer
-        
-        recent_orders = orders_qs.order_by('-created_at')[:5]
-        upcoming_deliveries = orders_qs.filter(
-            estimated_delivery_date__gt=now,
-            status__in=['pending', 'assigned', 'in_transit']
-        ).order_by('estimated_delivery_date')[:5]
-        recent_expenses = expenses_qs.order_by('-date')[:5]
-        
-        # Serialize the data
-        order_serializer = TransportationOrderSerializer(recent_orders, many=True)
-        upcoming_serializer = TransportationOrderSerializer(upcoming_deliveries, many=True)
-        expense_serializer = ExpenseSerializer(recent_expenses, many=True)
-        
-        data = {
-            'total_orders': total_orders,
-            'active_orders': active_orders,
-            'total_revenue': total_revenue,
-            'pending_amount': pending_amount,
-            'total_expenses': total_expenses,
-            'total_profit': total_profit,
-            'recent_orders': order_serializer.data,
-            'upcoming_deliveries': upcoming_serializer.data,
-            'recent_expenses': expense_serializer.data,
-        }
-        
-        return Response(data)
+        results = dashboard.run(dashboard.stats_queries(request, timezone.now()))
+        return Response(dashboard.stats_data(results))
     
     @action(detail=False, methods=['get'], permission_classes=[IsAdminOrOwner])
     def owner_dashboard(self, request):
         user = request.user
         owner_id = request.query_params.get('owner_id', user.id)
-        now = timezone.now()
+        if not str(owner_id).isdigit():
+            return Response({'error': 'owner_id must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
         
         if user.role == 'owner' and str(owner_id) != str(user.id):
             return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
@@ -381,24 +901,112 @@ class DashboardViewSet(viewsets.GenericViewSet):
         except User.DoesNotExist:
             return Response({'error': 'Owner not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        trucks = Truck.objects.filter(owner=owner)
-        orders = TransportationOrder.objects.filter(owner=owner)
-        orders_by_status = orders.values('status').annotate(count=Count('id'))
-        
-        revenue_by_month = orders.filter(
-            created_at__gte=now - timedelta(days=365)
-        ).extra(
-            {'month': "date_trunc('month', created_at)"}
-        ).values('month').annotate(total=Sum('total_amount')).order_by('month')
-        
-        data = {
-            'owner': UserSerializer(owner).data,
-            'truck_count': trucks.count(),
-            'active_trucks': trucks.filter(status='available').count(),
-            'orders_summary': list(orders_by_status),
-            'total_orders': orders.count(),
-            'total_revenue': orders.aggregate(total=Sum('total_amount'))['total'] or 0,
-            'revenue_by_month': list(revenue_by_month),
-        }
+        return Response(dashboard.run(dashboard.owner_queries(owner, timezone.now())))
+    
+    def _fleet_analytics(self, request, group_by):
+        try:
+            start, end = parse_period(request.query_params.get('start'), request.query_params.get('end'))
+        except ValueError as e:
+            return Response({'error': f'Invalid date range: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        owner_id = request.query_params.get('owner_id') if request.user.role == 'admin' else None
+        if owner_id and not owner_id.isdigit():
+            return Response({'error': 'owner_id must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(fleet_metrics(request.user, group_by, start, end, owner_id=owner_id))
+    
+    @action(detail=False, methods=['get'])
+    def truck_analytics(self, request):
+        return self._fleet_analytics(request, 'truck')
+    
+    @action(detail=False, methods=['get'])
+    def driver_analytics(self, request):
+        return self._fleet_analytics(request, 'driver')
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminOrOwner])
+    def lanes(self, request):
+        user = request.user
+        stats = LaneStat.objects.filter(order_count__gt=0)
+        if user.role == 'owner':
+            stats = stats.filter(owner=user)
+        elif request.query_params.get('owner_id'):
+            if not request.query_params['owner_id'].isdigit():
+                return Response({'error': 'owner_id must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+            stats = stats.filter(owner_id=request.query_params['owner_id'])
+        
+        for param, field in (('pickup', 'pickup_place_id'), ('delivery', 'delivery_place_id')):
+            if request.query_params.get(param):
+                stats = stats.filter(**{field: find_place(request.query_params[param])})
         
-        return Response(data)
\ No newline at end of file
+        try:
+            limit = min(int(request.query_params.get('limit', 50)), 500)
+        except ValueError:
+            return Response({'error': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Sum across owners so admins see one row per lane
+        rows = stats.values(
+            'pickup_place_id', 'pickup_place__name', 'delivery_place_id', 'delivery_place__name'
+        ).annotate(
+            order_count=Sum('order_count'),
+            revenue=Sum('revenue'),
+            expense_total=Sum('expense_total'),
+            delivered_count=Sum('delivered_count'),
+            transit_seconds=Sum('transit_seconds'),
+        ).order_by('-order_count')[:limit]
+        
+        return Response(lane_rows(rows))
+
+
+# Async versions of the dashboard actions for ASGI deployments (sms_transports/asgi.py):
+# their independent queries run at the same time (transport_app/dashboard.py) instead of
+# one after another. DRF views are sync only, so these are plain Django views that
+# authenticate and render like the viewsets.
+def _json(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+async def _authenticate(request, roles=None):
+    """(user, None), or (None, the error response the viewsets would give)."""
+    def authenticate():
+        drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+        try:
+            user = drf_request.user
+            if not user.is_authenticated:
+                raise NotAuthenticated()
+            if roles is not None and user.role not in roles:
+                raise PermissionDenied()
+        except APIException as exc:
+            response = _json(exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}, exc.status_code)
+            if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+                response['WWW-Authenticate'] = drf_request.authenticators[0].authenticate_header(drf_request)
+            return None, response
+        # As DRF does, so the request metrics know the user
+        request.user = user
+        return user, None
+    return await sync_to_async(authenticate)()
+
+
+@require_GET
+async def dashboard_stats_async(request):
+    user, error = await _authenticate(request)
+    if error is not None:
+        return error
+    results = await dashboard.arun(dashboard.stats_queries(request, timezone.now()))
+    return _json(dashboard.stats_data(results))
+
+
+@require_GET
+async def owner_dashboard_async(request):
+    user, error = await _authenticate(request, roles=('admin', 'owner'))
+    if error is not None:
+        return error
+    owner_id = request.GET.get('owner_id', user.id)
+    if not str(owner_id).isdigit():
+        return _json({'error': 'owner_id must be an integer.'}, status.HTTP_400_BAD_REQUEST)
+    if user.role == 'owner' and str(owner_id) != str(user.id):
+        return _json({'error': 'Unauthorized'}, status.HTTP_403_FORBIDDEN)
+    
+    owner = await User.objects.filter(id=owner_id, role='owner').afirst()
+    if owner is None:
+        return _json({'error': 'Owner not found'}, status.HTTP_404_NOT_FOUND)
+    
+    return _json(await dashboard.arun(dashboard.owner_queries(owner, timezone.now())))
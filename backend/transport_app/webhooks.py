@@ -0,0 +1,253 @@
+# transport_app/webhooks.py
+import hashlib
+import hmac
+import http.client
+import ipaddress
+import json
+import random
+import secrets
+import socket
+import ssl
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import WebhookSubscription, WebhookDelivery
+
+
+def new_secret():
+    return secrets.token_hex(32)
+
+
+def sign(secret, timestamp, body):
+    """X-Webhook-Signature of a POST: HMAC-SHA256 of "<X-Webhook-Timestamp>.<body>" with the subscription's secret."""
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f'sha256={digest}'
+
+
+def queue(event_type, owner_id, data):
+    """
+    Queue an event for the active subscriptions of ``owner_id`` and of admins.
+    It is written in the caller's transaction, so it is only sent if the change is committed.
+    """
+    subscriptions = WebhookSubscription.objects.filter(
+        Q(user_id=owner_id) | Q(user__role='admin'), is_active=True, user__is_active=True,
+    ).values_list('pk', 'event_types')
+    payload = {'id': uuid.uuid4().hex, 'type': event_type, 'created_at': timezone.now(), 'data': data}
+    WebhookDelivery.objects.bulk_create([
+        WebhookDelivery(subscription_id=pk, event_type=event_type, payload=payload)
+        for pk, event_types in subscriptions
+        if not event_types or event_type in event_types
+    ])
+
+
+def order_status_changed(order, old_status):
+    queue('order.status_changed', order.owner_id, {
+        'order': order.pk,
+        'order_number': order.order_number,
+        'status': order.status,
+        'previous_status': old_status,
+        'driver': order.driver_id,
+        'total_amount': order.total_amount,
+        'balance_amount': order.balance_amount,
+    })
+
+
+def transfer_completed(transfer):
+    queue('transfer.completed', transfer.owner_id, {
+        'transfer': transfer.pk,
+        'order': transfer.order_id,
+        'order_number': transfer.order.order_number,
+        'transfer_type': transfer.transfer_type,
+        'amount': transfer.amount,
+        'transaction_id': transfer.transaction_id,
+        'created_at': transfer.created_at,
+    })
+
+
+def expense_added(expense):
+    queue('expense.added', expense.owner_id, {
+        'expense': expense.pk,
+        'order': expense.order_id,
+        'order_number': expense.order.order_number,
+        'category': expense.category,
+        'amount': expense.amount,
+        'date': expense.date,
+        'description': expense.description,
+        'added_by': expense.added_by_id,
+    })
+
+
+class DeliveryError(Exception):
+    """A failed POST, described in words that can be shown to the subscription's owner."""
+
+
+def _public_address(host, port):
+    """
+    (address, port) to connect to for ``host``, if every address it resolves to is
+    public. Subscription URLs come from users, so loopback, private, link-local
+    (cloud metadata) and other special addresses are refused.
+    """
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise DeliveryError('Could not resolve the host.')
+    for *_, sockaddr in infos:
+        address = ipaddress.ip_address(sockaddr[0].split('%')[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not settings.WEBHOOK_ALLOW_PRIVATE_ADDRESSES and (not address.is_global or address.is_multicast):
+            raise DeliveryError('The host does not resolve to a public address.')
+    return infos[0][4][:2]
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    # Connects to the address that was checked, so a second DNS answer cannot point elsewhere
+    def connect(self):
+        self.sock = socket.create_connection(_public_address(self.host, self.port), self.timeout)
+
+
+class _PublicHTTPSConnection(_PublicHTTPConnection):
+    default_port = http.client.HTTPS_PORT
+    tls = ssl.create_default_context()
+
+    def connect(self):
+        super().connect()
+        self.sock = self.tls.wrap_socket(self.sock, server_hostname=self.host)
+
+
+CONNECTIONS = {'http': _PublicHTTPConnection, 'https': _PublicHTTPSConnection}
+
+
+def _post(subscription, deliveries, timeout):
+    url = urllib.parse.urlsplit(subscription.url)
+    try:
+        if not url.hostname:
+            raise ValueError
+        # http.client takes IPv6 literals in brackets, as in the URL
+        host = f'[{url.hostname}]' if ':' in url.hostname else url.hostname
+        connection = CONNECTIONS[url.scheme](host, url.port, timeout=timeout)
+    except (KeyError, ValueError, http.client.InvalidURL):
+        raise DeliveryError('The URL must be an http or https URL.')
+    target = url.path or '/'
+    if url.query:
+        target += f'?{url.query}'
+    body = json.dumps({'events': [delivery.payload for delivery in deliveries]}, cls=DjangoJSONEncoder).encode()
+    timestamp = str(int(time.time()))
+    try:
+        connection.request('POST', target, body=body, headers={
+            'Content-Type': 'application/json',
+            'X-Webhook-Timestamp': timestamp,
+            'X-Webhook-Signature': sign(subscription.secret, timestamp, body),
+        })
+        response = connection.getresponse()
+        response.read()
+    finally:
+        connection.close()
+    # Redirects are not followed: they could lead to an address that was never checked
+    if not 200 <= response.status < 300:
+        raise DeliveryError(f'The endpoint answered HTTP {response.status}.')
+
+
+def _describe(error):
+    """What the owner sees of a failed POST; raw exceptions may tell about the network the worker is on."""
+    if isinstance(error, DeliveryError):
+        return str(error)
+    if isinstance(error, TimeoutError):
+        return 'The endpoint did not answer in time.'
+    if isinstance(error, ssl.SSLError):
+        return 'The TLS connection failed.'
+    if isinstance(error, (OSError, http.client.HTTPException)):
+        return 'Could not connect to the endpoint.'
+    return 'The delivery failed.'
+
+
+def retry_delay(failures):
+    seconds = min(settings.WEBHOOK_RETRY_SECONDS * 2 ** (failures - 1), settings.WEBHOOK_RETRY_MAX_SECONDS)
+    # Jittered, so endpoints that failed together do not all retry together
+    return timedelta(seconds=seconds * random.uniform(0.75, 1))
+
+
+def deliver(subscription_id, batch_size=None, timeout=None):
+    """
+    POST the oldest pending events of one subscription, up to ``batch_size`` in one
+    request. Returns (events delivered, error); (0, None) if another worker holds the
+    subscription, it is waiting to retry or nothing is pending.
+    """
+    batch_size = batch_size or settings.WEBHOOK_BATCH_SIZE
+    timeout = timeout or settings.WEBHOOK_TIMEOUT
+    now = timezone.now()
+    claimed = WebhookSubscription.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+        pk=subscription_id, is_active=True,
+    ).update(locked_until=now + timedelta(seconds=timeout * 3))
+    if not claimed:
+        return 0, None
+
+    subscription = WebhookSubscription.objects.get(pk=subscription_id)
+    try:
+        batch = list(subscription.deliveries.filter(status='pending').order_by('pk')[:batch_size])
+        if not batch:
+            return 0, None
+        sent = WebhookDelivery.objects.filter(pk__in=[delivery.pk for delivery in batch])
+        try:
+            _post(subscription, batch, timeout)
+        except Exception as e:
+            error = _describe(e)
+            failures = subscription.failures + 1
+            sent.update(attempts=F('attempts') + 1, last_error=error)
+            if failures >= settings.WEBHOOK_MAX_ATTEMPTS:
+                # Give up on this batch; the endpoint's later events are still sent, in order
+                sent.update(status='failed')
+                failures, next_attempt_at = 0, None
+            else:
+                next_attempt_at = timezone.now() + retry_delay(failures)
+            WebhookSubscription.objects.filter(pk=subscription_id).update(
+                failures=failures, next_attempt_at=next_attempt_at, last_error=error,
+            )
+            return 0, error
+
+        sent.update(status='delivered', attempts=F('attempts') + 1, delivered_at=timezone.now(), last_error='')
+        WebhookSubscription.objects.filter(pk=subscription_id).update(failures=0, next_attempt_at=None, last_error='')
+        return len(batch), None
+    finally:
+        WebhookSubscription.objects.filter(pk=subscription_id).update(locked_until=None)
+
+
+def due_subscriptions():
+    now = timezone.now()
+    return WebhookSubscription.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+        Exists(WebhookDelivery.objects.filter(subscription=OuterRef('pk'), status='pending')),
+        is_active=True,
+    ).order_by('pk').values_list('pk', flat=True)
+
+
+def _deliver_in_thread(subscription_id, batch_size, timeout):
+    try:
+        return subscription_id, *deliver(subscription_id, batch_size, timeout)
+    finally:
+        # Connections are per thread; the pool's threads do not outlive the pass
+        connections.close_all()
+
+
+def deliver_due(concurrency=None, batch_size=None, timeout=None):
+    """
+    One batch for every subscription with events due, ``concurrency`` endpoints at a
+    time. Returns (subscription id, events delivered, error) per subscription.
+    """
+    subscription_ids = list(due_subscriptions())
+    if not subscription_ids:
+        return []
+    with ThreadPoolExecutor(max_workers=concurrency or settings.WEBHOOK_CONCURRENCY) as pool:
+        return list(pool.map(lambda pk: _deliver_in_thread(pk, batch_size, timeout), subscription_ids))
@@ -0,0 +1,78 @@
+# transport_app/workflow.py
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from .models import TransportationOrder, TimelineEvent
+
+# Sent after a transition is written with a queryset update, which bypasses
+# post_save; receivers in signals.py keep derived state in sync.
+# Arguments: instance (already updated in memory), old_status.
+order_status_changed = Signal()
+
+STATUS_EVENT_TYPES = {
+    'in_transit': ('trip_started', 'Trip Started'),
+    'delivered': ('trip_completed', 'Trip Completed'),
+}
+
+
+class StatusConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The order status was changed by someone else.'
+    default_code = 'status_conflict'
+
+
+def validate_transition(old_status, new_status):
+    if new_status not in dict(TransportationOrder.STATUS_CHOICES):
+        raise serializers.ValidationError({'status': 'Invalid status'})
+    if new_status not in TransportationOrder.STATUS_TRANSITIONS.get(old_status, ()):
+        old_label = dict(TransportationOrder.STATUS_CHOICES).get(old_status, old_status)
+        new_label = dict(TransportationOrder.STATUS_CHOICES)[new_status]
+        raise serializers.ValidationError({'status': f"Cannot change status from {old_label} to {new_label}."})
+
+
+def transition_order(order, new_status, user, expected_status=None):
+    """
+    Move ``order`` to ``new_status`` if it is still in ``expected_status``.
+
+    The change is one ``UPDATE ... WHERE status = expected``; if another request
+    changed the status first, no row matches and StatusConflict is raised instead
+    of overwriting it. The timeline event is written in the same transaction.
+    """
+    expected_status = expected_status or order.status
+    validate_transition(expected_status, new_status)
+
+    now = timezone.now()
+    changes = {'status': new_status, 'updated_at': now}
+    if new_status == 'delivered':
+        changes['actual_delivery_date'] = Coalesce('actual_delivery_date', now)
+
+    with transaction.atomic():
+        updated = TransportationOrder.objects.filter(pk=order.pk, status=expected_status).update(**changes)
+        if not updated:
+            current = TransportationOrder.objects.filter(pk=order.pk).values_list('status', flat=True).first()
+            raise StatusConflict({
+                'error': f"Order status is {dict(TransportationOrder.STATUS_CHOICES).get(current, current)}, "
+                         f"not {dict(TransportationOrder.STATUS_CHOICES).get(expected_status, expected_status)}.",
+                'status': current,
+            })
+
+        order.status = new_status
+        order.updated_at = now
+        if new_status == 'delivered' and order.actual_delivery_date is None:
+            order.actual_delivery_date = now
+
+        event_type, title = STATUS_EVENT_TYPES.get(new_status, ('order_status_changed', 'Order Status Changed'))
+        old_label = dict(TransportationOrder.STATUS_CHOICES).get(expected_status, expected_status)
+        TimelineEvent.objects.create(
+            title=f"{title}: {order.order_number}",
+            description=f"Status changed from {old_label} to {order.get_status_display()}",
+            event_type=event_type,
+            order=order,
+            created_by=user,
+        )
+        order_status_changed.send(sender=TransportationOrder, instance=order, old_status=expected_status)
+    return order
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='license_expiry',
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+    ]
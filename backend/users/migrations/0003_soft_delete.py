@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_license_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
@@ -24,6 +24,22 @@ class UserManager(BaseUserManager):
         
         return self.create_user(email, password, **extra_fields)
 
+class UserQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Users ``user`` may see: everyone for admins, owners and drivers for owners, themselves for drivers."""
+        if user.role == 'admin':
+            return self
+        elif user.role == 'owner':
+            return self.filter(role__in=['driver', 'owner'])
+        elif user.role == 'driver':
+            return self.filter(pk=user.pk)
+        return self.none()
+
+class ActiveUserManager(UserManager.from_queryset(UserQuerySet)):
+    # Soft-deleted users (transport_app/purge.py) are hidden until purged; use User.all_objects to see them
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 class User(AbstractBaseUser, PermissionsMixin):
     ROLE_CHOICES = (
         ('admin', 'Admin'),
@@ -47,9 +63,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     address = models.TextField(blank=True)
     driving_license = models.CharField(max_length=50, blank=True)
-    license_expiry = models.DateField(null=True, blank=True)
+    license_expiry = models.DateField(null=True, blank=True, db_index=True)
+    
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
     
-    objects = UserManager()
+    objects = ActiveUserManager()
+    all_objects = UserManager()
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -1,7 +1,22 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from django.contrib.auth import authenticate
 from .models import User
 
+def unique_with_deleted(model, *field_names):
+    """
+    extra_kwargs checking uniqueness against soft-deleted rows too: they keep their
+    values until purged (transport_app/purge.py), but the default manager, which
+    ModelSerializer's validators use, hides them.
+    """
+    return {
+        name: {'validators': [UniqueValidator(
+            queryset=model.all_objects.all(),
+            message=f"{model._meta.verbose_name} with this {model._meta.get_field(name).verbose_name} already exists.",
+        )]}
+        for name in field_names
+    }
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -9,6 +24,7 @@ class UserSerializer(serializers.ModelSerializer):
                   'phone', 'role', 'address', 'driving_license', 
                   'license_expiry', 'is_active', 'date_joined')
         read_only_fields = ('id', 'date_joined', 'is_active')
+        extra_kwargs = unique_with_deleted(User, 'email', 'username')
 
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
@@ -18,6 +34,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
         fields = ('email', 'username', 'first_name', 'last_name', 
                   'phone', 'role', 'password', 'address', 
                   'driving_license', 'license_expiry')
+        extra_kwargs = unique_with_deleted(User, 'email', 'username')
     
     def create(self, validated_data):
         user = User.objects.create_user(
@@ -0,0 +1,27 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from transport_app.purge import soft_delete
+from .models import User
+
+
+class SoftDeletedUserTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', password='secret', username='admin', first_name='Admin', last_name='Test',
+            role='admin',
+        )
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.admin)
+
+    def test_email_and_username_of_soft_deleted_user_are_still_taken(self):
+        driver = User.objects.create_user(
+            email='driver@example.com', password='secret', username='driver', first_name='Driver', last_name='Test',
+        )
+        soft_delete(driver, self.admin)
+        response = self.client.post('/api/auth/', {
+            'email': driver.email, 'username': driver.username, 'first_name': 'New', 'last_name': 'Driver',
+            'password': 'secret123', 'role': 'driver',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'email', 'username'})
@@ -11,6 +11,7 @@ from .serializers import (
     PasswordChangeSerializer, ProfileUpdateSerializer
 )
 from .permissions import IsAdmin, IsOwner, IsDriver, IsAdminOrOwner
+from transport_app.purge import SoftDeleteMixin
 
 class AuthViewSet(viewsets.GenericViewSet):
     serializer_class = LoginSerializer
@@ -58,7 +59,7 @@ class AuthViewSet(viewsets.GenericViewSet):
         
         return Response({"detail": "Password changed successfully."})
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SoftDeleteMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     
@@ -77,14 +78,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return UserSerializer
     
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'admin':
-            return User.objects.all()
-        elif user.role == 'owner': 
-            return User.objects.filter(role__in=['driver', 'owner'])
-        elif user.role == 'driver': 
-            return User.objects.filter(id=user.id)
-        return User.objects.none()
+        return User.objects.for_user(self.request.user)
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def profile(self, request):
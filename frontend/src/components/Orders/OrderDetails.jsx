@@ -54,8 +54,6 @@ import {
 } from '@mui/icons-material';
 import { useNavigate, useParams } from 'react-router-dom';
 import { ordersService } from '../../services/orders';
-import { expensesService } from '../../services/expenses';
-import { transfersService } from '../../services/transfers';
 import { formatDate, formatCurrency, formatDateTime, getStatusColor, getStatusText, calculateOrderProgress } from '../../utils/helpers';
 import Loading from '../Common/Loading';
 import ErrorComponent from '../Common/Error';
@@ -71,6 +69,8 @@ const OrderDetails = () => {
   const [expenses, setExpenses] = useState([]);
   const [transfers, setTransfers] = useState([]);
   const [timeline, setTimeline] = useState([]);
+  const [summary, setSummary] = useState(null);
+  const [nextPages, setNextPages] = useState({});
   const [anchorEl, setAnchorEl] = useState(null);
   const [deleteDialog, setDeleteDialog] = useState(false);
 
@@ -81,19 +81,18 @@ const OrderDetails = () => {
   const fetchOrderDetails = async () => {
     try {
       setLoading(true);
-      const orderData = await ordersService.getOrder(id);
-      setOrder(orderData);
-      
-      // Fetch related data
-      const [expensesData, transfersData, timelineData] = await Promise.all([
-        expensesService.getExpensesByOrder(id),
-        transfersService.getTransfersByOrder(id),
-        ordersService.getOrderTimeline(id)
-      ]);
-      
-      setExpenses(expensesData);
-      setTransfers(transfersData);
-      setTimeline(timelineData);
+      // Order, first page of expenses, transfers and timeline, and totals in one request
+      const bundle = await ordersService.getOrderBundle(id);
+      setOrder(bundle.order);
+      setExpenses(bundle.expenses.results);
+      setTransfers(bundle.transfers.results);
+      setTimeline(bundle.timeline.results);
+      setSummary(bundle.summary);
+      setNextPages({
+        expenses: bundle.expenses.next_page,
+        transfers: bundle.transfers.next_page,
+        timeline: bundle.timeline.next_page,
+      });
     } catch (error) {
       console.error('Error fetching order details:', error);
       setError('Failed to load order details');
@@ -102,6 +101,26 @@ const OrderDetails = () => {
     }
   };
 
+  const loadMore = async (section) => {
+    try {
+      const bundle = await ordersService.getOrderBundle(id, {
+        include: section,
+        [`${section}_page`]: nextPages[section],
+      });
+      const setRows = { expenses: setExpenses, transfers: setTransfers, timeline: setTimeline }[section];
+      setRows((rows) => [...rows, ...bundle[section].results]);
+      setNextPages((pages) => ({ ...pages, [section]: bundle[section].next_page }));
+    } catch (error) {
+      console.error(`Error loading more ${section}:`, error);
+    }
+  };
+
+  const renderLoadMore = (section) => nextPages[section] && (
+    <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+      <Button onClick={() => loadMore(section)}>Load more</Button>
+    </Box>
+  );
+
   const handleTabChange = (event, newValue) => {
     setTabValue(newValue);
   };
@@ -126,12 +145,17 @@ const OrderDetails = () => {
 
   const handleStatusUpdate = async (status) => {
     try {
-      await ordersService.updateOrderStatus(id, status);
+      await ordersService.updateOrderStatus(id, status, order.status);
       fetchOrderDetails(); // Refresh order data
       handleMenuClose();
     } catch (error) {
       console.error('Error updating order status:', error);
-      setError('Failed to update order status');
+      const detail = error.response?.data;
+      setError(detail?.error || detail?.status?.[0] || 'Failed to update order status');
+      if (error.response?.status === 409) {
+        fetchOrderDetails(); // Someone else changed it; show the current status
+      }
+      handleMenuClose();
     }
   };
 
@@ -147,7 +171,7 @@ const OrderDetails = () => {
   };
 
   const calculateTotalExpenses = () => {
-    return expenses.reduce((total, expense) => total + parseFloat(expense.amount || 0), 0);
+    return parseFloat(summary?.expense_total || 0);
   };
 
   const calculateNetProfit = () => {
@@ -367,7 +391,10 @@ const OrderDetails = () => {
 
             <Box sx={{ p: 3 }}>
               {tabValue === 0 && (
-                <OrderTimeline timeline={timeline} />
+                <Box>
+                  <OrderTimeline timeline={timeline} />
+                  {renderLoadMore('timeline')}
+                </Box>
               )}
 
               {tabValue === 1 && (
@@ -433,6 +460,7 @@ const OrderDetails = () => {
                       </TableBody>
                     </Table>
                   </TableContainer>
+                  {renderLoadMore('expenses')}
 
                   {expenses.length > 0 && (
                     <Card sx={{ mt: 3 }}>
@@ -539,6 +567,7 @@ const OrderDetails = () => {
                       </TableBody>
                     </Table>
                   </TableContainer>
+                  {renderLoadMore('transfers')}
                 </Box>
               )}
 
@@ -584,7 +613,7 @@ const OrderDetails = () => {
                         
                         <Box sx={{ mt: 2 }}>
                           <Typography variant="body2">
-                            Number of Expenses: {expenses.length}
+                            Number of Expenses: {summary?.expense_count ?? expenses.length}
                           </Typography>
                         </Box>
                       </CardContent>
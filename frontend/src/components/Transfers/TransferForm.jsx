@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Box,
   Paper,
@@ -44,6 +44,8 @@ const TransferForm = () => {
   const [success, setSuccess] = useState('');
   const [error, setError] = useState('');
   const [receiptFile, setReceiptFile] = useState(null);
+  // One key per form: resubmitting after a network error cannot create a second transfer
+  const idempotencyKey = useRef(crypto.randomUUID());
 
   useEffect(() => {
     fetchOrders();
@@ -99,7 +101,7 @@ const TransferForm = () => {
         await transfersService.updateTransfer(id, formData);
         setSuccess('Transfer updated successfully');
       } else {
-        await transfersService.createTransfer(formData);
+        await transfersService.createTransfer(formData, idempotencyKey.current);
         setSuccess('Transfer created successfully');
       }
 
@@ -60,6 +60,16 @@ export const ordersService = {
     }
   },
 
+  getOrderBundle: async (id, params = {}) => {
+    try {
+      const response = await api.get(`/api/transport/orders/${id}/bundle/`, { params });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching order bundle:', error);
+      throw error;
+    }
+  },
+
   getOrderTimeline: async (id) => {
     try {
       const response = await api.get(`/api/transport/orders/${id}/timeline/`);
@@ -90,9 +100,12 @@ export const ordersService = {
     }
   },
 
-  updateOrderStatus: async (id, status) => {
+  updateOrderStatus: async (id, status, expectedStatus) => {
     try {
-      const response = await api.post(`/api/transport/orders/${id}/update_status/`, { status });
+      const response = await api.post(`/api/transport/orders/${id}/update_status/`, {
+        status,
+        expected_status: expectedStatus,
+      });
       return response.data;
     } catch (error) {
       console.error('Error updating status:', error);
@@ -118,5 +131,16 @@ export const ordersService = {
         recent_expenses: []
       };
     }
+  },
+
+  // params: one of { order, owner, driver }; pass the previous page's next_cursor as cursor
+  getActivity: async (params = {}) => {
+    try {
+      const response = await api.get('/api/transport/activity/', { params });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching activity:', error);
+      throw error;
+    }
   }
 };
\ No newline at end of file
@@ -26,7 +26,7 @@ export const transfersService = {
     }
   },
 
-  createTransfer: async (transferData) => {
+  createTransfer: async (transferData, idempotencyKey) => {
     try {
       const formData = new FormData();
       
@@ -43,6 +43,7 @@ export const transfersService = {
       const response = await api.post('/api/transport/transfers/', formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
+          ...(idempotencyKey && { 'Idempotency-Key': idempotencyKey }),
         },
       });
       return response.data;